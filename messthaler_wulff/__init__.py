@@ -1,25 +1,38 @@
 # PYTHON_ARGCOMPLETE_OK
+import sys
+
+if "--startup-trace" in sys.argv:
+    from ._startup_trace import install
 
+    install()
 
 import logging
 import math
 import os
-import sys
 from argparse import ArgumentParser
 
-import argcomplete
 import mydefaults
-import numpy as np
 
-from .data import fcc_transform
 from .parsing import parse_crystal
 from .version import program_version
 
+# Heavy modules like numpy are only imported by the sub commands that need them,
+# so that starting the program and tab completion stay fast
 mydefaults.create_logger(__name__)
 log = logging.getLogger(__name__)
 
 
+def __getattr__(name):
+    if name == "fcc_transform":
+        from .data import fcc_transform
+        return fcc_transform
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def parse_lattice(lattice):
+    import numpy as np
+    from .data import fcc_transform
+
     match lattice.lower():
         case "fcc":
             return fcc_transform()
@@ -44,7 +57,11 @@ def parse_initial_crystal(initial_crystal, dimension):
     if initial_crystal == "-":
         initial_crystal = input("Input initial crystal: ")
 
-    value = parse_crystal(initial_crystal)
+    from .crystal_archive import is_archive_spec, load_crystal
+    if is_archive_spec(initial_crystal):
+        value = load_crystal(initial_crystal)
+    else:
+        value = parse_crystal(initial_crystal)
     log.info(f"Initial crystal has been set to {value}")
 
     for i in range(len(value)):
@@ -92,7 +109,7 @@ def interactive(parser: ArgumentParser) -> mydefaults.MAGIC:
     from messthaler_wulff.modes.mode_interactive import run_mode
     run_mode(goal=int(args.goal), dimension=args.dimension,
              lattice=args.lattice, windows_mode=False,
-             initial=parse_initial_crystal(args.initial_crystal, args.dimension))
+             initial=parse_initial_crystal(args.initial_crystal, args.dimension), engine=args.engine)
 
 
 @mydefaults.sub_command
@@ -101,17 +118,88 @@ def simulate(parser: ArgumentParser) -> mydefaults.MAGIC:
     args = yield
     os.environ["XDG_SESSION_TYPE"] = "x11"
     from messthaler_wulff.modes.mode_simulate import run_mode
-    run_mode(goal=args.goal, lattice=args.lattice)
+    run_mode(goal=args.goal, lattice=args.lattice, engine=args.engine)
+
+
+@mydefaults.sub_command
+def ensemble(parser: ArgumentParser) -> mydefaults.MAGIC:
+    """Grow many random crystals at once and print percentiles of their energies"""
+
+    parser.add_argument("-w", "--walkers", type=int, default=1000,
+                        help="The number of crystals to grow (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("-o", "--output", default=None,
+                        help="Save the energy curves of all crystals to this .npz file")
+    parser.add_argument("--every", type=int, default=None,
+                        help="Print every this many sizes (default: goal / 20)")
+
+    args = yield
+
+    from messthaler_wulff.modes.mode_ensemble import run_mode
+    run_mode(goal=args.goal, lattice=args.lattice, walkers=args.walkers, seed=args.seed,
+             output=args.output, every=args.every)
+
+
+@mydefaults.sub_command
+def bench(parser: ArgumentParser) -> mydefaults.MAGIC:
+    """Measure the throughput of the simulations, exploration and data structures"""
+
+    parser.add_argument("--lattices", nargs="+", default=["fcc", "triangular"],
+                        help="The lattices to benchmark (default: %(default)s)")
+    parser.add_argument("-o", "--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None,
+                        help="A JSON file of an earlier run; exit with status 1 if anything got slower")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="How much worse than --compare a metric may get (default: %(default)s)")
+    parser.add_argument("--quick", action="store_true", help="Only do a little work to check that everything runs")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Report the best of this many runs (default: %(default)s)")
+
+    args = yield
+
+    from messthaler_wulff.modes.mode_bench import run_mode
+    if not run_mode({name: parse_lattice(name) for name in args.lattices}, output=args.output,
+                    compare=args.compare, threshold=args.threshold, size="quick" if args.quick else "full",
+                    repeat=args.repeat):
+        sys.exit(1)
 
 
 @mydefaults.sub_command
 def explore(parser: ArgumentParser) -> mydefaults.MAGIC:
     """Explore the number of crystals and optimal energies"""
 
-    parser.add_argument("-d", "--dump-crystals", default=None)
+    parser.add_argument("-d", "--dump-crystals", default=None,
+                        help="Write the optimal crystals of every size to files in this directory while exploring, "
+                             "or those of the goal to stdout with -")
+    parser.add_argument("--compress", choices=["gz", "xz"], default=None,
+                        help="Compress the files written by --dump-crystals")
+    parser.add_argument("--dump-format", choices=["text", "archive"], default="text",
+                        help="Write crystals as lines of text or as binary archives that can be memory mapped "
+                             "and used with --initial-crystal PATH@K (default: %(default)s)")
     parser.add_argument("-r", "--require-energy", type=int, default=None)
     parser.add_argument("--no-translations", action="store_true")
     parser.add_argument("--no-bidi", action="store_true")
+    parser.add_argument("--symmetry", action="store_true",
+                        help="Only explore one crystal per orbit of the point group of the lattice")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="The number of processes to explore with (default: %(default)s)")
+    parser.add_argument("--visited-dir", default=None,
+                        help="Keep the set of visited crystals in files in this directory instead of in memory")
+    parser.add_argument("--packed", action="store_true",
+                        help="Store crystals as compact byte strings, which is slower but needs less memory")
+    parser.add_argument("--backtrack", action="store_true",
+                        help="Explore by adding and undoing one atom at a time instead of jumping between crystals")
+    parser.add_argument("--energy-cache", choices=["none", "lru", "level", "all"], default="none",
+                        help="Which energies of crystals to remember; every crystal is usually only evaluated "
+                             "once while exploring (default: %(default)s)")
+    parser.add_argument("--energy-cache-size", type=int, default=1 << 20,
+                        help="The number of energies the lru cache keeps (default: %(default)s)")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Periodically save the progress to this directory")
+    parser.add_argument("--checkpoint-every", type=float, default=600.0,
+                        help="Seconds between saves of the checkpoint (default: %(default)s)")
+    parser.add_argument("--resume", default=None,
+                        help="Continue from the progress saved in this checkpoint directory")
 
     args = yield
 
@@ -119,7 +207,12 @@ def explore(parser: ArgumentParser) -> mydefaults.MAGIC:
     run_mode(goal=args.goal, lattice=args.lattice,
              initial=parse_initial_crystal(args.initial_crystal, args.dimension),
              dimension=args.dimension, verbose=args.verbose, dump_crystals=args.dump_crystals,
-             require_energy=args.require_energy, ti=not args.no_translations, bidi=not args.no_bidi)
+             require_energy=args.require_energy, ti=not args.no_translations, bidi=not args.no_bidi,
+             symmetry=args.symmetry, jobs=args.jobs, visited_dir=args.visited_dir,
+             checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every, resume=args.resume,
+             packed=args.packed, backtrack=args.backtrack,
+             energy_cache=args.energy_cache, energy_cache_size=args.energy_cache_size, engine=args.engine,
+             compression=args.compress, dump_format=args.dump_format)
 
 
 @mydefaults.command(version=program_version)
@@ -132,16 +225,28 @@ def messthaler_wulff(parser: ArgumentParser):
     parser.add_argument("--goal", help="The number of atoms to add initially or to go to (default: %(default)s)",
                         type=int,
                         default=20)
+    parser.add_argument("--startup-trace", action="store_true",
+                        help="Print how long importing every module took when the program exits")
+    parser.add_argument("--instrument", default=None, metavar="PATH",
+                        help="Count and time what the simulations do and write it as JSON to PATH at exit")
 
     lattice_options = parser.add_argument_group("Lattice Options")
     lattice_options.add_argument("--lattice", default="fcc", type=parse_lattice, help="(default: %(default)s)")
     lattice_options.add_argument("--dimension", default="3", type=int, help="(default: %(default)s)")
-    lattice_options.add_argument("--initial-crystal", default=None)
+    lattice_options.add_argument("--initial-crystal", default=None,
+                                 help="A crystal like [(0, 0, 0), (1, 0, 0)], - to type it in or PATH@K for "
+                                      "crystal K of an archive written by explore")
+    lattice_options.add_argument("--engine", choices=["lattice", "tuple"], default="lattice",
+                                 help="The simulation to run on: integer nodes of a lattice or the older one on "
+                                      "tuples of coordinates (default: %(default)s)")
 
     subparsers = parser.add_subparsers(title="Modes", description="Possible modes of operation", required=True)
     mydefaults.add_sub_commands(subparsers)
 
-    argcomplete.autocomplete(parser)
+    # argcomplete only has work to do when the shell asks for completions
+    if "_ARGCOMPLETE" in os.environ:
+        import argcomplete
+        argcomplete.autocomplete(parser)
 
     args = parser.parse_args()
 
@@ -149,5 +254,8 @@ def messthaler_wulff(parser: ArgumentParser):
     log.debug("Starting program...")
     if not __debug__:
         log.info("Running in optimized mode")
+    if args.instrument is not None:
+        from . import instrumentation
+        instrumentation.enable(args.instrument)
 
     mydefaults.run_sub_command(args)
@@ -5,9 +5,11 @@ from collections import defaultdict
 from typing import Sequence
 
 import numpy as np
-from tqdm import tqdm
 
+from messthaler_wulff.datastructures.lattice import Lattice, UniformNeighborhood
 from messthaler_wulff.decorators import wipe_screen
+from messthaler_wulff.instrumentation import current as current_instrumentation
+from messthaler_wulff.sim.additive_simulation import AdditiveSimulation, Mode
 from .progress import ProgressBar
 
 
@@ -137,6 +139,7 @@ class OmniSimulation:
 
         self.boundaries = [EnergyTracker(), EnergyTracker()]
         self.boundaries[self.FORWARDS].set(origin, self.calculate_energy(origin, mode=self.FORWARDS))
+        self.instrumentation = current_instrumentation()
 
     def calculate_energy(self, atom, mode):
         energy = 0
@@ -211,7 +214,13 @@ class OmniSimulation:
                       energy,
                       self.BACKWARDS)
 
+    def energy_delta(self, atom, mode):
+        """The change of the energy when `atom` is moved out of the boundary of `mode`"""
+        return self.boundaries[mode].get(atom)
+
     def force_set_atom(self, atom, mode=FORWARDS):
+        if self.instrumentation is not None:
+            self.instrumentation.count("omni.force_set_atom")
         self.adjust_atom_count(mode)
 
         atom2energy = self.boundaries[mode].atom2energy
@@ -361,6 +370,8 @@ Press Enter to continue execution
         return self.boundaries[self.BACKWARDS].atoms()
 
     def fill(self, choice=lambda l: 0):
+        from tqdm import tqdm
+
         for i in tqdm(range(100_000)):
             _, energy = self.boundaries[self.FORWARDS].minimum()
             if energy > 0:
@@ -371,6 +382,115 @@ Press Enter to continue execution
         return "[" + ", ".join(map(str, sorted(self.points()))) + "]"
 
 
+class LatticeBoundary:
+    """Read-only view of a boundary of a `LatticeSimulation` that looks like an `EnergyTracker`"""
+
+    def __init__(self, simulation: 'LatticeSimulation', mode: Mode):
+        self.simulation = simulation
+        self.mode = mode
+        self.stack = simulation.sim.boundary(mode)
+
+    def minimum(self, choice=lambda x: 0):
+        nodes = self.stack.extrema()
+        node = nodes[choice(len(nodes))]
+        return self.simulation.atom(node), self.simulation.sim.energy_delta(node, self.mode)
+
+    def all_minimums(self):
+        return [self.simulation.atom(node) for node in self.simulation.sim.next(self.mode)]
+
+    def __len__(self):
+        return len(self.stack)
+
+    def __contains__(self, atom):
+        return self.simulation.node(atom) in self.stack
+
+    def get(self, atom):
+        return self.simulation.sim.energy_delta(self.simulation.node(atom), self.mode)
+
+    def atoms(self):
+        levels = range(len(self.stack.priority_levels))
+        return [self.simulation.atom(node) for node in self.stack.select_levels(levels)]
+
+    def __str__(self):
+        return str({atom: self.get(atom) for atom in self.atoms()})
+
+
+class LatticeSimulation(OmniSimulation):
+    """An `OmniSimulation` that runs on the integer node ids of `AdditiveSimulation` and a
+    `Lattice`. Atoms are still tuples with a leading 0 on the outside, they are translated
+    to nodes on the way in and back on the way out."""
+
+    def __init__(self, neighborhood, energy_maximum=None, origin=(0, 0, 0, 0)):
+        if energy_maximum is not None and energy_maximum != neighborhood.energy_maximum():
+            raise ValueError("The lattice engine only supports the energy maximum of the neighborhood")
+
+        self.neighborhood = neighborhood
+        self.energy_maximum = neighborhood.energy_maximum
+        self.lattice = Lattice(UniformNeighborhood(sorted(neighborhood.base_neighborhood)))
+        self._atoms: list[tuple] = []
+        self._nodes: dict[tuple, int] = {}
+
+        self.sim = AdditiveSimulation(self.lattice, self.node(origin))
+        self.boundaries = [LatticeBoundary(self, Mode.BACKWARDS), LatticeBoundary(self, Mode.FORWARDS)]
+        self.instrumentation = current_instrumentation()
+
+    @property
+    def energy(self):
+        return self.sim.energy
+
+    @property
+    def atoms(self):
+        return self.sim.size
+
+    def node(self, atom) -> int:
+        node = self._nodes.get(atom)
+        if node is None:
+            if atom[0] != 0:
+                raise ValueError(f"The lattice engine only supports atoms of the form (0, ...), not {atom}")
+            node = self._nodes[atom] = self.lattice.intern(atom[1:])
+        return node
+
+    def atom(self, node: int) -> tuple:
+        atoms = self._atoms
+        while len(atoms) <= node:
+            atoms.append((0, *self.lattice.repr(len(atoms))))
+        return atoms[node]
+
+    def calculate_energy(self, atom, mode):
+        node = self.node(atom)
+        return 2 * self.sim.calculate_loneliness(node, Mode(mode)) - self.sim.graph.degree(node)
+
+    def set_atom(self, atom, energy, mode):
+        node = self.node(atom)
+        assert (node in self.sim) == (mode == self.BACKWARDS), f"{atom} can not be moved {Mode(mode).name}"
+        self.sim.toggle(node)
+
+    def next_atom(self, choice, mode):
+        return self.boundaries[mode].minimum(choice)
+
+    def next_atoms(self, mode):
+        return [self.atom(node) for node in self.sim.next(Mode(mode))]
+
+    def adjust_atom_count(self, mode):
+        if mode == self.BACKWARDS and self.atoms <= 0:
+            raise ValueError("No atoms left, so can't remove one")
+
+    def energy_delta(self, atom, mode):
+        return self.sim.energy_delta(self.node(atom), Mode(mode))
+
+    def force_set_atom(self, atom, mode=OmniSimulation.FORWARDS):
+        if self.instrumentation is not None:
+            self.instrumentation.count("omni.force_set_atom")
+        self.adjust_atom_count(mode)
+        self.set_atom(atom, None, mode)
+
+    def points(self):
+        return [self.atom(node) for node in np.flatnonzero(self.sim.x_c.view()).tolist()]
+
+
+ENGINES = {"lattice": LatticeSimulation, "tuple": OmniSimulation}
+
+
 def move(atom, offset):
     return tuple((atom[0], *(atom[i + 1] + offset[i] for i in range(len(atom) - 1))))
 
@@ -392,52 +512,9 @@ class SimpleNeighborhood:
         # print(f"Neighbors are: {self.base_neighborhood}")
         # print()
 
-    @staticmethod
-    def points_within_dist(n, dist):
-        if n == 0:
-            yield ()
-            return
-        if n == 1:
-            for i in list(range(-dist, dist + 1)):
-                yield (i,)
-            return
-
-        for i in range(-dist, dist + 1):
-            for p in SimpleNeighborhood.points_within_dist(n - 1, dist):
-                yield [*p, i]
-
-    @staticmethod
-    def points_with_dist(n, dist):
-        if dist == 0:
-            yield [0] * n
-            return
-        if dist == 1:
-            for p in SimpleNeighborhood.points_within_dist(n, dist):
-                if all(x == 0 for x in p): continue
-                yield p
-            return
-
-        for i in range(n):
-            for sign in [-1, 1]:
-                for p in SimpleNeighborhood.points_within_dist(n - 1, dist):
-                    yield *p[:i], sign * dist, *p[i:]
-
     def find_neighbors(self):
-        for dist in range(1, 10):
-            changed = 0
-
-            for p in SimpleNeighborhood.points_with_dist(self.n, dist):
-                point = np.dot(self.transform, np.array(p))
-                if np.linalg.norm(point) <= 1:
-                    p = tuple(p)
-                    if p not in self.base_neighborhood:
-                        self.base_neighborhood.add(p)
-                        changed += 1
-
-            if changed == 0:
-                return
-
-        raise RuntimeError("Could not find all neighbors")
+        neighborhood = UniformNeighborhood.from_transform(self.transform)
+        self.base_neighborhood.update(neighborhood._neighbors)
 
     def __call__(self, pos):
         return [move(pos, x) for x in self.base_neighborhood]
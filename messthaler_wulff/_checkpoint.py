@@ -0,0 +1,187 @@
+import logging
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+log = logging.getLogger("messthaler_wulff")
+log.debug(f"Loading {__name__}")
+
+
+def encode_crystals(crystals) -> np.ndarray:
+    """Encode crystals as one int32 array: every crystal is its number of atoms n,
+    the length w of its atoms and then its n*w coordinates"""
+    values = []
+    for crystal in crystals:
+        atoms = list(crystal.atoms())
+        values.append(len(atoms))
+        values.append(len(atoms[0]) if atoms else 0)
+        for atom in atoms:
+            values.extend(atom)
+    return np.array(values, dtype=np.int32)
+
+
+def decode_crystals(values: np.ndarray, crystal_type) -> list:
+    values = values.tolist()
+    crystals = []
+    i = 0
+    while i < len(values):
+        n, w = values[i], values[i + 1]
+        i += 2
+        crystals.append(crystal_type.wrap_atoms([tuple(values[j:j + w]) for j in range(i, i + n * w, max(w, 1))]))
+        i += n * w
+    return crystals
+
+
+def encode_crystal_log(entries) -> np.ndarray:
+    """Encode `(level, replace, crystal)` entries of collected crystals as one int32 array: every
+    entry is its level, whether it replaces the crystals of that level and then the crystal"""
+    values = []
+    for d, replace, crystal in entries:
+        values.extend((d, int(replace)))
+        values.extend(encode_crystals([crystal]).tolist())
+    return np.array(values, dtype=np.int32)
+
+
+def decode_crystal_log(values: np.ndarray, crystal_type) -> list[tuple[int, bool, object]]:
+    values = values.tolist()
+    entries = []
+    i = 0
+    while i < len(values):
+        d, replace, n, w = values[i:i + 4]
+        i += 4
+        atoms = [tuple(values[j:j + w]) for j in range(i, i + n * w, max(w, 1))]
+        entries.append((d, bool(replace), crystal_type.wrap_atoms(atoms)))
+        i += n * w
+    return entries
+
+
+class Checkpoint:
+    """Periodically saves the progress of an `ExplorativeSimulation` to the directory `path`.
+    Visited crystals only ever get added, so new ones are appended to `visited.bin` on every
+    save. Collected crystals are appended to `crystals.bin` the same way, as a log in which an
+    entry may start its level over. The results and the stack of open crystals are rewritten to
+    `meta.npz`, which is replaced atomically and records how much of both logs is valid."""
+
+    VISITED = "visited.bin"
+    CRYSTALS = "crystals.bin"
+    META = "meta.npz"
+
+    def __init__(self, path, every: float = 600.0):
+        self.path = Path(path)
+        self.every = every
+        self.last_save = time.monotonic()
+        self.unsaved: list = []
+        self.unsaved_crystals: list[tuple[int, bool, object]] = []
+
+    def start(self, resumed: bool):
+        """Prepare the directory. Unless resuming from this very checkpoint, old files are removed"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        if not resumed:
+            for name in [self.VISITED, self.CRYSTALS, self.META]:
+                (self.path / name).unlink(missing_ok=True)
+
+    def record(self, state):
+        self.unsaved.append(state)
+
+    def record_crystal(self, d: int, crystal, replace: bool):
+        """A crystal was collected on level `d`, with `replace` it has a new best energy"""
+        self.unsaved_crystals.append((d, replace, crystal))
+
+    def due(self) -> bool:
+        return time.monotonic() - self.last_save >= self.every
+
+    @staticmethod
+    def config(explorer) -> dict[str, np.ndarray]:
+        """The options that have to match when resuming"""
+        omni = explorer.sim.sim.omni
+        return dict(options=np.array([explorer.initial_count, explorer.upper_bound, explorer.lower_bound,
+                                      explorer.bidi, explorer.ti, explorer.symmetries is not None,
+                                      explorer.require_energy is not None, explorer.require_energy or 0,
+                                      bool(explorer.collect_crystals)], dtype=np.int64),
+                    lattice=np.asarray(omni.neighborhood.transform, dtype=np.float64),
+                    initial=encode_crystals([explorer.sim.initial_state]),
+                    engine=np.array(type(omni).__name__),
+                    crystal_type=np.array(explorer.sim.sim.abstract_crystal.__name__))
+
+    @staticmethod
+    def _append(path: Path, values: np.ndarray) -> int:
+        """Append to the file at `path` and return its length"""
+        with open(path, "ab") as file:
+            file.write(values.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+            return file.tell()
+
+    def save(self, explorer):
+        start = time.perf_counter()
+
+        visited_length = self._append(self.path / self.VISITED, encode_crystals(self.unsaved))
+        self.unsaved = []
+        crystals_length = self._append(self.path / self.CRYSTALS, encode_crystal_log(self.unsaved_crystals))
+        self.unsaved_crystals = []
+
+        arrays = dict(visited_length=np.array(visited_length, dtype=np.int64),
+                      crystals_length=np.array(crystals_length, dtype=np.int64),
+                      energies=np.array(explorer.energies, dtype=np.int64),
+                      counts=np.array(explorer.counts, dtype=np.int64),
+                      min_counts=np.array(explorer.min_counts, dtype=np.int64),
+                      stack=encode_crystals(explorer.stack))
+        if explorer.symmetries is not None:
+            arrays.update(raw_counts=np.array(explorer.raw_counts, dtype=np.int64),
+                          raw_min_counts=np.array(explorer.raw_min_counts, dtype=np.int64))
+        arrays.update({f"config_{name}": value for name, value in self.config(explorer).items()})
+
+        temporary = self.path / ("tmp-" + self.META)
+        with open(temporary, "wb") as file:
+            np.savez(file, **arrays)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path / self.META)
+
+        self.last_save = time.monotonic()
+        log.info(f"Saved checkpoint to {self.path} in {time.perf_counter() - start:.2f}s")
+
+    @classmethod
+    def restore(cls, path, explorer) -> list:
+        """Load the progress saved in `path` into `explorer` and return the restored visited crystals"""
+        path = Path(path)
+        crystal_type = explorer.sim.sim.abstract_crystal
+
+        with np.load(path / cls.META) as meta:
+            for name, value in cls.config(explorer).items():
+                if f"config_{name}" not in meta or not np.array_equal(meta[f"config_{name}"], value):
+                    raise ValueError(f"The checkpoint {path} was made with a different {name.replace('_', ' ')}")
+
+            explorer.energies = meta["energies"].tolist()
+            explorer.counts = meta["counts"].tolist()
+            explorer.min_counts = meta["min_counts"].tolist()
+            if explorer.symmetries is not None:
+                explorer.raw_counts = meta["raw_counts"].tolist()
+                explorer.raw_min_counts = meta["raw_min_counts"].tolist()
+            explorer.stack = decode_crystals(meta["stack"], crystal_type)
+            visited_length = int(meta["visited_length"])
+            crystals_length = int(meta["crystals_length"])
+
+        # A save may have been interrupted after appending to the logs
+        with open(path / cls.VISITED, "r+b") as file:
+            file.truncate(visited_length)
+        visited = decode_crystals(np.fromfile(path / cls.VISITED, dtype=np.int32), crystal_type)
+        with open(path / cls.CRYSTALS, "r+b") as file:
+            file.truncate(crystals_length)
+        if explorer.collect_crystals:
+            for d, replace, crystal in decode_crystal_log(np.fromfile(path / cls.CRYSTALS, dtype=np.int32),
+                                                          crystal_type):
+                if replace:
+                    explorer.crystals[d] = []
+                explorer.crystals[d].append(crystal)
+
+        explorer.reset_visited()
+        for state in visited:
+            explorer.visit_state(state)
+        if explorer.symmetries is not None:
+            # Only the open crystals are recorded later, they find their orbit sizes again
+            explorer.orbit_sizes.clear()
+        log.info(f"Resumed from {path} with {len(visited):,} visited and {len(explorer.stack):,} open crystals")
+        return visited
@@ -0,0 +1,96 @@
+import functools
+import gzip
+import logging
+import lzma
+from pathlib import Path
+from typing import Callable, Optional
+
+from .crystal_archive import SUFFIX, CrystalArchiveWriter
+
+log = logging.getLogger("messthaler_wulff")
+log.debug(f"Loading {__name__}")
+
+COMPRESSIONS = {None: open, "gz": gzip.open, "xz": functools.partial(lzma.open, preset=0)}
+"""One file per level stays open, so xz uses its smallest preset, which needs under 1 MB per
+writer instead of the 17 MB of the default one and compresses crystals about as well"""
+
+
+def format_crystal(crystal) -> str:
+    return "[" + ", ".join(map(str, crystal.atoms())) + "]"
+
+
+class CrystalDump:
+    """Streams the optimal crystals of every level to one file per level while exploring.
+    A file is truncated and started over only when a strictly better energy is found for its
+    level, otherwise crystals are appended through a buffered (and maybe compressed) stream.
+    `file_name(i)` is the name of the file for crystals with `i` atoms in `directory`.
+    With `archive`, the keyword arguments of `CrystalArchiveWriter`, binary archives
+    are written instead of text."""
+
+    def __init__(self, directory, file_name: Callable[[int], str], compression: Optional[str] = None,
+                 buffer_size: int = 1 << 16, archive: Optional[dict] = None):
+        if archive is not None and compression is not None:
+            raise ValueError("Crystal archives are memory mapped and can not be compressed")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.file_name = file_name
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.archive = archive
+        self.files: dict = {}
+        self.skipped: set[int] = set()
+
+    def path(self, i: int) -> Path:
+        name = self.file_name(i)
+        if self.archive is not None:
+            name = str(Path(name).with_suffix(SUFFIX))
+        if self.compression is not None:
+            name += "." + self.compression
+        return self.directory / name
+
+    def _open(self, i: int):
+        if self.archive is not None:
+            return CrystalArchiveWriter(self.path(i), **self.archive)
+        if self.compression is None:
+            return open(self.path(i), "w", buffering=self.buffer_size)
+        return COMPRESSIONS[self.compression](self.path(i), "wt")
+
+    def skip_existing(self, levels):
+        """Never write the files of `levels` that already exist"""
+        for i in levels:
+            if self.path(i).exists():
+                log.error(f"File {self.path(i)} already exists")
+                self.skipped.add(i)
+
+    def replace(self, i: int, crystal):
+        """Start the file of level `i` over with `crystal`, which has a new best energy"""
+        if i in self.skipped:
+            return
+        file = self.files.pop(i, None)
+        if file is not None:
+            file.close()
+        self.files[i] = self._open(i)
+        self._write(self.files[i], crystal)
+
+    def append(self, i: int, crystal):
+        if i in self.skipped:
+            return
+        self._write(self.files[i], crystal)
+
+    def _write(self, file, crystal):
+        if self.archive is not None:
+            file.add(list(crystal.atoms()))
+        else:
+            file.write(format_crystal(crystal) + "\n")
+
+    def close(self):
+        for i, file in self.files.items():
+            file.close()
+            log.info(f"Wrote {self.path(i).stat().st_size:,} bytes to {self.path(i).absolute()}")
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
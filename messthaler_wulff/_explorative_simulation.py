@@ -1,16 +1,22 @@
 import logging
 import os
-from typing import Optional
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
 
 import colorama.ansi
-import psutil
 from colorama import Cursor
 from prettytable import PrettyTable
 
 from ._additive_simulation import OmniSimulation
-from .abstract_crystal_store import TICrystal
+from ._checkpoint import Checkpoint
+from ._crystal_dump import CrystalDump
+from .abstract_crystal_store import AbstractCrystal, DumbCrystal, TICrystal, SymmetricCrystal
 from .advanced_simulation import DirectionalSimulation
 from .decorators import wipe_screen
+from .energy_cache import EnergyCache
+from .instrumentation import current as current_instrumentation
 from .progress import debounce
 
 log = logging.getLogger("messthaler_wulff")
@@ -20,7 +26,10 @@ log.debug(f"Loading {__name__}")
 class ExplorativeSimulation:
     def __init__(self, omni: OmniSimulation, goal: int,
                  require_energy: Optional[int] = None, bidi: bool = True, verbosity: int = 0, ti=True,
-                 collect_crystals=False):
+                 collect_crystals=False, symmetries: Optional[Sequence[np.ndarray]] = None, visited_dir=None,
+                 checkpoint: Optional[Checkpoint] = None, resume=None,
+                 abstract_crystal: type[AbstractCrystal] = DumbCrystal, energy_cache: Optional[EnergyCache] = None,
+                 crystal_dump: Optional[CrystalDump] = None, auto_run=True):
         self.initial_count = omni.atoms
         self.direction_sign = 1 if goal >= self.initial_count else -1
         log.debug(f"Going in direction {self.direction_sign}")
@@ -29,24 +38,52 @@ class ExplorativeSimulation:
         self.nr_levels = self.upper_bound - self.lower_bound + 1
 
         self.sim = DirectionalSimulation(omni,
-                                         1 if goal >= self.initial_count else 0)
+                                         1 if goal >= self.initial_count else 0, abstract_crystal, energy_cache)
 
         self.bidi = bidi
         self.require_energy = require_energy
         self.ti = ti
+        self.symmetries = symmetries
+        self.visited_dir = visited_dir
         self.verbosity = verbosity
         self.collect_crystals = collect_crystals
         if collect_crystals:
             self.crystals: list[list] = [list() for _ in range(self.nr_levels)]
+        self.crystal_dump = crystal_dump
 
         self.energies: list[int] = [2 ** 30] * self.nr_levels
         self.counts = [0] * self.nr_levels
         self.min_counts = [0] * self.nr_levels
-
-        self.visited = {self.sim.initial_state}
-        self.stack = [self.sim.initial_state]
-
-        self.run()
+        if symmetries is not None:
+            # With symmetries counts and min_counts only count one crystal per orbit
+            self.raw_counts = [0] * self.nr_levels
+            self.raw_min_counts = [0] * self.nr_levels
+            # Orbit sizes of the visited states that were not recorded yet, from their canonical form
+            self.orbit_sizes: dict = {}
+
+        self.instrumentation = current_instrumentation()
+        self.checkpoint = None
+        self.visited = self.new_visited()
+        if resume is None:
+            self.visit_state(self.sim.initial_state)
+            self.stack = [self.sim.initial_state]
+            restored = [self.sim.initial_state]
+        else:
+            restored = Checkpoint.restore(resume, self)
+
+        if checkpoint is not None:
+            # Resuming from the same checkpoint just continues appending to it
+            same = resume is not None and Path(resume).resolve() == checkpoint.path.resolve()
+            checkpoint.start(resumed=same)
+            if not same:
+                checkpoint.unsaved = restored
+                if collect_crystals:
+                    checkpoint.unsaved_crystals = [(d, i == 0, crystal) for d, level in enumerate(self.crystals)
+                                                   for i, crystal in enumerate(level)]
+        self.checkpoint = checkpoint
+
+        if auto_run:
+            self.run()
 
     def data_index(self, i: int) -> int:
         return abs(i - self.initial_count)
@@ -55,56 +92,145 @@ class ExplorativeSimulation:
     def canonical_translation(cls, state):
         return TICrystal(state)
 
-    def visit_state(self, state) -> bool:
+    def canonical_symmetry(self, state):
+        return SymmetricCrystal(state, self.symmetries)
+
+    def canonical(self, state):
+        """The representative of `state` that is stored in `visited`"""
+        if self.symmetries is not None:
+            return self.canonical_symmetry(state)
         if self.ti:
-            state = self.canonical_translation(state)
-        if state in self.visited:
+            return self.canonical_translation(state)
+        return state
+
+    def new_visited(self):
+        """An empty visited set, on disk if `visited_dir` is set"""
+        if self.visited_dir is None:
+            return set()
+        from .datastructures.disk_set import DiskFingerprintSet
+        return DiskFingerprintSet(self.visited_dir)
+
+    def reset_visited(self):
+        close = getattr(self.visited, "close", None)
+        if close is not None:
+            close()
+        self.visited = self.new_visited()
+
+    def visit_state(self, state, key=None) -> bool:
+        """Add `state` to `visited` unless it is there already. `key` is its canonical form
+        if it is known already."""
+        if key is None:
+            key = self.canonical(state)
+        if self.visited_dir is not None:
+            if not self.visited.add(key.fingerprint()):
+                return False
+        elif key in self.visited:
             return False
-        self.visited.add(state)
+        else:
+            self.visited.add(key)
+
+        if self.symmetries is not None:
+            self.orbit_sizes[state] = key.orbit_size
+        if self.checkpoint is not None:
+            self.checkpoint.record(state)
+        if self.instrumentation is not None:
+            self.instrumentation.gauge("explore.visited", len(self.visited))
         return True
 
-    def process_state(self, state):
-        if self.visit_state(state):
+    def process_state(self, state, key=None):
+        if self.visit_state(state, key):
             self.stack.append(state)
 
+    def pruning_energy(self, d: int) -> int:
+        """The energy that `require_energy` is relative to on level `d`"""
+        return self.energies[d]
+
     def run(self):
-        sim = self.sim
         stack = self.stack
 
         while len(stack) > 0:
             if self.verbosity >= 1:
                 self.debug_print(self.verbosity)
 
-            state = stack.pop()
+            self.expand(stack.pop())
+
+            if self.checkpoint is not None and self.checkpoint.due():
+                self.checkpoint.save(self)
 
-            i = state.size
-            d = self.data_index(i)
+        if self.checkpoint is not None:
+            self.checkpoint.save(self)
 
-            assert 0 <= d < self.nr_levels
+    def expand(self, state):
+        """Record `state` in the results and process its neighbors"""
+        sim = self.sim
+        i = state.size
+        d = self.data_index(i)
 
+        assert 0 <= d < self.nr_levels
+
+        if self.instrumentation is not None:
+            with self.instrumentation.section("explore.energy"):
+                new_energy = sim.energy(state)
+        else:
             new_energy = sim.energy(state)
-            if self.require_energy is not None and new_energy > self.energies[d] + self.require_energy:
-                continue
+        if self.require_energy is not None and new_energy > self.pruning_energy(d) + self.require_energy:
+            self.prune(state)
+            return
 
-            self.counts[d] += 1
-
-            if new_energy < self.energies[d]:
-                self.energies[d] = new_energy
-                self.min_counts[d] = 1
-                if self.collect_crystals:
-                    self.crystals[d] = [state]
-            elif new_energy == self.energies[d]:
-                self.min_counts[d] += 1
-                if self.collect_crystals:
-                    self.crystals[d].append(state)
-
-            if self.bidi and d > 0:
-                for prev_state in sim.previous_states(state):
-                    self.process_state(prev_state)
-            if d < self.nr_levels - 1:
-                for next_state in sim.next_states(state):
-                    self.data_index(next_state.size)
-                    self.process_state(next_state)
+        self.record(state, d, new_energy)
+        self.expand_neighbors(state, d)
+
+    def prune(self, state):
+        """Forget about a visited state that is not recorded"""
+        if self.symmetries is not None:
+            self.orbit_sizes.pop(state, None)
+
+    def record(self, state, d: int, new_energy: int):
+        self.counts[d] += 1
+        orbit_size = 1
+        if self.symmetries is not None:
+            orbit_size = self.orbit_sizes.pop(state, None)
+            if orbit_size is None:
+                orbit_size = self.canonical_symmetry(state).orbit_size
+            self.raw_counts[d] += orbit_size
+
+        if new_energy < self.energies[d]:
+            self.energies[d] = new_energy
+            self.min_counts[d] = 1
+            if self.symmetries is not None:
+                self.raw_min_counts[d] = orbit_size
+            if self.collect_crystals:
+                self.crystals[d] = [state]
+                if self.checkpoint is not None:
+                    self.checkpoint.record_crystal(d, state, replace=True)
+            if self.crystal_dump is not None:
+                self.crystal_dump.replace(state.size, state)
+        elif new_energy == self.energies[d]:
+            self.min_counts[d] += 1
+            if self.symmetries is not None:
+                self.raw_min_counts[d] += orbit_size
+            if self.collect_crystals:
+                self.crystals[d].append(state)
+                if self.checkpoint is not None:
+                    self.checkpoint.record_crystal(d, state, replace=False)
+            if self.crystal_dump is not None:
+                self.crystal_dump.append(state.size, state)
+
+    def expand_neighbors(self, state, d: int):
+        sim = self.sim
+        if self.instrumentation is not None:
+            self.instrumentation.count_level("explore.expanded", d)
+        if self.bidi and d > 0:
+            for prev_state in sim.previous_states(state):
+                self.process_state(prev_state)
+        if d < self.nr_levels - 1:
+            for next_state in sim.next_states(state):
+                self.data_index(next_state.size)
+                self.process_state(next_state)
+
+    def open_count(self) -> int:
+        """The number of states that were visited but not expanded yet"""
+        return len(self.stack)
 
     @staticmethod
     def format_mem(m):
@@ -122,6 +248,8 @@ class ExplorativeSimulation:
         if verbosity < 2:
             print(f"Total crystals: {sum(self.counts)}")
             return
+        import psutil
+
         process = psutil.Process(os.getpid())
         mem_info = process.memory_info()
         total_memory_usage = mem_info.rss
@@ -129,20 +257,136 @@ class ExplorativeSimulation:
 
         wipe_screen()
         print(self)
-        print(f"Stack size: {len(self.stack):,}; "
+        print(self.sim.sim.energy_cache)
+        print(f"Stack size: {self.open_count():,}; "
               f"Memory: {self.format_mem(total_memory_usage)}/{self.format_mem(total_memory)} "
               f"({total_memory_usage / total_memory:.2%})", flush=True)
 
+    def columns(self) -> list[str]:
+        columns = ["Atoms", "Minimal Energy", "Total Crystals", "Optimal Crystals"]
+        if self.symmetries is not None:
+            columns += ["Total (reduced)", "Optimal (reduced)"]
+        return columns
+
+    def row(self, i: int) -> list[int]:
+        d = self.data_index(i)
+        if self.symmetries is None:
+            return [i, self.energies[d], self.counts[d], self.min_counts[d]]
+        return [i, self.energies[d], self.raw_counts[d], self.raw_min_counts[d],
+                self.counts[d], self.min_counts[d]]
+
     def __str__(self):
-        table = PrettyTable(
-            ["Atoms", "Minimal Energy", "Total Crystals", "Optimal Crystals"],
-            align='r')
+        table = PrettyTable(self.columns(), align='r')
         table.custom_format = lambda f, v: f"{v:,}"
 
         for i in range(self.lower_bound, self.upper_bound + 1):
-            d = self.data_index(i)
-
-            table.add_row([i, self.energies[d], self.counts[d],
-                           self.min_counts[d]])
+            table.add_row(self.row(i))
 
         return str(table)
+
+
+class LevelExplorativeSimulation(ExplorativeSimulation):
+    """Explores without going backwards (`bidi=False`) one level at a time. A level is
+    expanded into the next one completely before its states and visited set are dropped,
+    so only two levels are in memory at once. Pruning with `require_energy` is relative to
+    the minimal energy of the whole level."""
+
+    def __init__(self, omni: OmniSimulation, goal: int, print_levels=False, **kwargs):
+        assert not kwargs.get("bidi", False), "Levels are only synchronous when not going backwards"
+        self.print_levels = print_levels
+        super().__init__(omni, goal, bidi=False, **kwargs)
+
+    def run(self):
+        level = self.stack
+        self.stack = []
+
+        for d in range(self.nr_levels):
+            self.reset_visited()
+
+            energies = [self.sim.energy(state) for state in level]
+            best = min(energies, default=2 ** 30)
+            for state, energy in zip(level, energies):
+                if self.verbosity >= 1:
+                    self.debug_print(self.verbosity)
+                if self.require_energy is not None and energy > best + self.require_energy:
+                    self.prune(state)
+                    continue
+                self.record(state, d, energy)
+                self.expand_neighbors(state, d)
+
+            if self.print_levels:
+                row = self.row(self.initial_count + self.direction_sign * d)
+                print(", ".join(f"{column}: {value:,}" for column, value in zip(self.columns(), row)), flush=True)
+
+            level = self.stack
+            self.stack = []
+
+
+class BacktrackingExplorativeSimulation(ExplorativeSimulation):
+    """Explores depth first by moving the simulation along the search: every step toggles one
+    atom and is undone when backtracking, instead of jumping between arbitrary states with
+    `goto`. The stack holds the moves that are left for every state on the current path.
+    The energy of a neighbor is known from the boundary, so atoms are only toggled for
+    states that are actually expanded."""
+
+    def run(self):
+        sim = self.sim.sim
+        omni = sim.omni
+        sim.goto(self.sim.initial_state)
+        self.stack = []
+        undo: list[tuple] = []
+
+        if self.enter(sim.current_state, omni.energy):
+            self.stack.append(self.moves(sim.current_state))
+
+        while len(self.stack) > 0:
+            if self.verbosity >= 1:
+                self.debug_print(self.verbosity)
+
+            moves = self.stack[-1]
+            if len(moves) == 0:
+                self.stack.pop()
+                if len(undo) > 0:
+                    atom, direction, previous = undo.pop()
+                    omni.force_set_atom(atom, 1 - direction)
+                    sim.current_state = previous
+                continue
+
+            direction, atom = moves.pop()
+            current = sim.current_state
+            state = current.add_atom(atom) if direction == 1 else current.remove_atom(atom)
+            if not self.visit_state(state):
+                continue
+            if not self.enter(state, omni.energy + omni.energy_delta(atom, direction)):
+                continue
+
+            omni.force_set_atom(atom, direction)
+            sim.current_state = state
+            self.stack.append(self.moves(state))
+            undo.append((atom, direction, current))
+
+    def enter(self, state, new_energy: int) -> bool:
+        """Record `state` and return whether to continue from it"""
+        d = self.data_index(state.size)
+        assert 0 <= d < self.nr_levels
+
+        if self.require_energy is not None and new_energy > self.pruning_energy(d) + self.require_energy:
+            self.prune(state)
+            return False
+
+        self.record(state, d, new_energy)
+        return True
+
+    def moves(self, state) -> list[tuple]:
+        """The (direction, atom) pairs that lead to the neighbors of the current state"""
+        d = self.data_index(state.size)
+        omni = self.sim.sim.omni
+        forwards = self.sim.direction
+        if self.instrumentation is not None:
+            self.instrumentation.count_level("explore.expanded", d)
+        moves = []
+        if self.bidi and d > 0:
+            moves.extend((1 - forwards, atom) for atom in omni.next_atoms(1 - forwards))
+        if d < self.nr_levels - 1:
+            moves.extend((forwards, atom) for atom in omni.next_atoms(forwards))
+        return moves
@@ -0,0 +1,166 @@
+import logging
+import multiprocessing
+
+from . import instrumentation
+from ._additive_simulation import OmniSimulation
+from ._explorative_simulation import ExplorativeSimulation
+
+log = logging.getLogger("messthaler_wulff")
+log.debug(f"Loading {__name__}")
+
+
+def shard_hash(key) -> int:
+    """A hash of a canonical state that is the same in every process"""
+    # Unlike hash(), fingerprints of bytes are not salted per interpreter
+    return key.fingerprint()
+
+
+class ExplorationShard(ExplorativeSimulation):
+    """Explores the states whose canonical form hashes to `shard`. Successors owned by
+    other shards are collected in `outgoing` instead of being visited, together with
+    their canonical form so the owner does not compute it again."""
+
+    def __init__(self, omni: OmniSimulation, goal: int, shard: int, shards: int, **kwargs):
+        super().__init__(omni, goal, auto_run=False, **kwargs)
+        self.shard = shard
+        self.shards = shards
+        self.bound_energies = list(self.energies)
+        self.outgoing: list[list] = [list() for _ in range(shards)]
+        self.reset_visited()
+        self.stack = []
+
+    def owner(self, key) -> int:
+        return shard_hash(key) % self.shards
+
+    def pruning_energy(self, d: int) -> int:
+        return min(self.energies[d], self.bound_energies[d])
+
+    def receive(self, states):
+        for state, key in states:
+            if self.visit_state(state, key):
+                self.stack.append(state)
+
+    def process_state(self, state, key=None):
+        if key is None:
+            key = self.canonical(state)
+        owner = self.owner(key)
+        if owner == self.shard:
+            super().process_state(state, key)
+        else:
+            self.outgoing[owner].append((state, key))
+
+    def take_outgoing(self) -> list[list]:
+        outgoing = self.outgoing
+        self.outgoing = [list() for _ in range(self.shards)]
+        return outgoing
+
+    def results(self) -> dict:
+        results = dict(energies=self.energies, counts=self.counts, min_counts=self.min_counts)
+        if self.symmetries is not None:
+            results.update(raw_counts=self.raw_counts, raw_min_counts=self.raw_min_counts)
+        if self.collect_crystals:
+            results.update(crystals=self.crystals)
+        if self.instrumentation is not None:
+            results.update(instrumentation=self.instrumentation.to_dict())
+        return results
+
+
+def _shard_main(connection, omni, goal, shard, shards, kwargs):
+    if instrumentation.current() is not None:
+        # Only send back what this process records, not the copy of what the parent recorded before forking
+        instrumentation.current().reset()
+    explorer = ExplorationShard(omni, goal, shard, shards, **kwargs)
+
+    while (message := connection.recv()) is not None:
+        states, bound_energies = message
+        explorer.bound_energies = bound_energies
+        explorer.receive(states)
+        explorer.run()
+        connection.send((explorer.take_outgoing(), explorer.energies))
+
+    connection.send(explorer.results())
+    connection.close()
+
+
+class ParallelExplorativeSimulation(ExplorativeSimulation):
+    """Runs the exploration in `jobs` processes. Every process owns the states whose
+    canonical form hashes to it, so each state is still visited exactly once. The
+    processes work in rounds: they exhaust their own states, then exchange the
+    successors that belong to other processes and the best energies found so far."""
+
+    def __init__(self, omni: OmniSimulation, goal: int, jobs: int, **kwargs):
+        super().__init__(omni, goal, auto_run=False, **kwargs)
+        self.jobs = jobs
+        self.shard_options = dict(kwargs)
+        self.shard_options.pop("verbosity", None)
+        self.rounds = 0
+        self.in_flight = 0
+        """The number of states that are sent to the shards in the current round"""
+
+        self.run_shards(omni, goal)
+
+    def run_shards(self, omni, goal):
+        context = multiprocessing.get_context()
+        connections = []
+        processes = []
+        for shard in range(self.jobs):
+            parent, child = context.Pipe()
+            process = context.Process(target=_shard_main,
+                                      args=(child, omni, goal, shard, self.jobs, self.shard_options),
+                                      daemon=True)
+            process.start()
+            child.close()
+            connections.append(parent)
+            processes.append(process)
+
+        try:
+            initial_state = self.sim.initial_state
+            inboxes: list[list] = [list() for _ in range(self.jobs)]
+            key = self.canonical(initial_state)
+            inboxes[shard_hash(key) % self.jobs].append((initial_state, key))
+
+            while any(inboxes):
+                self.rounds += 1
+                self.in_flight = sum(map(len, inboxes))
+                if self.verbosity >= 1:
+                    self.debug_print(self.verbosity)
+
+                for connection, inbox in zip(connections, inboxes):
+                    connection.send((inbox, self.energies))
+
+                inboxes = [list() for _ in range(self.jobs)]
+                for connection in connections:
+                    outgoing, energies = connection.recv()
+                    for inbox, states in zip(inboxes, outgoing):
+                        inbox.extend(states)
+                    self.energies = list(map(min, self.energies, energies))
+
+            for connection in connections:
+                connection.send(None)
+            self.merge([connection.recv() for connection in connections])
+        finally:
+            for connection in connections:
+                connection.close()
+            for process in processes:
+                process.join()
+
+    def open_count(self) -> int:
+        return self.in_flight
+
+    def merge(self, results: list[dict]):
+        self.energies = [min(r["energies"][d] for r in results) for d in range(self.nr_levels)]
+        self.counts = [sum(r["counts"][d] for r in results) for d in range(self.nr_levels)]
+
+        def optimal(d):
+            return [r for r in results if r["energies"][d] == self.energies[d]]
+
+        self.min_counts = [sum(r["min_counts"][d] for r in optimal(d)) for d in range(self.nr_levels)]
+        if self.symmetries is not None:
+            self.raw_counts = [sum(r["raw_counts"][d] for r in results) for d in range(self.nr_levels)]
+            self.raw_min_counts = [sum(r["raw_min_counts"][d] for r in optimal(d))
+                                   for d in range(self.nr_levels)]
+        if self.collect_crystals:
+            self.crystals = [[c for r in optimal(d) for c in r["crystals"][d]] for d in range(self.nr_levels)]
+        if self.instrumentation is not None:
+            for r in results:
+                self.instrumentation.merge(r["instrumentation"])
@@ -0,0 +1,58 @@
+"""Measures how long every module takes to import, for `--startup-trace`.
+
+This is installed by the package before it imports anything else, so it must
+only use modules that are already loaded when the interpreter starts."""
+import atexit
+import builtins
+import sys
+import time
+
+_original_import = builtins.__import__
+_start = time.perf_counter()
+_stack: list[float] = []
+_records: dict[str, tuple[float, float]] = {}
+"""Cumulative and self time of every traced module"""
+
+
+def _resolve(name: str, globals, level: int) -> str:
+    if level == 0:
+        return name
+    package = (globals or {}).get("__package__") or ""
+    base = package.rsplit(".", level - 1)[0] if level > 1 else package
+    return f"{base}.{name}" if name else base
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    full = _resolve(name, globals, level)
+    if full in sys.modules:
+        # `from package import module` may still load the module
+        missing = [f"{full}.{f}" for f in fromlist or () if f != "*" and f"{full}.{f}" not in sys.modules]
+        if len(missing) == 0:
+            return _original_import(name, globals, locals, fromlist, level)
+        full = missing[0]
+
+    _stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        children = _stack.pop()
+        if len(_stack) > 0:
+            _stack[-1] += elapsed
+        _records.setdefault(full, (elapsed, elapsed - children))
+
+
+def report(file=None, top: int = 25):
+    file = file or sys.stderr
+    total = sum(self for _, self in _records.values())
+    print(f"Imports took {total * 1000:.1f}ms of {(time.perf_counter() - _start) * 1000:.1f}ms "
+          f"({len(_records)} modules), the slowest were:", file=file)
+    print(f"{'cumulative':>12} {'self':>10}  module", file=file)
+    for name, (cumulative, self) in sorted(_records.items(), key=lambda item: -item[1][0])[:top]:
+        print(f"{cumulative * 1000:10.1f}ms {self * 1000:8.1f}ms  {name}", file=file)
+
+
+def install():
+    builtins.__import__ = _timed_import
+    atexit.register(report)
@@ -1,8 +1,38 @@
 import abc
-from typing import Any
+import bisect
+import functools
+import hashlib
+import random
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+_MODULUS = (1 << 127) - 1
+_bases: list[int] = []
+_rng = random.Random(0x3e55)
+
+
+@functools.cache
+def _term(atom) -> int:
+    r"""The contribution $\prod_i b_i^{a_i}$ of an atom to the polynomial hash of a crystal,
+    translating a crystal by $t$ multiplies its hash by $\prod_i b_i^{t_i}$"""
+    while len(_bases) < len(atom):
+        _bases.append(_rng.randrange(2, _MODULUS - 1))
+
+    term = 1
+    for base, a in zip(_bases, atom):
+        term = term * pow(base, a, _MODULUS) % _MODULUS
+    return term
+
+
+@functools.cache
+def _inverse_term(atom) -> int:
+    return pow(_term(atom), -1, _MODULUS)
 
 
 class AbstractCrystal(abc.ABC):
+    __slots__ = ()
+
     @classmethod
     @abc.abstractmethod
     def wrap_atom(cls, atom) -> 'AbstractCrystal': pass
@@ -38,6 +68,37 @@ class AbstractCrystal(abc.ABC):
     def first(self):
         return next(self.atoms())
 
+    def translation_hash(self) -> int:
+        """A hash that is the same for all translations of this crystal"""
+        if self.size == 0:
+            return 324142
+        m = self.first()
+        return hash(tuple(tuple(a[i] - m[i] for i in range(len(a))) for a in self.atoms()))
+
+    def translation_equals(self, other: 'AbstractCrystal') -> bool:
+        """Whether `other` is a translation of this crystal"""
+        if self.size != other.size:
+            return False
+        if self.size == 0:
+            return True
+
+        m1 = self.first()
+        m2 = other.first()
+
+        for a1, a2 in zip(self.atoms(), other.atoms()):
+            for i in range(len(a1)):
+                if a1[i] - m1[i] != a2[i] - m2[i]:
+                    return False
+        return True
+
+    def fingerprint(self) -> int:
+        """A hash of up to 128 bits that equal crystals share and different ones almost never do"""
+        return hash(self)
+
+    def translation_fingerprint(self) -> int:
+        """Like `fingerprint`, but the same for all translations of this crystal"""
+        return self.translation_hash()
+
     @abc.abstractmethod
     def __hash__(self) -> int: pass
 
@@ -50,39 +111,85 @@ class AbstractCrystal(abc.ABC):
 
 class TICrystal:
     def __init__(self, crystal: AbstractCrystal):
-        if crystal.size != 0:
-            self.minus = crystal.first()
         self.crystal = crystal
 
+    def fingerprint(self) -> int:
+        return self.crystal.translation_fingerprint()
+
     def __hash__(self) -> int:
-        if self.crystal.size == 0:
-            return 324142
-        m = self.minus
-        return hash(tuple(tuple(a[i] - m[i] for i in range(len(a))) for a in self.crystal.atoms()))
+        return self.crystal.translation_hash()
 
     def __eq__(self, other: Any) -> bool:
         assert isinstance(other, TICrystal)
-        if self.crystal.size == 0:
-            return other.crystal.size == 0
+        return self.crystal.translation_equals(other.crystal)
 
-        m1 = self.minus
-        m2 = other.minus
 
-        for a1, a2 in zip(self.crystal.atoms(), other.crystal.atoms()):
-            for i in range(len(a1)):
-                if a1[i] - m1[i] != a2[i] - m2[i]:
-                    return False
-        return True
+class SymmetricCrystal:
+    """A crystal up to translations and a point group (given as integer matrices acting on
+    the last coordinates of the atoms). It is represented by the smallest of the
+    translation normalised images of the crystal under the group."""
+
+    def __init__(self, crystal: AbstractCrystal, group: Sequence[np.ndarray]):
+        self.crystal = crystal
+        if crystal.size == 0:
+            self.key = b""
+            self.orbit_size = 1
+            return
+
+        atoms = np.array(list(crystal.atoms()), dtype=np.int64)
+        fixed = atoms.shape[1] - group[0].shape[0]
+        matrices = np.array(group)
+
+        images = np.empty((len(group), *atoms.shape), dtype=np.int64)
+        images[:, :, :fixed] = atoms[:, :fixed]
+        images[:, :, fixed:] = np.einsum("gij,nj->gni", matrices, atoms[:, fixed:])
+        images -= images.min(axis=1, keepdims=True)
+
+        # Encode every atom as one int, so an image is a sorted row of ints
+        base = int(images.max()) + 1
+        if base ** atoms.shape[1] >= 2 ** 63:
+            raise OverflowError("Crystal is too large for symmetry reduction")
+        rows = np.sort(images @ (base ** np.arange(atoms.shape[1], dtype=np.int64)), axis=1)
+
+        smallest = np.lexsort(rows.T[::-1])[0]
+        self.key = rows[smallest].tobytes() + base.to_bytes(8)
+        self.orbit_size = len(np.unique(rows, axis=0))
+        """The number of crystals (up to translation) that are equivalent to this one"""
+
+    def fingerprint(self) -> int:
+        return int.from_bytes(hashlib.blake2b(self.key, digest_size=16).digest())
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __eq__(self, other: Any) -> bool:
+        assert isinstance(other, SymmetricCrystal)
+        return self.key == other.key
 
 
 class DumbCrystal(AbstractCrystal):
-    def __init__(self, atoms: frozenset):
+    """A crystal as a frozenset of atoms. It carries a polynomial hash over the
+    coordinates and its smallest atom (the anchor), which are updated in O(1)
+    by `add_atom` and `remove_atom` (unless the anchor is removed). Together
+    they give a translation invariant hash without looking at every atom."""
+
+    def __init__(self, atoms: frozenset, _hash: Optional[int] = None, _anchor=None):
         self._atoms = atoms
+        if _hash is None:
+            _hash = sum(map(_term, atoms)) % _MODULUS
+            _anchor = min(atoms, default=None)
+        self._hash = _hash
+        self._anchor = _anchor
+        self._translation_hash: Optional[int] = None
 
     @classmethod
     def wrap_atom(cls, atom) -> 'AbstractCrystal':
         return cls(frozenset([atom]))
 
+    @classmethod
+    def wrap_atoms(cls, atoms) -> 'AbstractCrystal':
+        return cls(frozenset(atoms))
+
     @classmethod
     def empty(cls) -> 'AbstractCrystal':
         return cls(frozenset())
@@ -92,10 +199,18 @@ class DumbCrystal(AbstractCrystal):
         return len(self._atoms)
 
     def add_atom(self, atom) -> 'AbstractCrystal':
-        return self.__class__(self._atoms | frozenset([atom]))
+        if atom in self._atoms:
+            return self
+        anchor = atom if self._anchor is None else min(self._anchor, atom)
+        return self.__class__(self._atoms | frozenset([atom]), (self._hash + _term(atom)) % _MODULUS, anchor)
 
     def remove_atom(self, atom) -> 'AbstractCrystal':
-        return self.__class__(self._atoms ^ frozenset([atom]))
+        if atom not in self._atoms:
+            return self.add_atom(atom)
+
+        atoms = self._atoms - frozenset([atom])
+        anchor = self._anchor if atom != self._anchor else min(atoms, default=None)
+        return self.__class__(atoms, (self._hash - _term(atom)) % _MODULUS, anchor)
 
     def diff(self, other: 'AbstractCrystal'):
         assert isinstance(other, DumbCrystal)
@@ -105,12 +220,196 @@ class DumbCrystal(AbstractCrystal):
     def atoms(self):
         yield from sorted(self._atoms)
 
+    def first(self):
+        return self._anchor
+
+    def translation_hash(self) -> int:
+        if self._translation_hash is None:
+            if self._anchor is None:
+                self._translation_hash = 0
+            else:
+                self._translation_hash = self._hash * _inverse_term(self._anchor) % _MODULUS
+        return self._translation_hash
+
+    def translation_equals(self, other: AbstractCrystal) -> bool:
+        if not isinstance(other, DumbCrystal):
+            return super().translation_equals(other)
+        if self.size != other.size or self.translation_hash() != other.translation_hash():
+            return False
+        if self.size == 0:
+            return True
+
+        offset = tuple(b - a for a, b in zip(self._anchor, other._anchor))
+        other_atoms = other._atoms
+        return all(tuple(x + o for x, o in zip(atom, offset)) in other_atoms for atom in self._atoms)
+
+    def fingerprint(self) -> int:
+        return self._hash
+
     def __hash__(self) -> int:
-        return hash(self._atoms)
+        return self._hash
 
     def __eq__(self, other: Any) -> bool:
         return isinstance(other, DumbCrystal) and self._atoms == other._atoms
 
+
+def _write_varint(out: bytearray, value: int):
+    """Append `value` zigzag and varint encoded"""
+    value = 2 * value if value >= 0 else -2 * value - 1
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varints(data: bytes, i: int, count: int) -> tuple[list[int], int]:
+    """Read `count` zigzag varints from `data` starting at `i`"""
+    values = []
+    for _ in range(count):
+        value = shift = 0
+        while True:
+            byte = data[i]
+            i += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        values.append(value >> 1 if value & 1 == 0 else -(value >> 1) - 1)
+    return values, i
+
+
+class PackedCrystal(AbstractCrystal):
+    """A crystal as one bytes object. It starts with the smallest atom (the anchor),
+    followed by the translation normalised part: the number of atoms, their length
+    and the differences between consecutive sorted atoms, all as zigzag varints.
+    Translations of a crystal share everything after the anchor."""
+
+    __slots__ = ("_data", "_split")
+
+    def __init__(self, data: bytes, split: int):
+        self._data = data
+        self._split = split
+
+    @classmethod
+    def from_sorted(cls, atoms: list) -> 'PackedCrystal':
+        if len(atoms) == 0:
+            return cls(b"", 0)
+
+        out = bytearray()
+        for x in atoms[0]:
+            _write_varint(out, x)
+        split = len(out)
+        _write_varint(out, len(atoms))
+        _write_varint(out, len(atoms[0]))
+
+        previous = atoms[0]
+        for atom in atoms[1:]:
+            for a, p in zip(atom, previous):
+                _write_varint(out, a - p)
+            previous = atom
+        return cls(bytes(out), split)
+
+    @classmethod
+    def wrap_atom(cls, atom) -> 'AbstractCrystal':
+        return cls.from_sorted([tuple(atom)])
+
+    @classmethod
+    def wrap_atoms(cls, atoms) -> 'AbstractCrystal':
+        return cls.from_sorted(sorted(set(map(tuple, atoms))))
+
+    @classmethod
+    def empty(cls) -> 'AbstractCrystal':
+        return cls(b"", 0)
+
+    def _header(self) -> tuple[int, int, int]:
+        """The number of atoms, their length and where the differences start"""
+        if len(self._data) == 0:
+            return 0, 0, 0
+        (size, width), i = _read_varints(self._data, self._split, 2)
+        return size, width, i
+
+    @property
+    def size(self) -> int:
+        return self._header()[0]
+
+    def _atoms(self) -> list:
+        size, width, i = self._header()
+        if size == 0:
+            return []
+
+        data = self._data
+        previous = tuple(_read_varints(data, 0, width)[0])
+        atoms = [previous]
+        for _ in range(size - 1):
+            delta, i = _read_varints(data, i, width)
+            previous = tuple(p + d for p, d in zip(previous, delta))
+            atoms.append(previous)
+        return atoms
+
+    def add_atom(self, atom) -> 'AbstractCrystal':
+        atoms = self._atoms()
+        i = bisect.bisect_left(atoms, atom)
+        if i < len(atoms) and atoms[i] == atom:
+            return self
+        atoms.insert(i, tuple(atom))
+        return self.from_sorted(atoms)
+
+    def remove_atom(self, atom) -> 'AbstractCrystal':
+        atoms = self._atoms()
+        i = bisect.bisect_left(atoms, atom)
+        if i == len(atoms) or atoms[i] != atom:
+            return self.add_atom(atom)
+        del atoms[i]
+        return self.from_sorted(atoms)
+
+    def diff(self, other: 'AbstractCrystal'):
+        assert isinstance(other, PackedCrystal)
+        mine = self._atoms()
+        theirs = other._atoms()
+        i = j = 0
+        while i < len(mine) and j < len(theirs):
+            if mine[i] == theirs[j]:
+                i += 1
+                j += 1
+            elif mine[i] < theirs[j]:
+                yield 0, mine[i]
+                i += 1
+            else:
+                yield 1, theirs[j]
+                j += 1
+        for atom in mine[i:]:
+            yield 0, atom
+        for atom in theirs[j:]:
+            yield 1, atom
+
+    def atoms(self):
+        yield from self._atoms()
+
+    def first(self):
+        if len(self._data) == 0:
+            return None
+        return tuple(_read_varints(self._data, 0, self._header()[1])[0])
+
+    def translation_hash(self) -> int:
+        return hash(self._data[self._split:])
+
+    def translation_equals(self, other: AbstractCrystal) -> bool:
+        if not isinstance(other, PackedCrystal):
+            return super().translation_equals(other)
+        return self._data[self._split:] == other._data[other._split:]
+
+    def fingerprint(self) -> int:
+        return int.from_bytes(hashlib.blake2b(self._data, digest_size=16).digest())
+
+    def translation_fingerprint(self) -> int:
+        return int.from_bytes(hashlib.blake2b(self._data[self._split:], digest_size=16).digest())
+
+    def __hash__(self) -> int:
+        return hash(self._data)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, PackedCrystal) and self._data == other._data
+
 # class FMCrystal(AbstractCrystal):
 #     def __init__(self, fm):
 #         self.fm = fm
@@ -1,43 +1,38 @@
 import logging
-from typing import Any
+from typing import Optional
 
 from messthaler_wulff._additive_simulation import OmniSimulation
-from messthaler_wulff.abstract_crystal_store import DumbCrystal
+from messthaler_wulff.abstract_crystal_store import AbstractCrystal, DumbCrystal
+from messthaler_wulff.energy_cache import EnergyCache, NoEnergyCache
+from messthaler_wulff.instrumentation import current as current_instrumentation
 
 log = logging.getLogger("messthaler_wulff")
 
 
 class AdvancedSimulation:
-    def __init__(self, omni: OmniSimulation):
+    def __init__(self, omni: OmniSimulation, abstract_crystal: type[AbstractCrystal] = DumbCrystal,
+                 energy_cache: Optional[EnergyCache] = None):
         self.omni = omni
-        self.abstract_crystal = DumbCrystal
+        self.abstract_crystal = abstract_crystal
 
         self.initial_state = self.abstract_crystal.wrap_atoms(omni.points())
         self.initial_atom_count = omni.atoms
         self.current_state = self.initial_state
 
-        self.energies: dict[Any, int] = {}
+        # Explorers ask for the energy of every state once, so by default nothing is kept,
+        # like `explore --energy-cache none`
+        self.energy_cache = NoEnergyCache() if energy_cache is None else energy_cache
+        self.instrumentation = current_instrumentation()
 
-    @staticmethod
-    def cached(cache_name):
-        def deco(function):
-            def impl(self, state):
-                cache = getattr(self, cache_name)
-                if state in cache:
-                    return cache[state]
-                else:
-                    value = function(self, state)
-                    cache[state] = value
-                    return value
-
-            return impl
-
-        return deco
-
-    @cached("energies")
     def energy(self, state):
-        self.goto(state)
-        return self.omni.energy
+        energy = self.energy_cache.get(state)
+        if self.instrumentation is not None:
+            self.instrumentation.count("energy.cache_misses" if energy is None else "energy.cache_hits")
+        if energy is None:
+            self.goto(state)
+            energy = self.omni.energy
+            self.energy_cache.put(state, energy)
+        return energy
 
     def previous_states(self, state):
         self.goto(state)
@@ -61,15 +56,21 @@ class AdvancedSimulation:
         if state == self.current_state:
             return
 
-        for direction, atom in self.current_state.diff(state):
+        diff = self.current_state.diff(state)
+        if self.instrumentation is not None:
+            diff = list(diff)
+            self.instrumentation.observe("goto.diff_length", len(diff))
+
+        for direction, atom in diff:
             self.set_atom(atom, direction)
 
         assert self.current_state == state
 
 
 class DirectionalSimulation:
-    def __init__(self, omni: OmniSimulation, direction: int):
-        self.sim = AdvancedSimulation(omni)
+    def __init__(self, omni: OmniSimulation, direction: int, abstract_crystal: type[AbstractCrystal] = DumbCrystal,
+                 energy_cache: Optional[EnergyCache] = None):
+        self.sim = AdvancedSimulation(omni, abstract_crystal, energy_cache)
         self.initial_state = self.sim.initial_state
         self.initial_atom_count = self.sim.initial_atom_count
         self.direction = direction
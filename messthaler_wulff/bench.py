@@ -0,0 +1,205 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import random
+import sys
+import time
+from typing import Callable
+
+import numpy as np
+
+from messthaler_wulff._additive_simulation import LatticeSimulation, OmniSimulation, SimpleNeighborhood
+from messthaler_wulff.datastructures.lattice import Lattice, UniformNeighborhood
+from messthaler_wulff.datastructures.priority_stack import PriorityMode, PriorityStack
+from messthaler_wulff.sim.additive_simulation import AdditiveSimulation, Mode
+from messthaler_wulff.sim.crystal import Crystal
+from messthaler_wulff.sim.energy import SurfaceEnergy
+
+log = logging.getLogger("messthaler_wulff")
+log.debug(f"Loading {__name__}")
+
+SIZES = {"full": dict(atoms=2000, toggles=20_000, goal=10, stack=200_000, lookups=200_000),
+         "quick": dict(atoms=100, toggles=1000, goal=5, stack=10_000, lookups=10_000)}
+"""How much work every benchmark does, `quick` is for checking that the suite works"""
+
+LOWER_IS_BETTER = ("_bytes",)
+"""Suffixes of metrics where smaller values are better, all other metrics are rates"""
+
+
+def best_rate(function: Callable[[], int], repeat: int) -> float:
+    """Run `function`, which returns how many operations it did, `repeat` times and return
+    the best rate in operations per second"""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operations = function()
+        best = max(best, operations / max(time.perf_counter() - start, 1e-9))
+    return best
+
+
+def toggle_sequence(lattice: Lattice, atoms: int, toggles: int, seed: int = 0) -> list[int]:
+    """Grow a crystal to `atoms` atoms, then add and remove random optimal atoms until there
+    were `toggles` toggles in total. Every engine replays the same nodes."""
+    rng = random.Random(seed)
+    sim = AdditiveSimulation(lattice)
+    nodes = []
+    for i in range(toggles):
+        mode = Mode.FORWARDS if i < atoms or sim.size < atoms // 2 or rng.random() < 0.5 else Mode.BACKWARDS
+        node = rng.choice(sim.next(mode))
+        sim.toggle(node)
+        nodes.append(node)
+    return nodes
+
+
+def bench_toggles(neighborhood: SimpleNeighborhood, sizes: dict, repeat: int) -> dict:
+    lattice = Lattice(UniformNeighborhood(sorted(neighborhood.base_neighborhood)))
+    nodes = toggle_sequence(lattice, sizes["atoms"], sizes["toggles"])
+    dimension = len(next(iter(neighborhood.base_neighborhood)))
+    atoms = [(0, *lattice.repr(node)) for node in nodes]
+
+    def additive():
+        sim = AdditiveSimulation(lattice)
+        for node in nodes:
+            sim.toggle(node)
+        return len(nodes)
+
+    def crystal():
+        c = Crystal(lattice)
+        SurfaceEnergy(c)
+        for node in nodes:
+            c.toggle(node)
+        return len(nodes)
+
+    def omni(engine):
+        def run():
+            sim = engine(neighborhood, None, tuple([0] * (dimension + 1)))
+            inside = set()
+            for atom in atoms:
+                mode = OmniSimulation.BACKWARDS if atom in inside else OmniSimulation.FORWARDS
+                sim.force_set_atom(atom, mode)
+                inside.symmetric_difference_update([atom])
+            return len(atoms)
+
+        return run
+
+    return dict(additive_toggles_per_s=best_rate(additive, repeat),
+                crystal_toggles_per_s=best_rate(crystal, repeat),
+                omni_toggles_per_s=best_rate(omni(OmniSimulation), repeat),
+                lattice_omni_toggles_per_s=best_rate(omni(LatticeSimulation), repeat))
+
+
+def peak_rss() -> int:
+    """The peak resident memory of this process in bytes"""
+    try:
+        import resource
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().rss
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _explore(transform: np.ndarray, goal: int, engine: str) -> dict:
+    from messthaler_wulff._additive_simulation import ENGINES
+    from messthaler_wulff._explorative_simulation import ExplorativeSimulation
+    from messthaler_wulff.energy_cache import NoEnergyCache
+
+    neighborhood = SimpleNeighborhood(transform)
+    omni = ENGINES[engine](neighborhood, None, tuple([0] * (len(transform) + 1)))
+    start = time.perf_counter()
+    # Like explore from the command line, which keeps no energies by default
+    explorer = ExplorativeSimulation(omni, goal, energy_cache=NoEnergyCache())
+    seconds = time.perf_counter() - start
+    return dict(states=sum(explorer.counts), seconds=seconds, peak_rss_bytes=peak_rss())
+
+
+def bench_explore(transform: np.ndarray, sizes: dict, repeat: int) -> dict:
+    """Explore in a freshly spawned process every time, so the peak memory is that of the exploration
+    and not inherited from this process"""
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for engine in ["lattice", "tuple"]:
+        runs = []
+        for _ in range(repeat):
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                runs.append(executor.submit(_explore, transform, sizes["goal"], engine).result())
+        best = min(runs, key=lambda run: run["seconds"])
+        results[f"{engine}_explore_states_per_s"] = best["states"] / max(best["seconds"], 1e-9)
+        results[f"{engine}_explore_peak_rss_bytes"] = min(run["peak_rss_bytes"] for run in runs)
+    return results
+
+
+def bench_priority_stack(degree: int, sizes: dict, repeat: int) -> dict:
+    rng = np.random.default_rng(0)
+    count = sizes["stack"]
+    values = rng.integers(0, count // 10 + 1, count).tolist()
+    keys = rng.integers(0, degree + 1, count).tolist()
+    deletes = (rng.random(count) < 0.3).tolist()
+
+    def run():
+        stack = PriorityStack(PriorityMode.MIN, degree + 1)
+        for value, key, delete in zip(values, keys, deletes):
+            if delete and value in stack:
+                del stack[value]
+            else:
+                stack[value] = key
+            stack.extrema()
+        return count
+
+    return dict(priority_stack_ops_per_s=best_rate(run, repeat))
+
+
+def bench_neighbors(neighborhood: SimpleNeighborhood, sizes: dict, repeat: int) -> dict:
+    lattice = Lattice(UniformNeighborhood(sorted(neighborhood.base_neighborhood)))
+    count = sizes["lookups"]
+    # Fill the neighbors of a ball of nodes first, so only lookups are measured
+    filled = 0
+    while filled < count // 10:
+        lattice.neighbors(filled)
+        filled += 1
+    nodes = [i % filled for i in range(count)]
+    atoms = [(0, *lattice.repr(node)) for node in nodes]
+
+    def lattice_lookups():
+        for node in nodes:
+            lattice.neighbors(node)
+        return count
+
+    def tuple_lookups():
+        for atom in atoms:
+            neighborhood(atom)
+        return count
+
+    return dict(lattice_neighbors_per_s=best_rate(lattice_lookups, repeat),
+                tuple_neighbors_per_s=best_rate(tuple_lookups, repeat))
+
+
+def run_suite(lattices: dict[str, np.ndarray], size: str = "full", repeat: int = 3) -> dict:
+    """Run all benchmarks for every lattice, given by name and transform"""
+    sizes = SIZES[size]
+    results = {}
+    for name, transform in lattices.items():
+        neighborhood = SimpleNeighborhood(transform)
+        log.info(f"Benchmarking the {name} lattice")
+        results[name] = {**bench_toggles(neighborhood, sizes, repeat),
+                         **bench_explore(transform, sizes, repeat),
+                         **bench_priority_stack(neighborhood.energy_maximum(), sizes, repeat),
+                         **bench_neighbors(neighborhood, sizes, repeat)}
+    return results
+
+
+def regressions(baseline: dict, results: dict, threshold: float) -> list[str]:
+    """The metrics of `results` that are worse than in `baseline` by more than `threshold`"""
+    failures = []
+    for lattice, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(lattice, {}).get(metric)
+            if old is None or old == 0:
+                continue
+            change = value / old - 1
+            if metric.endswith(LOWER_IS_BETTER):
+                change = -change
+            if change < -threshold:
+                failures.append(f"{lattice} {metric}: {old:,.0f} -> {value:,.0f} ({change:+.1%})")
+    return failures
@@ -0,0 +1,215 @@
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+log = logging.getLogger("messthaler_wulff")
+
+SUFFIX = ".mwc"
+MAGIC = b"MWCA"
+VERSION = 1
+
+BIDI = 1
+TI = 2
+SYMMETRY = 4
+REQUIRE_ENERGY = 8
+LATTICE = 16
+
+HEADER = np.dtype([("magic", "S4"), ("version", "<u4"), ("itemsize", "<u4"), ("flags", "<u4"),
+                   ("width", "<u4"), ("dimension", "<u4"), ("require_energy", "<i8"),
+                   ("count", "<u8"), ("atoms", "<u8"), ("index_offset", "<u8")])
+"""The header of an archive, `index_offset` is 0 while the archive is still being written"""
+
+DTYPES = {2: np.dtype("<i2"), 4: np.dtype("<i4")}
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _data_offset(dimension: int) -> int:
+    return _align(HEADER.itemsize + 8 * dimension * dimension)
+
+
+class CrystalArchiveWriter:
+    """Writes crystals to a binary archive one at a time. The layout is the header, the lattice
+    transform as a `(dimension, dimension)` float64 array, the coordinates of all atoms as one
+    `(atoms, width)` int16 or int32 array and finally the index: `count + 1` uint64 offsets
+    into the atoms, so crystal `k` are the atoms `offsets[k]:offsets[k + 1]`. The index and
+    the header are written by `close`. Coordinates start out as int16 and the archive is
+    widened to int32 once an atom does not fit."""
+
+    def __init__(self, path, width: int, lattice: Optional[np.ndarray] = None, bidi=False, ti=False,
+                 symmetry=False, require_energy: Optional[int] = None, dtype=np.int16):
+        self.path = Path(path)
+        self.width = width
+        self.dimension = width - 1 if lattice is None else len(lattice)
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.offsets = [0]
+
+        self.header = np.zeros((), dtype=HEADER)
+        self.header["magic"] = MAGIC
+        self.header["version"] = VERSION
+        self.header["width"] = width
+        self.header["dimension"] = self.dimension
+        self.header["flags"] = ((BIDI if bidi else 0) | (TI if ti else 0) | (SYMMETRY if symmetry else 0)
+                                | (REQUIRE_ENERGY if require_energy is not None else 0)
+                                | (LATTICE if lattice is not None else 0))
+        self.header["require_energy"] = require_energy or 0
+
+        self.file = open(self.path, "wb")
+        self.file.write(self.header.tobytes())
+        if lattice is not None:
+            self.file.write(np.asarray(lattice, dtype="<f8").tobytes())
+        self.file.seek(_data_offset(self.dimension))
+
+    def add(self, atoms):
+        coordinates = np.asarray(atoms, dtype=np.int64).reshape(-1, self.width)
+        if len(coordinates) > 0:
+            limits = np.iinfo(self.dtype)
+            if coordinates.min() < limits.min or coordinates.max() > limits.max:
+                self._widen()
+        self.file.write(coordinates.astype(self.dtype).tobytes())
+        self.offsets.append(self.offsets[-1] + len(coordinates))
+
+    def _widen(self):
+        if self.dtype.itemsize == 4:
+            raise OverflowError(f"Coordinates of crystals in {self.path} do not fit into 32 bits")
+        log.debug(f"Widening coordinates of {self.path} to 32 bits")
+
+        start = _data_offset(self.dimension)
+        self.file.flush()
+        data = np.fromfile(self.path, dtype=self.dtype, count=self.offsets[-1] * self.width, offset=start)
+        self.dtype = DTYPES[4]
+        self.file.seek(start)
+        self.file.write(data.astype(self.dtype).tobytes())
+
+    def add_all(self, crystals: Iterable):
+        for atoms in crystals:
+            self.add(atoms)
+
+    def close(self):
+        if self.file.closed:
+            return
+        index_offset = _align(self.file.tell())
+        self.file.seek(index_offset)
+        self.file.write(np.array(self.offsets, dtype="<u8").tobytes())
+
+        self.header["itemsize"] = self.dtype.itemsize
+        self.header["count"] = len(self.offsets) - 1
+        self.header["atoms"] = self.offsets[-1]
+        self.header["index_offset"] = index_offset
+        self.file.seek(0)
+        self.file.write(self.header.tobytes())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class CrystalArchive:
+    """Reads an archive written by `CrystalArchiveWriter` through a memory map. Opening it only
+    reads the header and `archive[k]` is a `(n, width)` view of the atoms of crystal `k`
+    without copying anything."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.data = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if len(self.data) < HEADER.itemsize:
+            raise ValueError(f"{self.path} is not a crystal archive")
+
+        header = self.data[:HEADER.itemsize].view(HEADER)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError(f"{self.path} is not a crystal archive")
+        if header["version"] != VERSION:
+            raise ValueError(f"{self.path} has unsupported version {header['version']}")
+        if header["index_offset"] == 0:
+            raise ValueError(f"{self.path} was not completely written")
+
+        self.header = header
+        self.width = int(header["width"])
+        self.dimension = int(header["dimension"])
+        self.flags = int(header["flags"])
+        count = int(header["count"])
+        atoms = int(header["atoms"])
+
+        start = _data_offset(self.dimension)
+        dtype = DTYPES[int(header["itemsize"])]
+        self.coordinates = self.data[start:start + atoms * self.width * dtype.itemsize].view(dtype) \
+            .reshape(atoms, self.width)
+        index_offset = int(header["index_offset"])
+        self.offsets = self.data[index_offset:index_offset + 8 * (count + 1)].view("<u8")
+
+    @property
+    def lattice(self) -> Optional[np.ndarray]:
+        if not self.flags & LATTICE:
+            return None
+        size = 8 * self.dimension * self.dimension
+        return self.data[HEADER.itemsize:HEADER.itemsize + size].view("<f8").reshape(self.dimension,
+                                                                                    self.dimension)
+
+    @property
+    def bidi(self) -> bool:
+        return bool(self.flags & BIDI)
+
+    @property
+    def ti(self) -> bool:
+        return bool(self.flags & TI)
+
+    @property
+    def symmetry(self) -> bool:
+        return bool(self.flags & SYMMETRY)
+
+    @property
+    def require_energy(self) -> Optional[int]:
+        return int(self.header["require_energy"]) if self.flags & REQUIRE_ENERGY else None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, k: int) -> np.ndarray:
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(f"Crystal {k} is not in {self.path}, which has {len(self)}")
+        return self.coordinates[int(self.offsets[k]):int(self.offsets[k + 1])]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for k in range(len(self)):
+            yield self[k]
+
+    def atoms(self, k: int) -> list[tuple]:
+        """The atoms of crystal `k` as tuples, like `parse_crystal` returns them"""
+        return list(map(tuple, self[k].tolist()))
+
+    def sizes(self) -> np.ndarray:
+        """The number of atoms of every crystal"""
+        return np.diff(self.offsets.astype(np.int64))
+
+
+def split_spec(spec: str) -> tuple[str, int]:
+    """Split `path@k` into the path and the index of a crystal, which is 0 if it is left out"""
+    path, _, k = spec.rpartition("@")
+    if path and k.lstrip("-").isdigit():
+        return path, int(k)
+    return spec, 0
+
+
+def is_archive_spec(spec: str) -> bool:
+    """Whether `spec` refers to a crystal of an archive as `path` or `path@k`"""
+    path, _ = split_spec(spec)
+    if not os.path.isfile(path):
+        return False
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def load_crystal(spec: str) -> list[tuple]:
+    """Load crystal `k` of the archive given as `path@k`, or the first one given just the path"""
+    path, k = split_spec(spec)
+    return CrystalArchive(path).atoms(k)
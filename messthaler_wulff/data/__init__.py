@@ -1,6 +1,9 @@
 import math
 import numpy as np
 
-fcc_transform = 1 / math.sqrt(2) * np.array([[1, 1, 0],
-                                             [1, 0, 1],
-                                             [0, 1, 1]])
+
+def fcc_transform() -> np.ndarray:
+    """The fcc lattice in the basis of three nearest neighbors"""
+    return 1 / math.sqrt(2) * np.array([[1, 1, 0],
+                                        [1, 0, 1],
+                                        [0, 1, 1]])
@@ -1,9 +1,16 @@
+from array import array
+from typing import Optional, override
+
+import numpy as np
+
+
 class defaultlist[T]:
     """Essentially just a rewrite of defaultdict, specialized for consecutive int indices"""
 
-    def __init__(self, default: T):
+    def __init__(self, default: T, size: int = 0):
+        """`size` entries are allocated up front, which is useful for graphs of known size"""
         self.default: T = default
-        self.values: list[T] = list()
+        self.values: list[T] = [default] * size
 
     def _ensure_capacity(self, key: int):
         l = self.values
@@ -21,5 +28,136 @@ class defaultlist[T]:
         self._ensure_capacity(key)
         self.values[key] = value
 
+    def gather(self, keys: np.ndarray) -> np.ndarray:
+        """The values at `keys` as an array"""
+        if len(keys) > 0:
+            self._ensure_capacity(int(keys.max()))
+        return np.fromiter(map(self.values.__getitem__, keys.tolist()), dtype=np.int64, count=len(keys))
+
+    def scatter(self, keys: np.ndarray, values: np.ndarray) -> None:
+        """Set the values at `keys`"""
+        if len(keys) > 0:
+            self._ensure_capacity(int(keys.max()))
+        for key, value in zip(keys.tolist(), values.tolist()):
+            self.values[key] = value
+
+    def scatter_add(self, keys: np.ndarray, deltas: np.ndarray) -> None:
+        """Add `deltas` to the values at `keys`, repeated keys are accumulated"""
+        if len(keys) == 0:
+            return
+        self._ensure_capacity(int(keys.max()))
+        values = np.array(self.values)
+        np.add.at(values, keys, deltas)
+        self.values = values.tolist()
+
+    def __str__(self):
+        return str(self.values)
+
+
+class typeddefaultlist(defaultlist[int]):
+    """A `defaultlist` of small ints kept in a typed `array` that grows by doubling.
+
+    `view` hands out the contents as a NumPy array without copying. Growing replaces
+    the underlying array, so views taken before that no longer see later writes."""
+
+    typecode: str
+    dtype: type[np.integer]
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, default: int, size: int = 0):
+        self.default: int = default
+        self._length = size
+        self._values = array(self.typecode, [default]) * max(size, self.INITIAL_CAPACITY)
+
+    @property
+    def values(self) -> memoryview:
+        """The contents as a view, so writes like `values[i] = x` reach this list. It cannot
+        grow, use the list itself for that."""
+        return memoryview(self._values)[:self._length]
+
+    def _ensure_capacity(self, key: int):
+        if key < self._length:
+            return
+
+        capacity = len(self._values)
+        if key >= capacity:
+            while capacity <= key:
+                capacity *= 2
+            self._values = self._values + array(self.typecode, [self.default]) * (capacity - len(self._values))
+        self._length = key + 1
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key: int) -> int:
+        if key >= self._length:
+            self._ensure_capacity(key)
+        return self._values[key]
+
+    def __setitem__(self, key: int, value: int) -> None:
+        if key >= self._length:
+            self._ensure_capacity(key)
+        self._values[key] = value
+
+    def view(self) -> np.ndarray:
+        """The contents as a NumPy array sharing memory with this list"""
+        return np.frombuffer(self._values, dtype=self.dtype, count=self._length)
+
+    def fill(self, value: int, start: int = 0, stop: Optional[int] = None) -> None:
+        """Set all entries in `range(start, stop)` to `value`, growing the list if `stop` is past its end"""
+        if stop is None:
+            stop = self._length
+        if stop > 0:
+            self._ensure_capacity(stop - 1)
+        self.view()[start:stop] = value
+
+    def resize(self, size: int) -> None:
+        """Grow (with the default) or shrink the list to exactly `size` entries"""
+        if size > self._length:
+            self._ensure_capacity(size - 1)
+        else:
+            np.frombuffer(self._values, dtype=self.dtype)[size:self._length] = self.default
+            self._length = size
+
+    @override
+    def gather(self, keys: np.ndarray) -> np.ndarray:
+        if len(keys) > 0:
+            self._ensure_capacity(int(keys.max()))
+        return self.view()[keys].astype(np.int64)
+
+    @override
+    def scatter(self, keys: np.ndarray, values: np.ndarray) -> None:
+        if len(keys) > 0:
+            self._ensure_capacity(int(keys.max()))
+        self.view()[keys] = values
+
+    @override
+    def scatter_add(self, keys: np.ndarray, deltas: np.ndarray) -> None:
+        if len(keys) == 0:
+            return
+        self._ensure_capacity(int(keys.max()))
+
+        view = self.view()
+        if 8 * len(keys) < len(view):
+            np.add.at(view, keys, deltas)
+        else:
+            # For dense batches summing with bincount is far faster than ufunc.at
+            view += np.bincount(keys, weights=deltas, minlength=len(view)).astype(self.dtype)
+
     def __str__(self):
-        return str(self.values)
\ No newline at end of file
+        return str(self.values.tolist())
+
+
+class defaultlist8(typeddefaultlist):
+    typecode = "b"
+    dtype = np.int8
+
+
+class defaultlist16(typeddefaultlist):
+    typecode = "h"
+    dtype = np.int16
+
+
+class defaultlist32(typeddefaultlist):
+    typecode = "i"
+    dtype = np.int32
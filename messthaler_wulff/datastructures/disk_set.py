@@ -0,0 +1,168 @@
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+log = logging.getLogger("messthaler_wulff")
+log.debug(f"Loading {__name__}")
+
+_LOW = (1 << 64) - 1
+_MASK = (1 << 128) - 1
+
+
+class _Run:
+    """A sorted, immutable array of fingerprints (as (high, low) pairs) in a memory-mapped file"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.data = np.load(path, mmap_mode="r")
+        self.high = self.data[:, 0]
+        self.low = self.data[:, 1]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, item: tuple[np.uint64, np.uint64]) -> bool:
+        high, low = item
+        i = int(np.searchsorted(self.high, high))
+        while i < len(self.data) and self.high[i] == high:
+            if self.low[i] == low:
+                return True
+            i += 1
+        return False
+
+
+class DiskFingerprintSet:
+    """A set of 128-bit fingerprints for sets that do not fit into memory. New fingerprints
+    go into an in-memory buffer, a full buffer is written to disk as a sorted run and runs
+    are merged by a background thread whenever a run is not larger than all newer runs
+    together. Run sizes therefore grow geometrically and there are logarithmically many."""
+
+    def __init__(self, directory=None, buffer_size: int = 1 << 20, chunk_size: int = 1 << 20):
+        self.directory = Path(tempfile.mkdtemp(prefix="visited-", dir=directory))
+        self.buffer_size = buffer_size
+        self.chunk_size = chunk_size
+
+        self.buffer: set[int] = set()
+        self.runs: list[_Run] = []
+        self._length = 0
+        self._run_count = 0
+        self._lock = threading.Lock()
+        self._merger: Optional[threading.Thread] = None
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def __len__(self):
+        return self._length
+
+    @staticmethod
+    def split(fingerprint: int) -> tuple[np.uint64, np.uint64]:
+        fingerprint &= _MASK
+        return np.uint64(fingerprint >> 64), np.uint64(fingerprint & _LOW)
+
+    def __contains__(self, fingerprint: int) -> bool:
+        fingerprint &= _MASK
+        if fingerprint in self.buffer:
+            return True
+        item = self.split(fingerprint)
+        return any(item in run for run in self.runs)
+
+    def add(self, fingerprint: int) -> bool:
+        """Add `fingerprint` and return whether it was not in the set before"""
+        if fingerprint in self:
+            return False
+
+        self.buffer.add(fingerprint & _MASK)
+        self._length += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+        return True
+
+    def _new_path(self) -> Path:
+        with self._lock:
+            self._run_count += 1
+            return self.directory / f"run-{self._run_count}.npy"
+
+    def flush(self):
+        """Write the buffer to disk as a new run"""
+        if len(self.buffer) == 0:
+            return
+
+        values = np.array([(f >> 64, f & _LOW) for f in self.buffer], dtype=np.uint64)
+        values = values[np.lexsort((values[:, 1], values[:, 0]))]
+        path = self._new_path()
+        np.save(path, values)
+        run = _Run(path)
+
+        with self._lock:
+            self.runs = self.runs + [run]
+        self.buffer = set()
+
+        self._maybe_merge()
+
+    def _maybe_merge(self):
+        if self._merger is not None and self._merger.is_alive():
+            return
+
+        runs = self.runs
+        sizes = [len(run) for run in runs]
+        for start in range(len(runs) - 1):
+            if sizes[start] <= sum(sizes[start + 1:]):
+                self._merger = threading.Thread(target=self._merge, args=(start, runs[start:]), daemon=True)
+                self._merger.start()
+                return
+
+    def _merge(self, start: int, runs: list[_Run]):
+        path = self._new_path()
+        total = sum(map(len, runs))
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint64, shape=(total, 2))
+        positions = [0] * len(runs)
+        written = 0
+
+        # Every round copies all fingerprints up to a pivot from every run,
+        # so only about chunk_size fingerprints per run are in memory at once
+        while written < total:
+            pivot = min(run.high[min(p + self.chunk_size, len(run)) - 1]
+                        for run, p in zip(runs, positions) if p < len(run))
+            pieces = []
+            for i, run in enumerate(runs):
+                end = int(np.searchsorted(run.high, pivot, side="right"))
+                pieces.append(run.data[positions[i]:end])
+                positions[i] = end
+
+            block = np.concatenate(pieces)
+            block = block[np.lexsort((block[:, 1], block[:, 0]))]
+            out[written:written + len(block)] = block
+            written += len(block)
+
+        out.flush()
+        del out
+        merged = _Run(path)
+
+        with self._lock:
+            self.runs = self.runs[:start] + [merged] + self.runs[start + len(runs):]
+        log.debug(f"Merged {len(runs)} runs into {total:,} fingerprints")
+
+        for run in runs:
+            with contextlib.suppress(OSError):
+                os.remove(run.path)
+
+    def close(self):
+        """Wait for a running merge and delete all files"""
+        if self._merger is not None:
+            self._merger.join()
+        self.runs = []
+        self.buffer = set()
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -1,6 +1,8 @@
 import abc
 from typing import Sequence
 
+import numpy as np
+
 
 class Graph(abc.ABC):
     """Represent an abstract graph. Can be subclassed to create finite graphs, lattices, etc."""
@@ -21,6 +23,15 @@ class Graph(abc.ABC):
     def neighbors(self, node: int) -> Sequence[int]:
         ...
 
+    def neighbor_table(self, nodes: np.ndarray) -> np.ndarray:
+        """The neighbors of `nodes` as a `(len(nodes), max_degree)` array, rows of
+        nodes with a smaller degree are padded with -1"""
+        table = np.full((len(nodes), self.max_degree), -1, dtype=np.int64)
+        for i, node in enumerate(nodes):
+            neighbors = self.neighbors(node)
+            table[i, :len(neighbors)] = neighbors
+        return table
+
     def degree(self, node: int) -> int:
         return len(self.neighbors(node))
 
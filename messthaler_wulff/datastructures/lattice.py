@@ -1,13 +1,55 @@
+import itertools
 from typing import Sequence, Self
 
 import numpy as np
 
 from messthaler_wulff.datastructures import Universe
 from messthaler_wulff.datastructures.graph import Graph
-from messthaler_wulff.decorators import hacky_instance_cache
 
 type Vector = Sequence[int]
 
+TOLERANCE = 1e-9
+"""How much longer than 1 a neighbor vector may be because of rounding"""
+
+
+def lll_reduce(basis: np.ndarray, delta: float = 0.75) -> np.ndarray:
+    """The unimodular integer matrix `U` such that the columns of `basis @ U` are an
+    LLL-reduced basis of the same lattice, that is short and close to orthogonal"""
+    basis = np.array(basis, dtype=np.float64)
+    n = basis.shape[1]
+    unimodular = np.eye(n, dtype=np.int64)
+
+    def gram_schmidt():
+        orthogonal = np.zeros_like(basis)
+        mu = np.zeros((n, n))
+        for i in range(n):
+            orthogonal[:, i] = basis[:, i]
+            for j in range(i):
+                mu[i, j] = basis[:, i] @ orthogonal[:, j] / (orthogonal[:, j] @ orthogonal[:, j])
+                orthogonal[:, i] -= mu[i, j] * orthogonal[:, j]
+        return orthogonal, mu
+
+    orthogonal, mu = gram_schmidt()
+    k = 1
+    while k < n:
+        for j in range(k - 1, -1, -1):
+            q = round(mu[k, j])
+            if q != 0:
+                basis[:, k] -= q * basis[:, j]
+                unimodular[:, k] -= q * unimodular[:, j]
+                orthogonal, mu = gram_schmidt()
+
+        norms = np.einsum("ij,ij->j", orthogonal, orthogonal)
+        if norms[k] >= (delta - mu[k, k - 1] ** 2) * norms[k - 1]:
+            k += 1
+        else:
+            basis[:, [k - 1, k]] = basis[:, [k, k - 1]]
+            unimodular[:, [k - 1, k]] = unimodular[:, [k, k - 1]]
+            orthogonal, mu = gram_schmidt()
+            k = max(k - 1, 1)
+
+    return unimodular
+
 
 class UniformNeighborhood:
     """A neighborhood of nodes in a graph that has the same degree and structure at every point"""
@@ -32,38 +74,155 @@ class UniformNeighborhood:
 
     @classmethod
     def from_transform(cls, transform: np.ndarray) -> Self:
-        raise NotImplementedError()
+        """All nonzero integer vectors `v` with `|transform @ v| <= 1`, so the columns of
+        `transform` are the basis of the lattice in space and neighbors are at most 1 apart.
+
+        The basis is LLL-reduced first. For a reduced basis `B` every such vector satisfies
+        `|(B^-1)_i| >= |q_i|` for each row `i` of the inverse, which bounds a small box of
+        candidates that is searched at once."""
+        transform = np.asarray(transform, dtype=np.float64)
+        if transform.ndim != 2 or transform.shape[0] != transform.shape[1]:
+            raise ValueError(f"The lattice transform must be a square matrix, not of shape {transform.shape}")
+        if abs(np.linalg.det(transform)) < TOLERANCE:
+            raise ValueError(f"The lattice transform is singular:\n{transform}")
+
+        unimodular = lll_reduce(transform)
+        reduced = transform @ unimodular
+        bounds = np.floor(np.linalg.norm(np.linalg.inv(reduced), axis=1) * (1 + TOLERANCE)).astype(np.int64)
+
+        axes = [np.arange(-b, b + 1) for b in bounds]
+        candidates = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(bounds))
+        lengths = np.linalg.norm(candidates @ reduced.T, axis=1)
+        found = candidates[(lengths <= 1 + TOLERANCE) & candidates.any(axis=1)] @ unimodular.T
+
+        if len(found) == 0:
+            raise ValueError(f"No lattice vectors are within distance 1 for the transform:\n{transform}")
+        return cls(sorted(map(tuple, found.tolist())))
+
+    def automorphisms(self) -> list[np.ndarray]:
+        """All integer matrices that map the set of neighbor vectors onto itself, these
+        are exactly the linear symmetries of the lattice that fix the origin"""
+        vectors = np.array(self._neighbors, dtype=np.int64)
+        neighbor_set = frozenset(map(tuple, vectors.tolist()))
+
+        # A basis of neighbor vectors, every automorphism is determined by its images
+        basis: list[int] = []
+        for i in range(self.degree):
+            if np.linalg.matrix_rank(vectors[basis + [i]]) > len(basis):
+                basis.append(i)
+        if len(basis) != self.dimension:
+            raise ValueError("The neighbor vectors do not span the lattice")
+        inverse = np.linalg.inv(vectors[basis].T)
+
+        result = []
+        for images in itertools.permutations(range(self.degree), self.dimension):
+            matrix = vectors[list(images)].T @ inverse
+            rounded = np.rint(matrix)
+            if not np.allclose(matrix, rounded):
+                continue
+            rounded = rounded.astype(np.int64)
+
+            if frozenset(map(tuple, (vectors @ rounded.T).tolist())) == neighbor_set:
+                result.append(rounded)
+
+        return result
 
 
 class Lattice(Graph, Universe[Vector, int]):
-    """A graph given by a neighborhood and all possible translations of it"""
+    """A graph given by a neighborhood and all possible translations of it.
+
+    The coordinates of interned nodes are kept in one contiguous `int32` array and
+    their neighbors in an `(N, degree)` table. Both grow geometrically and rows of
+    the neighbor table are only filled once `neighbors` is asked for that node,
+    until then they hold `UNKNOWN`.
+
+    Nodes are looked up by their coordinates packed into one int of `63 // dimension`
+    bits each (at most 32), so in 3D every coordinate within `±2^20` is a single int.
+    Nodes further out are looked up by their coordinate tuple and their coordinates are
+    kept in `_far` instead of the array, which is slower but works for any vector."""
+
+    UNKNOWN = -1
+    """Sentinel for rows of the neighbor table that have not been computed yet"""
+    INITIAL_CAPACITY = 64
 
     def __init__(self, neighborhood: UniformNeighborhood) -> None:
         self.neighborhood = neighborhood
-        self.keys: dict[Vector, int] = {neighborhood.zero: Graph.ZERO}
-        self.values: list[Vector] = [neighborhood.zero]
-        self._neighbors: list[tuple[int]] = []
+        dimension = neighborhood.dimension
+
+        # Coordinates are packed into a single int so the interning dict rarely hashes tuples
+        self._bits = min(63 // dimension, 32)
+        self._bias = 1 << (self._bits - 1)
+        self._strides = [1 << (self._bits * i) for i in range(dimension)]
+        self._np_strides = np.array(self._strides, dtype=np.int64)
+
+        self._offsets = np.array(neighborhood._neighbors, dtype=np.int32)
+        self._reach = int(np.abs(self._offsets).max())
+        self._coordinates = np.zeros((self.INITIAL_CAPACITY, dimension), dtype=np.int32)
+        self._neighbors = np.full((self.INITIAL_CAPACITY, neighborhood.degree), self.UNKNOWN, dtype=np.int32)
+        self._far: dict[int, tuple] = {}
+        """Coordinates of the nodes that are too far from the origin to be packed"""
+        self._count = 1
+        self.keys: dict[int | tuple, int] = {self._pack(neighborhood.zero): Graph.ZERO}
+
+    def __len__(self) -> int:
+        """The number of nodes that have been interned so far"""
+        return self._count
+
+    def _pack(self, node: Vector) -> int | tuple:
+        bias = self._bias
+        key = 0
+        for c, stride in zip(node, self._strides):
+            if not -bias <= c < bias:
+                return tuple(map(int, node))
+            key += (c + bias) * stride
+        return key
+
+    def _reserve(self, count: int) -> None:
+        capacity = len(self._coordinates)
+        if count <= capacity:
+            return
+        while capacity < count:
+            capacity *= 2
+
+        coordinates = np.zeros((capacity, self.neighborhood.dimension), dtype=np.int32)
+        coordinates[:self._count] = self._coordinates[:self._count]
+        self._coordinates = coordinates
+
+        neighbors = np.full((capacity, self.neighborhood.degree), self.UNKNOWN, dtype=np.int32)
+        neighbors[:self._count] = self._neighbors[:self._count]
+        self._neighbors = neighbors
+
+    def _intern_key(self, key: int, node: Vector) -> int:
+        found = self.keys.get(key)
+        if found is not None:
+            return found
+
+        found = self._count
+        self._reserve(found + 1)
+        if isinstance(key, tuple):
+            self._far[found] = key
+        else:
+            self._coordinates[found] = node
+        self.keys[key] = found
+        self._count += 1
+        return found
 
     def intern(self, node: Vector) -> int:
         """Get the canonical representation of a vector for this lattice"""
         assert len(
             node) == self.neighborhood.dimension, f"Vector {node} is not of dimension {self.neighborhood.dimension}"
 
-        if node in self.keys:
-            return self.keys[node]
-
-        key = len(self.values)
-        self.values.append(node)
-        self.keys[node] = key
-        return key
+        return self._intern_key(self._pack(node), node)
 
     def repr(self, node: int) -> Vector:
-        assert isinstance(node, int)
         assert self.exists(node)
-        return self.values[node]
+        far = self._far.get(node)
+        if far is not None:
+            return far
+        return tuple(self._coordinates[node].tolist())
 
     def exists(self, node: int) -> bool:
-        return node < len(self.values)
+        return 0 <= node < self._count
 
     @property
     def max_degree(self) -> int:
@@ -73,20 +232,39 @@ class Lattice(Graph, Universe[Vector, int]):
     def size(self) -> int:
         return -1
 
-    @hacky_instance_cache("_neighbors")
+    def _fill(self, node: int) -> None:
+        """Compute the row of the neighbor table for `node`"""
+        if node in self._far or np.abs(self._coordinates[node].astype(np.int64)).max() >= self._bias - self._reach:
+            # Some neighbors may not be packable, which only happens far from the origin
+            value = self.repr(node)
+            coordinates = [self.neighborhood.neighbor(value, i) for i in range(self.max_degree)]
+            keys = [self._pack(c) for c in coordinates]
+        else:
+            coordinates = self._offsets + self._coordinates[node]
+            keys = ((coordinates.astype(np.int64) + self._bias) @ self._np_strides).tolist()
+        self._reserve(self._count + len(keys))
+
+        row = [self._intern_key(key, coordinates[i]) for i, key in enumerate(keys)]
+        self._neighbors[node] = row
+
     def neighbors(self, node: int) -> Sequence[int]:
-        assert isinstance(node, int)
         assert self.exists(node)
 
-        value = self.values[node]
-        neighbors = tuple(
-            self.intern(self.neighborhood.neighbor(value, i))
-            for i in range(self.neighborhood.degree))
+        row = self._neighbors[node]
+        if row[0] == self.UNKNOWN:
+            self._fill(node)
+            row = self._neighbors[node]
 
-        assert len(
-            neighbors) == self.neighborhood.degree, f"Should have {self.neighborhood.degree} neighbors, not {len(neighbors)}"
+        return row
+
+    def neighbor_table(self, nodes: np.ndarray) -> np.ndarray:
+        nodes = np.asarray(nodes, dtype=np.int64)
+        assert len(nodes) == 0 or 0 <= nodes.min() and nodes.max() < self._count
+
+        for node in nodes[self._neighbors[nodes, 0] == self.UNKNOWN].tolist():
+            self._fill(node)
 
-        return neighbors
+        return self._neighbors[nodes].astype(np.int64)
 
     def walk_path(self, node: int, indices: Sequence[int]) -> int:
         for i in indices:
@@ -0,0 +1,73 @@
+import math
+from typing import Sequence
+
+import numpy as np
+
+from messthaler_wulff.datastructures import Universe
+from messthaler_wulff.datastructures.graph import Graph
+from messthaler_wulff.datastructures.lattice import UniformNeighborhood, Vector
+
+
+class PeriodicLattice(Graph, Universe[Vector, int]):
+    """A lattice on a periodic box (a torus) of the given shape.
+
+    Nodes are the linearised coordinates of the box (the last axis varies fastest)
+    and neighbors are computed with stride arithmetic, so nothing is ever interned
+    or cached and the graph has a fixed, finite size."""
+
+    def __init__(self, neighborhood: UniformNeighborhood, shape: Sequence[int]) -> None:
+        if len(shape) != neighborhood.dimension:
+            raise ValueError(f"Shape {shape} does not match the dimension {neighborhood.dimension} of the neighborhood")
+
+        self.neighborhood = neighborhood
+        self.shape = tuple(shape)
+        offsets = [tuple(v) for v in neighborhood._neighbors]
+
+        # Each axis must be long enough that the neighbors of a node stay distinct
+        self._margins = [max(abs(v[i]) for v in offsets) for i in range(len(shape))]
+        for length, margin in zip(self.shape, self._margins):
+            if length <= 2 * margin:
+                raise ValueError(f"Shape {shape} is too small for the neighborhood")
+
+        self._strides = [math.prod(self.shape[i + 1:]) for i in range(len(shape))]
+        self._offsets = offsets
+        self._deltas = [sum(o * s for o, s in zip(v, self._strides)) for v in offsets]
+        self._size = math.prod(self.shape)
+
+        self._np_shape = np.array(self.shape, dtype=np.int64)
+        self._np_strides = np.array(self._strides, dtype=np.int64)
+        self._np_offsets = np.array(offsets, dtype=np.int64)
+
+    def intern(self, node: Vector) -> int:
+        assert len(
+            node) == self.neighborhood.dimension, f"Vector {node} is not of dimension {self.neighborhood.dimension}"
+        return sum((c % length) * stride for c, length, stride in zip(node, self.shape, self._strides))
+
+    def repr(self, node: int) -> Vector:
+        assert 0 <= node < self._size
+        return tuple((node // stride) % length for length, stride in zip(self.shape, self._strides))
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def max_degree(self) -> int:
+        return self.neighborhood.degree
+
+    def neighbors(self, node: int) -> Sequence[int]:
+        assert 0 <= node < self._size
+
+        coordinates = self.repr(node)
+        if all(m <= c < length - m for c, length, m in zip(coordinates, self.shape, self._margins)):
+            return tuple(node + delta for delta in self._deltas)
+
+        return tuple(self.intern(tuple(c + o for c, o in zip(coordinates, v))) for v in self._offsets)
+
+    def neighbor_table(self, nodes: np.ndarray) -> np.ndarray:
+        nodes = np.asarray(nodes, dtype=np.int64)
+        assert len(nodes) == 0 or 0 <= nodes.min() and nodes.max() < self._size
+
+        coordinates = (nodes[:, None] // self._np_strides) % self._np_shape
+        coordinates = (coordinates[:, None, :] + self._np_offsets) % self._np_shape
+        return coordinates @ self._np_strides
@@ -1,11 +1,10 @@
+from array import array
 from collections.abc import Sequence
 from enum import Enum
-from typing import Optional, Iterable, Any
-
-from gooey.python_bindings.argparse_to_json import action_to_json
+from typing import Optional, Iterable, Any, override
 
 from messthaler_wulff.datastructures import HasInvariants
-from messthaler_wulff.datastructures.defaultlist import defaultlist
+from messthaler_wulff.datastructures.defaultlist import defaultlist, defaultlist32
 
 
 class PriorityMode(Enum):
@@ -40,16 +39,24 @@ class PriorityLevel(list[int]):
 class PriorityStack(HasInvariants):
     """An implementation of a priority queue optimized for energy levels.
     Priorities are positive ints that are smaller than `priority_count` and
-    values can only be ints."""
+    values can only be ints. Storage for `size` values is allocated up front."""
 
-    def __init__(self, mode: PriorityMode, priority_count: int) -> None:
-        self.extremal_key: Optional[int] = None
+    def __init__(self, mode: PriorityMode, priority_count: int, size: int = 0) -> None:
         self.mode = mode
-        self.priority_levels: list[PriorityLevel] = [PriorityLevel() for _ in range(priority_count)]
-        self.priorities: defaultlist[int] = defaultlist(-1)
-        self.indices: defaultlist = defaultlist(-1)
+        self.priority_levels: list[PriorityLevel] = self._new_levels(priority_count)
+        self._reset_extremum()
+        self.priorities: defaultlist[int] = defaultlist32(-1, size)
+        self.indices: defaultlist[int] = defaultlist32(-1, size)
         self.size: int = 0
 
+    def _new_levels(self, priority_count: int) -> list:
+        """The empty levels of the priorities `0, ..., priority_count - 1`"""
+        return [PriorityLevel() for _ in range(priority_count)]
+
+    def _reset_extremum(self) -> None:
+        """Initialise the bookkeeping of the extremal key for an empty stack"""
+        self.extremal_key: Optional[int] = None
+
     def extrema(self) -> Sequence[int]:
         assert self.extremal_key is not None
         return self.priority_levels[self.extremal_key]
@@ -69,25 +76,34 @@ class PriorityStack(HasInvariants):
     def __setitem__(self, value: int, key: int) -> None:
         assert 0 <= key < len(self.priority_levels)
 
-        if self.extremal_key is None or self._is_better(key, self.extremal_key):
-            self.extremal_key = key
+        # This is the hot path of every simulation, so the level operations are inlined
+        priorities = self.priorities
+        indices = self.indices
+        levels = self.priority_levels
 
-        if value in self:
-            old_key = self.priorities[value]
-            if key == old_key:
-                return
-            old_level = self.priority_levels[old_key]
-            old_level.my_remove(value, self.indices)
-        else:
+        old_key = priorities[value]
+        if old_key == key:
+            return
+        if old_key == -1:
             self.size += 1
-
-        new_level = self.priority_levels[key]
-        new_level.my_add(value, self.indices)
-        self.priorities[value] = key
-
-        self._adjust_extremal_key()
-
-        assert len(self) > 0
+        else:
+            old_level = levels[old_key]
+            index = indices[value]
+            last = old_level.pop()
+            if last != value:
+                old_level[index] = last
+                indices[last] = index
+
+        level = levels[key]
+        indices[value] = len(level)
+        level.append(value)
+        priorities[value] = key
+
+        extremal_key = self.extremal_key
+        if extremal_key is None or self._is_better(key, extremal_key):
+            self.extremal_key = key
+        elif old_key == extremal_key and len(levels[old_key]) == 0:
+            self._adjust_extremal_key()
 
     def __delitem__(self, value: int):
         assert value in self
@@ -96,7 +112,8 @@ class PriorityStack(HasInvariants):
         level = self.priority_levels[key]
         level.my_remove(value, self.indices)
         self.priorities[value] = -1
-        self._adjust_extremal_key()
+        if key == self.extremal_key and len(level) == 0:
+            self._adjust_extremal_key()
 
     def _adjust_extremal_key(self) -> None:
         if len(self) == 0:
@@ -150,3 +167,76 @@ class PriorityStack(HasInvariants):
         yield a("priorities")
         yield a("indices")
         yield a("priority_levels")
+
+
+class CompactPriorityStack(PriorityStack):
+    """A `PriorityStack` that keeps the levels in typed arrays (about 12 bytes per value
+    together with the typed priorities and positions) and finds the extremal key through
+    a bitmask of the non-empty levels instead of walking the levels."""
+
+    @override
+    def _new_levels(self, priority_count: int) -> list:
+        return [array("i") for _ in range(priority_count)]
+
+    @override
+    def _reset_extremum(self) -> None:
+        self._mask: int = 0
+        """Bit `key` is set iff the level `key` is not empty"""
+
+    @property
+    def extremal_key(self) -> Optional[int]:
+        mask = self._mask
+        if mask == 0:
+            return None
+        if self.mode is PriorityMode.MIN:
+            return (mask & -mask).bit_length() - 1
+        return mask.bit_length() - 1
+
+    def _remove(self, value: int, key: int) -> None:
+        level = self.priority_levels[key]
+        index = self.indices[value]
+        assert 0 <= index < len(level), f"Failed 0 <= {index} < {len(level)}"
+        assert level[index] == value
+
+        self.indices[value] = -1
+        last = level.pop()
+
+        if index != len(level):
+            level[index] = last
+            self.indices[last] = index
+
+        if len(level) == 0:
+            self._mask &= ~(1 << key)
+
+    @override
+    def __setitem__(self, value: int, key: int) -> None:
+        assert 0 <= key < len(self.priority_levels)
+
+        old_key = self.priorities[value]
+        if old_key == key:
+            return
+        if old_key == -1:
+            self.size += 1
+        else:
+            self._remove(value, old_key)
+
+        level = self.priority_levels[key]
+        self.indices[value] = len(level)
+        level.append(value)
+        self.priorities[value] = key
+        self._mask |= 1 << key
+
+    @override
+    def __delitem__(self, value: int):
+        assert value in self
+        self.size -= 1
+        self._remove(value, self.priorities[value])
+        self.priorities[value] = -1
+
+    @override
+    def invariant_failures(self) -> Iterable[str]:
+        yield from super().invariant_failures()
+
+        for key, level in enumerate(self.priority_levels):
+            if (len(level) > 0) != bool(self._mask & (1 << key)):
+                yield f"Bitmask {self._mask:b} does not match the size {len(level)} of level {key}"
@@ -0,0 +1,94 @@
+import collections
+from typing import Any, Optional
+
+
+class EnergyCache:
+    """Remembers the energies of crystals. This one keeps every energy forever,
+    the subclasses evict them. All of them count hits and misses."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.values: dict[Any, int] = {}
+
+    def get(self, state) -> Optional[int]:
+        energy = self.values.get(state)
+        if energy is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return energy
+
+    def put(self, state, energy: int):
+        self.values[state] = energy
+
+    def __len__(self):
+        return len(self.values)
+
+    def __str__(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups > 0 else 0
+        return (f"{self.__class__.__name__}: {len(self):,} entries, "
+                f"{self.hits:,} hits, {self.misses:,} misses ({rate:.1%} hit rate)")
+
+
+class NoEnergyCache(EnergyCache):
+    """Remembers nothing, for when every energy is only asked for once"""
+
+    def get(self, state) -> Optional[int]:
+        self.misses += 1
+        return None
+
+    def put(self, state, energy: int):
+        pass
+
+
+class LRUEnergyCache(EnergyCache):
+    """Keeps the `max_size` most recently used energies"""
+
+    def __init__(self, max_size: int = 1 << 20):
+        super().__init__()
+        self.max_size = max_size
+        self.values: collections.OrderedDict[Any, int] = collections.OrderedDict()
+
+    def get(self, state) -> Optional[int]:
+        energy = super().get(state)
+        if energy is not None:
+            self.values.move_to_end(state)
+        return energy
+
+    def put(self, state, energy: int):
+        self.values[state] = energy
+        self.values.move_to_end(state)
+        if len(self.values) > self.max_size:
+            self.values.popitem(last=False)
+
+
+class LevelEnergyCache(EnergyCache):
+    """Keeps energies by the number of atoms and drops every level that is more
+    than `radius` atoms away from the last crystal that was put in"""
+
+    def __init__(self, radius: int = 1):
+        super().__init__()
+        self.radius = radius
+        self.levels: dict[int, dict[Any, int]] = {}
+
+    def get(self, state) -> Optional[int]:
+        energy = self.levels.get(state.size, {}).get(state)
+        if energy is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return energy
+
+    def put(self, state, energy: int):
+        size = state.size
+        self.levels.setdefault(size, {})[state] = energy
+        for level in [level for level in self.levels if abs(level - size) > self.radius]:
+            del self.levels[level]
+
+    def __len__(self):
+        return sum(map(len, self.levels.values()))
+
+
+ENERGY_CACHES = {"all": EnergyCache, "none": NoEnergyCache, "lru": LRUEnergyCache, "level": LevelEnergyCache}
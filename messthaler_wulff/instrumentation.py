@@ -0,0 +1,151 @@
+import atexit
+import json
+import logging
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+log = logging.getLogger("messthaler_wulff")
+
+
+class Section:
+    """Times a named section of code, use it as a context manager"""
+
+    __slots__ = ("calls", "nanoseconds", "_starts")
+
+    def __init__(self):
+        self.calls = 0
+        self.nanoseconds = 0
+        self._starts: list[int] = []
+
+    def __enter__(self):
+        self._starts.append(time.perf_counter_ns())
+        return self
+
+    def __exit__(self, *_):
+        self.nanoseconds += time.perf_counter_ns() - self._starts.pop()
+        self.calls += 1
+
+
+class Observation:
+    """Count, sum and extrema of the values seen for one name"""
+
+    __slots__ = ("count", "sum", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+
+class Instrumentation:
+    """Named counters, per-level counters, observations, gauges and timed sections.
+
+    Instrumented classes call `current()` once when they are created and keep the result,
+    which is `None` unless instrumentation was enabled. Their hot paths only check that
+    attribute, so instrumentation costs next to nothing when it is disabled."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far, objects that hold this instance keep recording into it"""
+        self.start = time.perf_counter()
+        self.counters: defaultdict[str, int] = defaultdict(int)
+        self.levels: defaultdict[str, list[int]] = defaultdict(list)
+        self.observations: defaultdict[str, Observation] = defaultdict(Observation)
+        self.gauges: dict[str, dict] = {}
+        self.sections: defaultdict[str, Section] = defaultdict(Section)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def count_level(self, name: str, level: int, n: int = 1):
+        """Count separately for every level, like the number of atoms of a crystal"""
+        levels = self.levels[name]
+        if level >= len(levels):
+            levels.extend([0] * (level + 1 - len(levels)))
+        levels[level] += n
+
+    def observe(self, name: str, value):
+        self.observations[name].add(value)
+
+    def gauge(self, name: str, value):
+        """Remember the last and largest value of something that changes, like the size of a set"""
+        gauge = self.gauges.setdefault(name, dict(last=value, max=value))
+        gauge["last"] = value
+        gauge["max"] = max(gauge["max"], value)
+
+    def section(self, name: str) -> Section:
+        return self.sections[name]
+
+    def to_dict(self) -> dict:
+        return dict(wall_seconds=time.perf_counter() - self.start,
+                    counters=dict(self.counters),
+                    levels=dict(self.levels),
+                    observations={name: dict(count=o.count, sum=o.sum, min=o.min, max=o.max,
+                                             mean=o.sum / o.count if o.count > 0 else None)
+                                  for name, o in self.observations.items()},
+                    gauges=self.gauges,
+                    sections={name: dict(calls=s.calls, seconds=s.nanoseconds / 1e9)
+                              for name, s in self.sections.items()})
+
+    def merge(self, data: dict):
+        """Add what another process recorded, given as its `to_dict()`. Gauges of different
+        processes measure disjoint parts, like the shards of a set, so they add up too."""
+        for name, n in data["counters"].items():
+            self.count(name, n)
+        for name, levels in data["levels"].items():
+            for level, n in enumerate(levels):
+                self.count_level(name, level, n)
+        for name, o in data["observations"].items():
+            observation = self.observations[name]
+            observation.count += o["count"]
+            observation.sum += o["sum"]
+            for value in (o["min"], o["max"]):
+                if value is not None:
+                    observation.min = value if observation.min is None else min(observation.min, value)
+                    observation.max = value if observation.max is None else max(observation.max, value)
+        for name, g in data["gauges"].items():
+            gauge = self.gauges.setdefault(name, dict(last=0, max=0))
+            gauge["last"] += g["last"]
+            gauge["max"] += g["max"]
+        for name, s in data["sections"].items():
+            section = self.sections[name]
+            section.calls += s["calls"]
+            section.nanoseconds += round(s["seconds"] * 1e9)
+
+    def dump(self, path):
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
+        log.info(f"Wrote instrumentation to {path}")
+
+
+_current: Optional[Instrumentation] = None
+
+
+def current() -> Optional[Instrumentation]:
+    """The enabled instrumentation or `None`"""
+    return _current
+
+
+def enable(path=None) -> Instrumentation:
+    """Enable instrumentation for everything created from now on and, given a `path`, dump it
+    as JSON when the program exits"""
+    global _current
+    _current = Instrumentation()
+    if path is not None:
+        atexit.register(_current.dump, path)
+    return _current
+
+
+def disable():
+    global _current
+    _current = None
@@ -0,0 +1,43 @@
+import json
+import logging
+import platform
+import time
+from pathlib import Path
+
+from prettytable import PrettyTable
+
+from messthaler_wulff.bench import regressions, run_suite
+from messthaler_wulff.version import program_version
+
+log = logging.getLogger("messthaler_wulff")
+log.debug(f"Loading {__name__}")
+
+
+def run_mode(lattices: dict, output=None, compare=None, threshold=0.1, size="full", repeat=3) -> bool:
+    """Run the benchmarks and return whether none of them regressed against `compare`"""
+    results = run_suite(lattices, size, repeat)
+
+    table = PrettyTable(["Lattice", "Metric", "Value"], align="r")
+    for lattice, metrics in results.items():
+        for metric, value in metrics.items():
+            table.add_row([lattice, metric, f"{value:,.0f}"])
+    print(table)
+
+    report = dict(version=program_version, python=platform.python_version(), platform=platform.platform(),
+                  timestamp=time.strftime("%Y-%m-%dT%H:%M:%S%z"), size=size, results=results)
+    if output is not None:
+        Path(output).write_text(json.dumps(report, indent=2))
+        log.info(f"Wrote results to {output}")
+
+    if compare is None:
+        return True
+
+    baseline = json.loads(Path(compare).read_text())
+    if baseline.get("size") != size:
+        log.warning(f"The baseline {compare} was measured with size {baseline.get('size')}, not {size}")
+    failures = regressions(baseline["results"], results, threshold)
+    for failure in failures:
+        log.error(f"Regression: {failure}")
+    if len(failures) == 0:
+        log.info(f"No regressions of more than {threshold:.0%} against version {baseline.get('version')}")
+    return len(failures) == 0
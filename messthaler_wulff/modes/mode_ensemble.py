@@ -0,0 +1,36 @@
+import logging
+import time
+
+import numpy as np
+
+from messthaler_wulff._additive_simulation import SimpleNeighborhood
+from messthaler_wulff.datastructures.lattice import Lattice, UniformNeighborhood
+from messthaler_wulff.sim.ensemble import EnsembleSimulation
+
+log = logging.getLogger("messthaler_wulff")
+log.debug(f"Loading {__name__}")
+
+PERCENTILES = (0, 5, 50, 95, 100)
+
+
+def run_mode(goal, lattice, walkers, seed=None, output=None, every=None):
+    neighborhood = SimpleNeighborhood(lattice)
+    ensemble = EnsembleSimulation(Lattice(UniformNeighborhood(sorted(neighborhood.base_neighborhood))),
+                                  walkers, seed=seed)
+
+    start = time.perf_counter()
+    ensemble.run(goal)
+    seconds = time.perf_counter() - start
+    log.info(f"Grew {walkers:,} crystals to {goal:,} atoms in {seconds:.2f}s "
+             f"({walkers * (goal - 1) / max(seconds, 1e-9):,.0f} atoms/s)")
+
+    percentiles = ensemble.percentiles(PERCENTILES)
+    every = every or max(1, goal // 20)
+    print("atoms " + " ".join(f"{f'p{q}':>8}" for q in PERCENTILES))
+    for size in range(0, goal + 1, every):
+        print(f"{size:5} " + " ".join(f"{value:8.1f}" for value in percentiles[:, size]))
+
+    if output is not None:
+        np.savez_compressed(output, energies=ensemble.energy_curves(), nodes=np.stack(ensemble.nodes),
+                            percentiles=percentiles, q=np.array(PERCENTILES))
+        log.info(f"Wrote energy curves to {output}")
@@ -1,24 +1,29 @@
 import logging
-import os
-from pathlib import Path
 
 import colorama.ansi
 from colorama import Cursor
 
-from messthaler_wulff._additive_simulation import OmniSimulation, SimpleNeighborhood
+from messthaler_wulff._additive_simulation import ENGINES, OmniSimulation, SimpleNeighborhood
+from messthaler_wulff._crystal_dump import CrystalDump, format_crystal
+from messthaler_wulff.abstract_crystal_store import DumbCrystal, PackedCrystal
+from messthaler_wulff.datastructures.lattice import UniformNeighborhood
 from messthaler_wulff.decorators import wipe_screen
-from messthaler_wulff._explorative_simulation import ExplorativeSimulation
+from messthaler_wulff.energy_cache import ENERGY_CACHES, LRUEnergyCache
+from messthaler_wulff._explorative_simulation import ExplorativeSimulation, LevelExplorativeSimulation, \
+    BacktrackingExplorativeSimulation
 
 log = logging.getLogger("messthaler_wulff")
 log.debug(f"Loading {__name__}")
 
 
-def crystal_file_name(dimension, count, require_energy, bidi, ti, initial):
+def crystal_file_name(dimension, count, require_energy, bidi, ti, initial, symmetry=False):
     mode = ""
     if bidi:
         mode += "b"
     if ti:
         mode += "t"
+    if symmetry:
+        mode += "s"
     if require_energy is not None:
         mode += str(require_energy)
     if initial is not None:
@@ -27,37 +32,91 @@ def crystal_file_name(dimension, count, require_energy, bidi, ti, initial):
 
 
 def run_mode(goal, lattice, dimension: int, dump_crystals=None, verbose=False, initial=(),
-             require_energy=None, ti=True, bidi=True):
-    omni_simulation = OmniSimulation(SimpleNeighborhood(lattice), None, tuple([0] * (dimension + 1)))
+             require_energy=None, ti=True, bidi=True, symmetry=False, jobs=1, visited_dir=None,
+             checkpoint=None, checkpoint_every=600.0, resume=None, packed=False, backtrack=False,
+             energy_cache="none", energy_cache_size=1 << 20, engine="lattice", compression=None,
+             dump_format="text"):
+    if backtrack and jobs > 1:
+        raise ValueError("Backtracking does not support exploring with several processes")
+    if backtrack and (checkpoint is not None or resume is not None):
+        raise ValueError("Backtracking does not support checkpoints")
+    if jobs > 1 and (checkpoint is not None or resume is not None):
+        raise ValueError("Checkpoints are not supported when exploring with several processes")
+    if symmetry and not ti:
+        raise ValueError("Reducing by symmetries always identifies translated crystals, "
+                         "it cannot be combined with --no-translations")
+    if backtrack and not bidi:
+        log.warning("Backtracking explores without bidi on its own instead of level by level")
+
+    neighborhood = SimpleNeighborhood(lattice)
+    omni_simulation = ENGINES[engine](neighborhood, None, tuple([0] * (dimension + 1)))
     for atom in initial:
         omni_simulation.force_set_atom(atom, OmniSimulation.FORWARDS)
-    explorer = ExplorativeSimulation(omni_simulation, goal, verbosity=2 if verbose else 0,
-                                     require_energy=require_energy, ti=ti, bidi=bidi, collect_crystals=dump_crystals)
+
+    symmetries = None
+    if symmetry:
+        symmetries = UniformNeighborhood(sorted(neighborhood.base_neighborhood)).automorphisms()
+        log.info(f"Reducing by a point group of order {len(symmetries)}")
+
+    # Crystals are streamed to their files while exploring, unless they have to be kept in memory anyway
+    crystal_dump = None
+    collect_crystals = dump_crystals == "-" or (dump_crystals is not None
+                                                and (jobs > 1 or checkpoint is not None or resume is not None))
+    if dump_crystals is not None and dump_crystals != "-":
+        archive = None
+        if dump_format == "archive":
+            archive = dict(width=dimension + 1, lattice=lattice, bidi=bidi, ti=ti, symmetry=symmetry,
+                           require_energy=require_energy)
+        crystal_dump = CrystalDump(dump_crystals, lambda i: crystal_file_name(dimension, i, require_energy, bidi,
+                                                                             ti, initial, symmetry), compression,
+                                   archive=archive)
+        crystal_dump.skip_existing(range(min(goal, len(initial)), max(goal, len(initial)) + 1))
+
+    options = dict(verbosity=2 if verbose else 0, require_energy=require_energy, ti=ti, bidi=bidi,
+                   collect_crystals=collect_crystals, symmetries=symmetries, visited_dir=visited_dir,
+                   abstract_crystal=PackedCrystal if packed else DumbCrystal)
+    if energy_cache == "lru":
+        options.update(energy_cache=LRUEnergyCache(energy_cache_size))
+    else:
+        options.update(energy_cache=ENERGY_CACHES[energy_cache]())
+    streaming = crystal_dump is not None and not collect_crystals
+    if streaming:
+        options.update(crystal_dump=crystal_dump)
+
+    try:
+        if checkpoint is not None or resume is not None:
+            from messthaler_wulff._checkpoint import Checkpoint
+            if checkpoint is not None:
+                checkpoint = Checkpoint(checkpoint, checkpoint_every)
+            explorer = ExplorativeSimulation(omni_simulation, goal, checkpoint=checkpoint, resume=resume, **options)
+        elif backtrack:
+            explorer = BacktrackingExplorativeSimulation(omni_simulation, goal, **options)
+        elif jobs > 1:
+            from messthaler_wulff._parallel_exploration import ParallelExplorativeSimulation
+            explorer = ParallelExplorativeSimulation(omni_simulation, goal, jobs, **options)
+        elif not bidi:
+            options.pop("bidi")
+            explorer = LevelExplorativeSimulation(omni_simulation, goal, print_levels=not verbose, **options)
+        else:
+            explorer = ExplorativeSimulation(omni_simulation, goal, **options)
+    finally:
+        if streaming:
+            crystal_dump.close()
 
     if verbose:
         wipe_screen()
     print(explorer)
+    log.info(explorer.sim.sim.energy_cache)
 
-    if dump_crystals is not None:
-        if dump_crystals == "-":
-            string: str = "\n".join("["
-                                    + ", ".join(map(str, c.atoms()))
-                                    + "]"
-                                    for c in explorer.crystals[explorer.data_index(goal)])
-            print()
-            print(string)
-        else:
-            dump_crystals = Path(dump_crystals)
+    if dump_crystals == "-":
+        print()
+        for crystal in explorer.crystals[explorer.data_index(goal)]:
+            print(format_crystal(crystal))
+    elif crystal_dump is not None and not streaming:
+        with crystal_dump:
             for i in range(explorer.lower_bound, explorer.upper_bound + 1):
-                d = explorer.data_index(i)
-                file: Path = dump_crystals / crystal_file_name(dimension, i, require_energy, bidi, ti, initial)
-                if file.exists():
-                    log.error(f"File {file} already exists")
-                    continue
-                string = "\n".join("["
-                                        + ", ".join(map(str, c.atoms()))
-                                        + "]"
-                                        for c in explorer.crystals[d])
-                log.info(f"Writing {len(string)} bytes to {file.absolute()}")
-                assert file.write_text(string) != 0, f"File {file} was not written to"
-                assert os.path.getsize(file) != 0, f"File {file} was not written to"
+                crystals = explorer.crystals[explorer.data_index(i)]
+                if len(crystals) > 0:
+                    crystal_dump.replace(i, crystals[0])
+                for crystal in crystals[1:]:
+                    crystal_dump.append(i, crystal)
@@ -1,15 +1,15 @@
 import logging
 import random
 
-from messthaler_wulff._additive_simulation import SimpleNeighborhood, OmniSimulation
+from messthaler_wulff._additive_simulation import ENGINES, SimpleNeighborhood, OmniSimulation
 from messthaler_wulff.progress import ProgressBar
 
 log = logging.getLogger("messthaler_wulff")
 log.debug(f"Loading {__name__}")
 
 
-def run_mode(goal, dimension, lattice, windows_mode, initial):
-    simulation = OmniSimulation(SimpleNeighborhood(lattice), None, tuple([0] * (1 + dimension)))
+def run_mode(goal, dimension, lattice, windows_mode, initial, engine="lattice"):
+    simulation = ENGINES[engine](SimpleNeighborhood(lattice), None, tuple([0] * (1 + dimension)))
     for atom in initial:
         simulation.force_set_atom(atom, OmniSimulation.FORWARDS)
 
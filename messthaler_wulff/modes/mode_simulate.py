@@ -1,10 +1,12 @@
 # XDG_SESSION_TYPE=x11 for Linux
 
+import logging
 import random
 
+import numpy as np
 import open3d as o3d
 
-from messthaler_wulff._additive_simulation import SimpleNeighborhood, OmniSimulation
+from messthaler_wulff._additive_simulation import ENGINES, SimpleNeighborhood
 from messthaler_wulff.data import *
 from messthaler_wulff.progress import ProgressBar
 
@@ -21,8 +23,8 @@ def plot_sim(sim, lattice):
     o3d.visualization.draw_geometries([points])
 
 
-def run_mode(goal, lattice):
-    simulation = OmniSimulation(SimpleNeighborhood(lattice), None, (0, 0, 0, 0))
+def run_mode(goal, lattice, engine="lattice"):
+    simulation = ENGINES[engine](SimpleNeighborhood(lattice), None, (0, 0, 0, 0))
     input("Press enter to continue...")
 
     p = ProgressBar(goal, lambda: simulation.energy)
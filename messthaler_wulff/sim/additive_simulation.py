@@ -1,112 +1,171 @@
 import logging
 import random
 import shutil
-import sys
 import textwrap
+from enum import Enum
 from functools import partial
 from typing import Iterable, Sequence, Optional
 
+import numpy as np
 from colorama import Fore, Back
 
-from messthaler_wulff.datastructures.defaultlist import defaultlist
+from messthaler_wulff.datastructures import duplicates
+from messthaler_wulff.datastructures.defaultlist import defaultlist, defaultlist8
 from messthaler_wulff.datastructures.graph import Graph
 from messthaler_wulff.datastructures.lattice import Lattice
-from messthaler_wulff.datastructures.priority_stack import PriorityStack
+from messthaler_wulff.datastructures.priority_stack import PriorityMode, PriorityStack
 from messthaler_wulff.decorators import compose
-from messthaler_wulff.sim import crystal
+from messthaler_wulff.instrumentation import current as current_instrumentation
 
 log = logging.getLogger("messthaler_wulff")
 
 
+class Mode(Enum):
+    """The direction of a transformation, the values match `OmniSimulation.BACKWARDS` and `FORWARDS`"""
+    BACKWARDS = 0
+    FORWARDS = 1
+
+    @property
+    def index(self) -> int:
+        return self.value
+
 
 # Old sim achieved 20_000 1/s
 
 class AdditiveSimulation:
     """A blazingly fast simulation of crystals (subsets of a lattice/graph)
-    and transformations (addition/removal) which locally minimize surface energy"""
-
-    def __init__(self, graph: Graph) -> None:
-        # self.energy = 0
-        # r"""Current energy of the crystal defined by
-        # $$
-        #     E_{c} = \sum_{n \in c} f_{G \setminus c}(n)
-        # $$"""
-        # self.size = 0
-        # """The number of atoms in the crystal"""
-        # self.graph = graph
-        # """The underlying graph used for the simulation"""
-        #
-        # self.f: defaultlist[int] = defaultlist(0)
-        # self.χ_c: defaultlist[int] = defaultlist(0)
-        self.boundaries = [PriorityStack(graph.max_degree + 1),
-                           PriorityStack(graph.max_degree + 1)]
-        # TODO
-        self.boundary(Mode.FORWARDS).set_priority(
-            Graph.ZERO,
-            self.calculate_loneliness(Graph.ZERO, Mode.FORWARDS))
-
-        # assert (self.boundary(Mode.FORWARDS).get_priority(Graph.ZERO)
-        #         == self.calculate_loneliness(Graph.ZERO, Mode.FORWARDS))
+    and transformations (addition/removal) which locally minimize surface energy.
+
+    The forwards boundary holds the nodes outside the crystal that touch it, the backwards
+    boundary the nodes of the crystal that touch the outside. Their priority is the
+    loneliness of a node: the number of its neighbors on its own side."""
+
+    def __init__(self, graph: Graph, origin: int = Graph.ZERO,
+                 stack_type: type[PriorityStack] = PriorityStack) -> None:
+        self.energy = 0
+        r"""Current energy of the crystal defined by
+        $$
+            E_{c} = \sum_{n \in c} f_{G \setminus c}(n)
+        $$"""
+        self.size = 0
+        """The number of atoms in the crystal"""
+        self.graph = graph
+        """The underlying graph used for the simulation"""
+
+        self.uniform_degree: Optional[int] = graph.max_degree if isinstance(graph, Lattice) else None
+        """The degree of every node if it is the same for all of them, as in lattices"""
+
+        size = max(graph.size, 0)
+        self.x_c: defaultlist[int] = defaultlist8(0, size)
+        self.boundaries = [stack_type(PriorityMode.MIN, graph.max_degree + 1, size),
+                           stack_type(PriorityMode.MIN, graph.max_degree + 1, size)]
+
+        self.boundary(Mode.FORWARDS)[origin] = self.calculate_loneliness(origin, Mode.FORWARDS)
+        self.instrumentation = current_instrumentation()
+
+    def boundary(self, mode: Mode) -> PriorityStack:
+        return self.boundaries[mode.value]
+
+    def reverse_boundary(self, mode: Mode) -> PriorityStack:
+        return self.boundaries[1 - mode.value]
+
+    def neighbors(self, node: int) -> Sequence[int]:
+        """The neighbors of `node` as Python ints. Rows of a lattice's neighbor table are converted
+        on every call, which is cheaper than iterating over NumPy scalars."""
+        neighbors = self.graph.neighbors(node)
+        if isinstance(neighbors, np.ndarray):
+            return neighbors.tolist()
+        return neighbors
+
+    def __contains__(self, node: int) -> bool:
+        return self.x_c[node] == 1
 
+    def calculate_loneliness(self, node: int, mode: Mode) -> int:
+        """The number of neighbors of `node` that are on the same side as `node`
+        (in the crystal for `BACKWARDS`, outside for `FORWARDS`)"""
+        side = 1 - mode.value
+        x_c = self.x_c
+        return sum(1 for n in self.neighbors(node) if x_c[n] == side)
 
     def energy_delta(self, node: int, mode: Mode) -> int:
         """Computes the energy delta between the current state and the current state but with `node`
         moved to the other boundary"""
-        loneliness = self.boundary(mode).get_priority(node)
+        loneliness = self.boundary(mode).priorities[node]
         return 2 * loneliness - self.graph.degree(node)
 
     def move_to_boundary(self, node: int, mode: Mode) -> None:
         """Updates this and neighboring nodes to have appropriate loneliness-scores after the move"""
-        self.size += crystal.sign
-        assert self.size >= 0
-
         mode_boundary = self.boundary(mode)
         reverse_boundary = self.reverse_boundary(mode)
 
         assert node in mode_boundary
         assert node not in reverse_boundary
 
-        old_loneliness = mode_boundary.get_priority(node)
-        neighbors = self.graph.neighbors(node)
+        if self.instrumentation is not None:
+            self.instrumentation.count("additive.toggles")
+
+        old_loneliness = mode_boundary.priorities[node]
+        neighbors = self.neighbors(node)
         degree = len(neighbors)
-        self.energy += self.energy_delta(node, mode)
+        self.energy += 2 * old_loneliness - degree
+        self.size += 1 if mode is Mode.FORWARDS else -1
+        assert self.size >= 0
+        self.x_c[node] = mode.value
 
-        mode_boundary.unset_priority(node)
-        reverse_boundary.set_priority(node, degree - old_loneliness)
+        del mode_boundary[node]
+        reverse_boundary[node] = degree - old_loneliness
 
+        # A priority of -1 means that the node is not in that boundary
+        mode_priorities = mode_boundary.priorities
+        reverse_priorities = reverse_boundary.priorities
+        uniform_degree = self.uniform_degree
         for n in neighbors:
-            if n in mode_boundary:
-                mode_boundary.increment(n, -1, self.graph.degree(n))
-            elif n in reverse_boundary:
-                reverse_boundary.increment(n, 1, self.graph.degree(n))
+            loneliness = mode_priorities[n]
+            if loneliness != -1:
+                mode_boundary[n] = loneliness - 1
+                continue
+
+            n_degree = uniform_degree or self.graph.degree(n)
+            loneliness = reverse_priorities[n]
+            if loneliness == -1:
+                mode_boundary[n] = n_degree - 1
+            elif loneliness + 1 == n_degree:
+                # All neighbors are on its side now, so it no longer touches the boundary
+                del reverse_boundary[n]
             else:
-                mode_boundary.set_priority(n, self.graph.degree(n) - 1)
+                reverse_boundary[n] = loneliness + 1
+
+    def toggle(self, node: int) -> None:
+        """Add `node` to the crystal or remove it. Nodes that are not on a boundary
+        are allowed, though the transformation is then not local"""
+        if node in self.boundary(Mode.FORWARDS):
+            mode = Mode.FORWARDS
+        elif node in self.boundary(Mode.BACKWARDS):
+            mode = Mode.BACKWARDS
+        else:
+            mode = Mode.BACKWARDS if node in self else Mode.FORWARDS
+            self.boundary(mode)[node] = self.calculate_loneliness(node, mode)
+
+        self.move_to_boundary(node, mode)
 
     def next(self, mode: Mode) -> Sequence[int]:
         """Returns a sequence of nodes that represent locally optimal transformations"""
-        return self.boundary(mode).minimums()
+        boundary = self.boundary(mode)
+        if len(boundary) == 0:
+            return []
+        return list(boundary.extrema())
 
     def initialise(self, atoms: list[int]):
         """Can only be called if the simulation is empty. Will fill it with the specified atoms"""
         assert self.size == 0
 
         dups = list(duplicates(atoms))
-
         if len(dups) > 0:
-            log.error(f"Initialising additive simulation failed because input data contains duplicate coordinate(s):\n"
-                      f"{list(map(lambda x: self.graph.repr(x), dups))}")
-            sys.exit(1)
+            raise ValueError(f"Initialising additive simulation failed because input data contains duplicate "
+                             f"node(s): {dups}")
 
         for a in atoms:
-            self.boundary(Mode.FORWARDS).set_priority(a, self.graph.degree(a))
-            assert a in self.boundary(Mode.FORWARDS)
-
-        for a in atoms:
-            assert a not in self.boundary(Mode.BACKWARDS)
             self.toggle(a)
-            if a not in self.boundary(Mode.BACKWARDS):
-                print(a)
-                visualise_slice(self, lambda x, y: (x, y, 0))
 
     @partial(compose, list)
     def invariant_failures(self) -> Iterable[str]:
@@ -116,23 +175,28 @@ class AdditiveSimulation:
         if self.energy < 0:
             yield f"Negative energy: {self.energy}"
 
-        for mode in [Mode.BACKWARDS, Mode.FORWARDS]:
+        for mode in Mode:
             boundary = self.boundary(mode)
             reverse_boundary = self.reverse_boundary(mode)
 
-            for node in boundary:
-                if node in reverse_boundary:
-                    yield f"A node cannot be in multiple boundaries at once"
-                    continue
+            for key in range(len(boundary.priority_levels)):
+                for node in boundary.priority_levels[key]:
+                    if node in reverse_boundary:
+                        yield f"A node cannot be in multiple boundaries at once"
+                        continue
+
+                    if (node in self) != (mode is Mode.BACKWARDS):
+                        yield f"Node {node} is on the wrong side for the {mode.name} boundary"
+                        continue
 
-                loneliness = self.calculate_loneliness(node, mode)
-                if loneliness >= self.graph.degree(node) and self.size > 0:
-                    yield f"Failed {loneliness} < {self.graph.degree(node)} (node: {node})"
-                    continue
+                    loneliness = self.calculate_loneliness(node, mode)
+                    if loneliness >= self.graph.degree(node) and self.size > 0:
+                        yield f"Failed {loneliness} < {self.graph.degree(node)} (node: {node})"
+                        continue
 
-                if boundary.get_priority(node) != loneliness:
-                    yield f"Stored loneliness {boundary.get_priority(node)} does not match calculated {loneliness}"
-                    continue
+                    if key != loneliness:
+                        yield f"Stored loneliness {key} does not match calculated {loneliness}"
+                        continue
 
     def test_invariants(self) -> None:
         """Test the invariants checked by `invariant_failures` and raise a `RuntimeError` if any are violated"""
@@ -144,8 +208,8 @@ class AdditiveSimulation:
                            f"Context:\n"
                            f"{self.energy}\n"
                            f"{self.size}\n"
-                           f"{list(self.boundary(Mode.BACKWARDS))}\n"
-                           f"{list(self.boundary(Mode.FORWARDS))}")
+                           f"{list(self.boundary(Mode.BACKWARDS).select_levels(range(self.graph.max_degree + 1)))}\n"
+                           f"{list(self.boundary(Mode.FORWARDS).select_levels(range(self.graph.max_degree + 1)))}")
 
 
 def visualise_slice(sim: AdditiveSimulation, atomiser=lambda x, y: (x, y), crosshair=False, view_energies=False):
@@ -169,7 +233,7 @@ def visualise_slice(sim: AdditiveSimulation, atomiser=lambda x, y: (x, y), cross
             for m in Mode:
                 if node in sim.boundary(m):
                     mode = m
-                    energy = sim.boundary(m).get_priority(node)
+                    energy = sim.energy_delta(node, m)
 
             if view_energies:
                 if mode is None:
@@ -1,7 +1,9 @@
 import abc
-from typing import override
+from typing import override, Iterable
 
-from messthaler_wulff.datastructures.defaultlist import defaultlist
+import numpy as np
+
+from messthaler_wulff.datastructures.defaultlist import defaultlist, defaultlist8
 from messthaler_wulff.datastructures.graph import Graph
 
 
@@ -11,6 +13,9 @@ def sign(x: int) -> int:
 
 
 class CrystalLike(abc.ABC):
+    supports_batches: bool = False
+    """Whether `_toggle_many` is implemented, otherwise batches are toggled one atom at a time"""
+
     def __init__(self, crystal: "Crystal", auto_register: bool = True) -> None:
         self.crystal = crystal
         if auto_register:
@@ -22,12 +27,20 @@ class CrystalLike(abc.ABC):
         """Toggle a node in the graph"""
         ...
 
+    def _toggle_many(self, atoms: np.ndarray) -> None:
+        """Toggle a batch of distinct nodes at once, the result must not depend on their order.
+        It is only called if `supports_batches` is set. There is no default, since the crystal
+        is updated after the whole batch and `_toggle` may read the occupation of neighbors."""
+        raise NotImplementedError()
+
 
 class Crystal(CrystalLike):
+    supports_batches = True
+
     def __init__(self, graph: Graph) -> None:
         self.size = 0
         self.graph = graph
-        self.x_c: defaultlist[int] = defaultlist(0)
+        self.x_c: defaultlist[int] = defaultlist8(0, max(graph.size, 0))
         """This is a list of values for every node in the graph. It is 0 if the node is not
                 in the crystal and 1 otherwise."""
         self._crystal_likes: list[CrystalLike] = []
@@ -44,6 +57,22 @@ class Crystal(CrystalLike):
             cl._toggle(atom)
         self._toggle(atom)
 
+    def toggle_many(self, atoms: Iterable[int]) -> None:
+        """Toggle all `atoms` (which must be distinct) at once"""
+        atoms = np.fromiter(atoms, dtype=np.int64)
+        assert len(np.unique(atoms)) == len(atoms), "Atoms of a batch must be distinct"
+
+        if not all(cl.supports_batches for cl in self._crystal_likes):
+            for atom in atoms.tolist():
+                self.toggle(atom)
+            return
+
+        self._is_running = True
+
+        for cl in self._crystal_likes:
+            cl._toggle_many(atoms)
+        self._toggle_many(atoms)
+
     def register(self, crystal_like: CrystalLike) -> None:
         assert not self._is_running
         self._crystal_likes.append(crystal_like)
@@ -52,3 +81,9 @@ class Crystal(CrystalLike):
     def _toggle(self, atom: int):
         self.size -= sign(self.x_c[atom])
         self.x_c[atom] = 1 - self.x_c[atom]
+
+    @override
+    def _toggle_many(self, atoms: np.ndarray) -> None:
+        x = self.x_c.gather(atoms)
+        self.size -= int(np.sum(sign(x)))
+        self.x_c.scatter(atoms, 1 - x)
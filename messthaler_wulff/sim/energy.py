@@ -1,9 +1,13 @@
-from messthaler_wulff.datastructures.defaultlist import defaultlist
+import numpy as np
+
+from messthaler_wulff.datastructures.defaultlist import defaultlist, defaultlist16
 from messthaler_wulff.sim.crystal import Crystal, sign
 from messthaler_wulff.sim.quantity import CrystalQuantity
 
 
 class SurfaceEnergy(CrystalQuantity):
+    supports_batches = True
+
     def __init__(self, crystal: Crystal):
         super().__init__(crystal, crystal.graph.max_degree, is_local=True)
 
@@ -12,7 +16,7 @@ class SurfaceEnergy(CrystalQuantity):
                 $$
                     E_{c} = \sum_{n \in c} f_{G \setminus c}(n)
                 $$"""
-        self.f: defaultlist[int] = defaultlist(0)
+        self.f: defaultlist[int] = defaultlist16(0, max(crystal.graph.size, 0))
 
     def calc_f(self, node: int) -> int:
         x_c = self.crystal.x_c
@@ -38,3 +42,24 @@ class SurfaceEnergy(CrystalQuantity):
             self.f[n] -= delta
 
         self.energy += delta * (2 * self.f[atom] - graph.degree(atom))
+
+    def _toggle_many(self, atoms: np.ndarray) -> None:
+        r"""Uses $E_c = N'^\top χ_c - χ_c^\top A χ_c$, so with $s$ the change of $χ_c$
+        $$
+            ΔE_c = N'^\top s - 2 s^\top A χ_c - s^\top A s
+        $$"""
+        s = -sign(self.crystal.x_c.gather(atoms))
+        table = self.graph.neighbor_table(atoms)
+        valid = table >= 0
+
+        # A s restricted to the batch, found by looking up every neighbor among the sorted atoms
+        order = np.argsort(atoms)
+        positions = np.searchsorted(atoms[order], table).clip(max=len(atoms) - 1)
+        in_batch = valid & (atoms[order][positions] == table)
+        a_s = np.where(in_batch, s[order][positions], 0).sum(axis=1)
+
+        degrees = valid.sum(axis=1)
+        f = self.f.gather(atoms)
+        self.energy += int(s @ degrees - 2 * (s @ f) - s @ a_s)
+
+        self.f.scatter_add(table[valid], np.broadcast_to(s[:, None], table.shape)[valid])
@@ -0,0 +1,122 @@
+import logging
+from typing import Sequence
+
+import numpy as np
+
+from messthaler_wulff.datastructures.graph import Graph
+from messthaler_wulff.datastructures.lattice import Lattice
+
+log = logging.getLogger("messthaler_wulff")
+
+
+class EnsembleSimulation:
+    """Grows `walkers` independent crystals on the same lattice at once. Every step adds one
+    atom to every crystal, chosen uniformly at random among the boundary nodes of minimal
+    loneliness, just like `fill` does with a single `AdditiveSimulation`.
+
+    The state is one `(walkers, N)` array over the nodes interned in the lattice so far:
+    `contacts` counts the neighbors of a node in each crystal. A node outside a crystal
+    with `c` contacts has loneliness `degree - c` and adding it changes the energy by
+    `degree - 2c`. Nodes in a crystal are shifted down by `INSIDE`, so they are negative
+    and never win against the boundary."""
+
+    INSIDE = 64
+
+    def __init__(self, lattice: Lattice, walkers: int, origin: int = Graph.ZERO, seed=None) -> None:
+        assert lattice.max_degree < self.INSIDE
+        self.lattice = lattice
+        self.walkers = walkers
+        self.degree = lattice.max_degree
+        self.rng = np.random.default_rng(seed)
+        self._rows = np.arange(walkers)
+
+        self.size = 0
+        """The number of atoms in every crystal"""
+        self.energy = np.zeros(walkers, dtype=np.int64)
+        self.contacts = np.zeros((walkers, 0), dtype=np.int8)
+        self._reserve(len(lattice))
+
+        self.energies: list[np.ndarray] = [self.energy.copy()]
+        """The energies of all crystals, one array per size"""
+        self.nodes: list[np.ndarray] = []
+        """The node added to every crystal, one array per step"""
+
+        self.add(np.full(walkers, origin, dtype=np.int64))
+
+    @property
+    def x_c(self) -> np.ndarray:
+        """Which nodes are in which crystal, as a `(walkers, N)` boolean array"""
+        return self.contacts < 0
+
+    def _reserve(self, count: int) -> None:
+        """Make room for the first `count` nodes of the lattice, growing geometrically"""
+        capacity = self.contacts.shape[1]
+        if count <= capacity:
+            return
+        capacity = max(capacity, Lattice.INITIAL_CAPACITY)
+        while capacity < count:
+            capacity *= 2
+
+        contacts = np.zeros((self.walkers, capacity), dtype=np.int8)
+        contacts[:, :self.contacts.shape[1]] = self.contacts
+        self.contacts = contacts
+
+    def add(self, nodes: np.ndarray) -> None:
+        """Add `nodes[w]` to crystal `w` for every walker, the nodes must not be in their crystals yet"""
+        rows = self._rows
+        # Interning the neighbors may add nodes to the lattice, so this comes before reserving
+        neighbors = self.lattice.neighbor_table(nodes)
+        self._reserve(len(self.lattice))
+
+        contacts = self.contacts[rows, nodes]
+        assert (contacts >= 0).all(), "Nodes are already in their crystals"
+        self.energy += self.degree - 2 * contacts.astype(np.int64)
+        self.contacts[rows, nodes] = contacts - self.INSIDE
+        # The neighbors of a node are distinct, so no index pair repeats
+        self.contacts[rows[:, None], neighbors] += 1
+        self.size += 1
+
+        self.energies.append(self.energy.copy())
+        self.nodes.append(nodes)
+
+    def next(self) -> np.ndarray:
+        """One random boundary node of minimal loneliness per walker"""
+        contacts = self.contacts[:, :len(self.lattice)]
+        best = contacts.max(axis=1)
+        assert (best > 0).all(), "A crystal has no boundary"
+
+        # Only few nodes share the maximum, so they are picked from a sparse list
+        rows, columns = np.nonzero(contacts == best[:, None])
+        starts = np.searchsorted(rows, self._rows)
+        choices = (self.rng.random(self.walkers) * np.bincount(rows, minlength=self.walkers)).astype(np.int64)
+        return columns[starts + choices]
+
+    def step(self) -> None:
+        self.add(self.next())
+
+    def run(self, size: int) -> None:
+        """Grow all crystals to `size` atoms"""
+        while self.size < size:
+            self.step()
+
+    def energy_curves(self) -> np.ndarray:
+        """The energies of all walkers as a `(size + 1, walkers)` array, indexed by the number of atoms"""
+        return np.stack(self.energies)
+
+    def percentiles(self, q: Sequence[float] = (0, 5, 50, 95, 100)) -> np.ndarray:
+        """The percentiles `q` of the energy over all walkers as a `(len(q), size + 1)` array"""
+        return np.percentile(self.energy_curves(), q, axis=1)
+
+    def crystal(self, walker: int) -> np.ndarray:
+        """The nodes of the crystal of `walker`"""
+        return np.flatnonzero(self.contacts[walker] < 0)
+
+    def calculate_energy(self) -> np.ndarray:
+        """Recompute the energies of all crystals from scratch, for testing"""
+        count = len(self.lattice)
+        neighbors = self.lattice.neighbor_table(np.arange(count))
+        self._reserve(len(self.lattice))
+
+        x_c = self.x_c
+        outside = self.degree - x_c[:, neighbors].sum(axis=2, dtype=np.int64)
+        return (x_c[:, :count] * outside).sum(axis=1)
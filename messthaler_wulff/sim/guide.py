@@ -6,11 +6,12 @@ from messthaler_wulff.sim.quantity import CrystalQuantity
 
 
 class CrystalGuide(CrystalLike):
-    def __init__(self, quantity: CrystalQuantity, mode: PriorityMode) -> None:
+    def __init__(self, quantity: CrystalQuantity, mode: PriorityMode,
+                 stack_type: type[PriorityStack] = PriorityStack) -> None:
         super().__init__(quantity.crystal)
         self.quantity = quantity
         self.mode = mode
-        self.stack = PriorityStack(mode, quantity.local_max)
+        self.stack = stack_type(mode, quantity.local_max, max(self.graph.size, 0))
 
     def next(self) -> Sequence[int]:
         return self.stack.extrema()
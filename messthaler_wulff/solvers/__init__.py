@@ -1,6 +1,8 @@
 import abc
 from typing import Protocol, Self
 
+import numpy as np
+
 from messthaler_wulff.datastructures.graph import Graph
 
 
@@ -19,15 +21,38 @@ class Result(list[int]):
         return cls([-1] * n)
 
     def combine(self, other: Self) -> Self:
-        return Result(map(self.better, zip(self, other)))
+        return Result(map(self.better, self, other))
 
     def put(self, n: int, E: int):
         if n >= len(self): return
         self[n] = self.better(self[n], E)
 
 
+def energy_terms(graph: Graph, nodes: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    r"""The surface energy of crystals among `nodes` as a quadratic function of their occupations
+    $$
+        E_c = u^\top χ_c - \frac{1}{2} χ_c^\top W χ_c
+    $$
+    where $u$ are the degrees and $W$ the symmetric bond counts between the nodes, with loops
+    moved into $u$ so the diagonal of $W$ is zero. This is the energy `SurfaceEnergy` tracks."""
+    index = {v: i for i, v in enumerate(nodes)}
+    unary = np.array([graph.degree(v) for v in nodes], dtype=np.int64)
+    bonds = np.zeros((len(nodes), len(nodes)), dtype=np.int64)
+    for i, v in enumerate(nodes):
+        for u in graph.neighbors(v):
+            j = index.get(u)
+            if j is None:
+                continue
+            if j == i:
+                unary[i] -= 2
+            else:
+                bonds[i, j] += 1
+                bonds[j, i] += 1
+    return unary, bonds
+
+
 class Solver[T: Graph](Protocol):
-    @abc.abstractmethod
     @staticmethod
+    @abc.abstractmethod
     def solve(graph: Graph, nodes: list[int], n: int) -> Result:
         ...
@@ -0,0 +1,130 @@
+from typing import Optional
+
+import numpy as np
+
+from messthaler_wulff.datastructures.graph import Graph
+from messthaler_wulff.solvers import Result, energy_terms
+
+UNDECIDED = 0
+INSIDE = 1
+OUTSIDE = 2
+
+
+def greedy(unary: np.ndarray, bonds: np.ndarray) -> list[int]:
+    """Energies of a crystal grown one atom at a time from the best connected node, always
+    adding the atom with the most bonds to it. These are upper bounds for every size."""
+    if len(unary) == 0:
+        return [0]
+    gain = np.zeros(len(unary), dtype=np.int64)
+    free = np.ones(len(unary), dtype=bool)
+    energies = [0]
+    v = int(np.argmax(bonds.sum(axis=1) - unary))
+    while True:
+        energies.append(energies[-1] + int(unary[v] - gain[v]))
+        free[v] = False
+        gain += bonds[v]
+        if not free.any():
+            return energies
+        v = int(np.argmax(np.where(free, gain - unary, np.iinfo(np.int64).min)))
+
+
+class BranchAndBound:
+    r"""Finds the minimal energy of crystals with exactly `size` atoms by deciding for one node
+    after the other whether it is inside. A branch with the atoms `I` decided to be inside and
+    `r` atoms `R` left to choose among the undecided nodes `U` has the energy
+    $$
+        E_I + \sum_{v \in R} (u_v - w(v, I)) - \frac{1}{2} \sum_{v, v' \in R} w_{vv'}
+    $$
+    and is pruned once a lower bound of it is no better than the best crystal so far. Every
+    chosen atom can at best bond to all of its undecided neighbors or to all the other chosen
+    atoms, and all of them together have at most as many bonds as the best crystal with `r`
+    atoms, which is known once the smaller sizes were searched."""
+
+    def __init__(self, unary: np.ndarray, bonds: np.ndarray):
+        self.unary = unary
+        self.bonds = bonds
+        self.max_bond = int(bonds.max(initial=0))
+        self.max_unary = int(unary.max(initial=0))
+        self.max_internal: list[int] = [0]
+        """The most bonds crystals of every size searched so far can have among themselves"""
+        self.visited = 0
+        """How many branches were searched, for comparing bounds"""
+
+    def lower_bound(self, state: np.ndarray, gain: np.ndarray, open_bonds: np.ndarray, r: int) -> int:
+        undecided = state == UNDECIDED
+        outside = self.unary[undecided] - gain[undecided]
+        internal = np.minimum(open_bonds[undecided], (r - 1) * self.max_bond)
+
+        # Every atom bonds to as many chosen atoms as it can
+        bound = -(-int(np.partition(2 * outside - internal, r - 1)[:r].sum()) // 2)
+        if r < len(self.max_internal):
+            # The chosen atoms have at most as many bonds as the best crystal of their size
+            bound = max(bound, int(np.partition(outside, r - 1)[:r].sum()) - self.max_internal[r])
+        return bound
+
+    def search(self, size: int, best: int) -> int:
+        """The minimal energy with `size` atoms, or `best` if no crystal is better"""
+        count = len(self.unary)
+        state = np.full(count, UNDECIDED, dtype=np.int8)
+        gain = np.zeros(count, dtype=np.int64)
+        """Bonds of every node to the atoms inside"""
+        open_bonds = self.bonds.sum(axis=1)
+        """Bonds of every node to the undecided nodes"""
+        energy = 0
+        inside = 0
+        undecided = count
+
+        def branch():
+            nonlocal best, energy, inside, undecided
+            self.visited += 1
+            r = size - inside
+            if r == 0:
+                best = min(best, energy)
+                return
+            if undecided < r or energy + self.lower_bound(state, gain, open_bonds, r) >= best:
+                return
+
+            # Decide the node with the most bonds to the atoms inside first
+            v = int(np.argmax(np.where(state == UNDECIDED, gain * (count * self.max_bond + 1) + open_bonds, -1)))
+            undecided -= 1
+            open_bonds[:] -= self.bonds[v]
+
+            state[v] = INSIDE
+            delta = int(self.unary[v] - gain[v])
+            energy += delta
+            inside += 1
+            gain[:] += self.bonds[v]
+            branch()
+            gain[:] -= self.bonds[v]
+            inside -= 1
+            energy -= delta
+
+            state[v] = OUTSIDE
+            branch()
+
+            state[v] = UNDECIDED
+            open_bonds[:] += self.bonds[v]
+            undecided += 1
+
+        branch()
+        if size == len(self.max_internal):
+            self.max_internal.append(size * self.max_unary - best)
+        return best
+
+
+def solve(graph: Graph, nodes: list[int], n: int, upper_bounds: Optional[Result] = None) -> Result:
+    """The minimal energy of crystals with `0, ..., n - 1` atoms among `nodes`, the same as
+    `bfsolver.solve`. The search for every size starts from the greedy crystal or the energy
+    in `upper_bounds`, which must be reached by some crystal among `nodes`, so every result
+    is certified to be minimal."""
+    unary, bonds = energy_terms(graph, nodes)
+    engine = BranchAndBound(unary, bonds)
+    incumbents = greedy(unary, bonds)
+
+    res = Result.initial(n)
+    for size in range(min(n, len(incumbents))):
+        best = incumbents[size]
+        if upper_bounds is not None and size < len(upper_bounds):
+            best = Result.better(best, upper_bounds[size])
+        res.put(size, engine.search(size, best))
+    return res
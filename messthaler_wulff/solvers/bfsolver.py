@@ -1,31 +1,133 @@
+import concurrent.futures
+import math
+import multiprocessing
+from typing import Optional
+
+import numpy as np
 import tqdm
 
 from messthaler_wulff.datastructures.graph import Graph
-from messthaler_wulff.sim.crystal import Crystal
-from messthaler_wulff.sim.energy import SurfaceEnergy
-from messthaler_wulff.sim.quantity import CrystalQuantity
-from messthaler_wulff.solvers import Result
+from messthaler_wulff.solvers import Result, energy_terms
+
+INNER_BITS = 16
+"""The last nodes are split off into blocks of at most `2^INNER_BITS` subsets, which are
+evaluated all at once with NumPy"""
+TASKS_PER_JOB = 8
+"""Into how many prefixes the work of every process is split, so they finish at about the same time"""
+
+INFINITY = np.iinfo(np.int32).max
+
+
+def popcount_order(bits: int) -> tuple[np.ndarray, np.ndarray]:
+    """All subsets of `bits` bits as a `(2^bits, bits)` array sorted by their size, and where
+    the subsets of every size start"""
+    subsets = np.arange(1 << bits, dtype=np.int64)
+    matrix = (subsets[:, None] >> np.arange(bits, dtype=np.int64)) & 1
+    matrix = matrix[np.argsort(matrix.sum(axis=1), kind="stable")]
+    starts = np.searchsorted(matrix.sum(axis=1), np.arange(bits + 1))
+    return matrix, starts
+
+
+class BruteForce:
+    """Enumerates all subsets of the nodes, split into three parts. The first `prefix_bits`
+    outer nodes are fixed for every task, the other outer nodes are walked in Gray-code order
+    so every step toggles one node, and the inner nodes are a block of subsets whose energies
+    are updated at once.
+
+    `block[s]` is the energy of the inner subset `s` minus its bonds to the occupied outer nodes,
+    toggling outer node `o` adds or subtracts its precomputed bonds to every inner subset."""
+
+    def __init__(self, unary: np.ndarray, bonds: np.ndarray, inner_bits: int = INNER_BITS):
+        self.unary = unary
+        self.bonds = bonds
+        size = len(unary)
+        self.inner_bits = min(inner_bits, size)
+        self.outer = size - self.inner_bits
+
+        subsets, self.starts = popcount_order(self.inner_bits)
+        inner_unary = unary[self.outer:]
+        inner_bonds = bonds[self.outer:, self.outer:]
+        self.inner_energy = (subsets @ inner_unary
+                             - np.einsum("si,ij,sj->s", subsets, inner_bonds, subsets) // 2).astype(np.int32)
+        self.inner_bonds = np.ascontiguousarray((subsets @ bonds[:self.outer, self.outer:].T).T, dtype=np.int32)
+        """Bonds of every outer node to every inner subset, `(outer, 2^inner_bits)`"""
+
+    def solve_prefix(self, prefix: int, prefix_bits: int) -> np.ndarray:
+        """The minimal energy for every atom count among all subsets whose first `prefix_bits`
+        nodes are occupied like the bits of `prefix`"""
+        best = np.full(len(self.unary) + 1, INFINITY, dtype=np.int64)
+        occupied = np.zeros(self.outer, dtype=np.int64)
+        block = self.inner_energy.copy()
+        energy = 0
+        size = 0
 
+        def toggle(o: int):
+            nonlocal energy, size
+            if occupied[o]:
+                occupied[o] = 0
+                energy -= self.unary[o] - self.bonds[o, :self.outer] @ occupied
+                np.add(block, self.inner_bonds[o], out=block)
+                size -= 1
+            else:
+                energy += self.unary[o] - self.bonds[o, :self.outer] @ occupied
+                occupied[o] = 1
+                np.subtract(block, self.inner_bonds[o], out=block)
+                size += 1
 
-def solve_part(graph: Graph, c: Crystal, E: SurfaceEnergy, nodes: list[int], i: int) -> Result:
-    if i < 0:
-        yield
-        return
-    k = nodes[i]
+        def record():
+            minima = np.minimum.reduceat(block, self.starts) + energy
+            np.minimum(best[size:size + len(minima)], minima, out=best[size:size + len(minima)])
 
-    yield from solve_part(graph, c, E, nodes, i - 1)
-    c.toggle(k)
-    yield from solve_part(graph, c, E, nodes, i - 1)
-    c.toggle(k)
+        for o in range(prefix_bits):
+            if prefix >> o & 1:
+                toggle(o)
 
+        record()
+        for step in range(1, 1 << (self.outer - prefix_bits)):
+            # The Gray code of step differs from that of step - 1 in its lowest set bit
+            toggle(prefix_bits + (step & -step).bit_length() - 1)
+            record()
 
-def solve(graph: Graph, nodes: list[int], n: int) -> Result:
-    c = Crystal(graph)
-    E: CrystalQuantity = SurfaceEnergy(c)
+        return best
 
+
+_engine: Optional[BruteForce] = None
+
+
+def _init_worker(engine: BruteForce):
+    global _engine
+    _engine = engine
+
+
+def _solve_prefix(prefix: int, prefix_bits: int) -> np.ndarray:
+    return _engine.solve_prefix(prefix, prefix_bits)
+
+
+def to_result(best: np.ndarray, n: int) -> Result:
     res = Result.initial(n)
+    for k, energy in enumerate(best.tolist()):
+        if energy < INFINITY:
+            res.put(k, energy)
+    return res
+
 
-    for _ in tqdm.tqdm(solve_part(graph, c, E, nodes, len(nodes) - 1), total=2 ** len(nodes)):
-        res.put(c.size, E.value)
+def solve(graph: Graph, nodes: list[int], n: int, jobs: int = 1, inner_bits: int = INNER_BITS) -> Result:
+    """The minimal energy of crystals with `0, ..., n - 1` atoms among `nodes` by trying all
+    subsets of them, in `jobs` processes"""
+    engine = BruteForce(*energy_terms(graph, nodes), inner_bits=inner_bits)
+    prefix_bits = min(engine.outer, math.ceil(math.log2(jobs * TASKS_PER_JOB)))
+    prefixes = range(1 << prefix_bits)
+
+    res = Result.initial(n)
+    if jobs == 1:
+        for prefix in tqdm.tqdm(prefixes, disable=prefix_bits == 0):
+            res = res.combine(to_result(engine.solve_prefix(prefix, prefix_bits), n))
+        return res
 
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=_init_worker,
+                                                initargs=(engine,)) as executor:
+        futures = [executor.submit(_solve_prefix, prefix, prefix_bits) for prefix in prefixes]
+        for future in tqdm.tqdm(concurrent.futures.as_completed(futures), total=len(futures)):
+            res = res.combine(to_result(future.result(), n))
     return res
@@ -1,6 +1,89 @@
+import numpy as np
+
 from messthaler_wulff.datastructures.graph import Graph
-from messthaler_wulff.solvers import Result
+from messthaler_wulff.solvers import Result, energy_terms
+
+INFINITY = np.iinfo(np.int64).max // 4
+"""Energy of atom counts that no assignment reaches"""
+
+
+def elimination_order(graph: Graph, nodes: list[int]) -> list[int]:
+    """Order `nodes` greedily so that the frontier, the processed nodes that still have
+    unprocessed neighbors, stays small. For a ball this sweeps through it layer by layer."""
+    node_set = set(nodes)
+    neighbors = {v: set(graph.neighbors(v)) & node_set - {v} for v in nodes}
+    # How many neighbors of every node have not been processed yet
+    remaining = {v: len(neighbors[v]) for v in nodes}
+
+    order = []
+    frontier: set[int] = set()
+    candidates: set[int] = set()
+    unprocessed = set(nodes)
+
+    def growth(v: int) -> tuple[int, int, int]:
+        """How much the frontier grows when processing `v`, then how many neighbors it leaves open"""
+        closed = sum(1 for u in neighbors[v] if u in frontier and remaining[u] == 1)
+        return (1 if remaining[v] > 0 else 0) - closed, remaining[v], v
+
+    while unprocessed:
+        v = min(candidates or unprocessed, key=growth)
+
+        order.append(v)
+        unprocessed.discard(v)
+        candidates.discard(v)
+        for u in neighbors[v]:
+            remaining[u] -= 1
+            if u in frontier and remaining[u] == 0:
+                frontier.discard(u)
+            if u in unprocessed:
+                candidates.add(u)
+        if remaining[v] > 0:
+            frontier.add(v)
+
+    return order
 
 
 def solve(graph: Graph, nodes: list[int], n: int) -> Result:
-    ...
\ No newline at end of file
+    r"""The minimal energy of crystals with `0, ..., n - 1` atoms among `nodes`, the same as
+    `bfsolver.solve`. The energy is a quadratic function of the occupations, see `energy_terms`,
+    so the nodes are eliminated one at a time like in $r_k = \min(r_{k-1}(0), r_{k-1}(1))$,
+    once all of their neighbors were assigned. Only the assignments of the frontier are
+    tracked, each with the minimal energy for every atom count. That costs
+    $O(2^w \cdot n)$ per node for a frontier of width $w$ instead of $O(2^{|nodes|})$."""
+    order = elimination_order(graph, nodes)
+    unary, bonds = energy_terms(graph, order)
+    # How many bonds of every node lead to nodes that come later
+    remaining = np.triu(bonds).sum(axis=1).tolist()
+    frontier: list[int] = []
+    # energies[s, k] is the minimal energy of the processed nodes with k atoms, given that
+    # bit i of s is the occupation of frontier[i]
+    energies = np.full((1, n), INFINITY, dtype=np.int64)
+    if n > 0:
+        energies[0, 0] = 0
+
+    for v in range(len(order)):
+        # Energy of v and the bonds it shares with occupied nodes of the frontier
+        states = np.arange(len(energies), dtype=np.int64)
+        bits = (states[:, None] >> np.arange(len(frontier), dtype=np.int64)) & 1
+        added = unary[v] - bits @ bonds[v, frontier]
+
+        occupied = np.full_like(energies, INFINITY)
+        occupied[:, 1:] = np.where(energies[:, :-1] >= INFINITY, INFINITY, energies[:, :-1] + added[:, None])
+        energies = np.concatenate([energies, occupied])
+        frontier.append(v)
+
+        for u in np.flatnonzero(bonds[v, :v]).tolist():
+            remaining[u] -= bonds[v, u]
+
+        # Eliminate the nodes whose neighbors are all assigned
+        for i in reversed(range(len(frontier))):
+            if remaining[frontier[i]] > 0:
+                continue
+            energies = energies.reshape(-1, 2, 1 << i, n).min(axis=1).reshape(-1, n)
+            del frontier[i]
+
+    res = Result.initial(n)
+    for k, energy in enumerate(energies.min(axis=0).tolist()):
+        if energy < INFINITY:
+            res.put(k, energy)
+    return res
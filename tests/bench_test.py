@@ -0,0 +1,30 @@
+import json
+
+from messthaler_wulff import parse_lattice
+from messthaler_wulff.bench import regressions
+from messthaler_wulff.modes.mode_bench import run_mode
+
+
+def test_regressions():
+    baseline = {"fcc": {"toggles_per_s": 100.0, "peak_rss_bytes": 1000.0}}
+
+    assert regressions(baseline, {"fcc": {"toggles_per_s": 95.0, "peak_rss_bytes": 1050.0}}, 0.1) == []
+    assert len(regressions(baseline, {"fcc": {"toggles_per_s": 80.0, "peak_rss_bytes": 1000.0}}, 0.1)) == 1
+    assert len(regressions(baseline, {"fcc": {"toggles_per_s": 200.0, "peak_rss_bytes": 1200.0}}, 0.1)) == 1
+    assert regressions(baseline, {"triangular": {"toggles_per_s": 1.0}}, 0.1) == []
+
+
+def test_bench_mode(tmp_path):
+    output = tmp_path / "bench.json"
+    assert run_mode({"triangular": parse_lattice("triangular")}, output=output, size="quick", repeat=1)
+
+    report = json.loads(output.read_text())
+    metrics = report["results"]["triangular"]
+    assert metrics["additive_toggles_per_s"] > 0
+    assert metrics["lattice_explore_peak_rss_bytes"] > 0
+
+    for metric in metrics:
+        metrics[metric] *= 1000 if metric.endswith("_per_s") else 1
+    faster = tmp_path / "faster.json"
+    faster.write_text(json.dumps(report))
+    assert not run_mode({"triangular": parse_lattice("triangular")}, compare=faster, size="quick", repeat=1)
@@ -0,0 +1,60 @@
+import numpy as np
+from hypothesis import given, settings, HealthCheck, strategies as st
+
+from messthaler_wulff import fcc_transform, parse_initial_crystal
+from messthaler_wulff.crystal_archive import CrystalArchive, CrystalArchiveWriter, is_archive_spec, load_crystal
+from messthaler_wulff.modes.mode_explore import run_mode
+
+strategy_crystals = st.integers(min_value=1, max_value=4).flatmap(
+    lambda width: st.lists(st.lists(st.tuples(*[st.integers(min_value=-2 ** 31, max_value=2 ** 31 - 1)
+                                                for _ in range(width)]), max_size=10)).map(lambda c: (width, c)))
+
+
+@settings(suppress_health_check=[HealthCheck.function_scoped_fixture])
+@given(strategy_crystals)
+def test_round_trip(tmp_path, data):
+    width, crystals = data
+    path = tmp_path / "crystals.mwc"
+    with CrystalArchiveWriter(path, width, ti=True, require_energy=3) as writer:
+        writer.add_all(crystals)
+
+    archive = CrystalArchive(path)
+    assert len(archive) == len(crystals)
+    assert [archive.atoms(k) for k in range(len(archive))] == crystals
+    assert archive.sizes().tolist() == list(map(len, crystals))
+    assert archive.ti and not archive.bidi and archive.require_energy == 3 and archive.lattice is None
+
+
+def test_memory_mapped(tmp_path):
+    path = tmp_path / "crystals.mwc"
+    with CrystalArchiveWriter(path, 4, lattice=fcc_transform(), bidi=True) as writer:
+        for n in range(1, 100):
+            writer.add([(0, i, -i, n) for i in range(n)])
+
+    archive = CrystalArchive(path)
+    assert archive.coordinates.dtype == np.int16
+    assert np.shares_memory(archive[42], archive.data)
+    assert archive[-1].shape == (99, 4)
+    assert np.allclose(archive.lattice, fcc_transform())
+    assert archive.require_energy is None
+
+    assert is_archive_spec(f"{path}@5") and is_archive_spec(str(path))
+    assert not is_archive_spec("[(0, 0, 0, 0)]")
+    assert load_crystal(f"{path}@2") == [(0, 0, 0, 3), (0, 1, -1, 3), (0, 2, -2, 3)]
+    assert load_crystal(str(path)) == [(0, 0, 0, 1)]
+
+
+def test_explore_archive(tmp_path, monkeypatch):
+    run_mode(6, fcc_transform(), 3, tmp_path, False, (), 4, dump_format="archive")
+    run_mode(6, fcc_transform(), 3, tmp_path / "text", False, (), 4)
+
+    archives = sorted(tmp_path.glob("*.mwc"))
+    assert len(archives) == 7
+    for path in archives:
+        text = (tmp_path / "text" / path.with_suffix(".txt").name).read_text().splitlines()
+        archive = CrystalArchive(path)
+        assert len(archive) == len(text)
+        assert archive.ti and archive.bidi and archive.require_energy == 4
+
+    monkeypatch.setattr("builtins.input", lambda _: "")
+    assert parse_initial_crystal(f"{archives[-1]}@0", 3) == CrystalArchive(archives[-1]).atoms(0)
@@ -0,0 +1,87 @@
+from hypothesis import given, strategies as st
+
+from messthaler_wulff.abstract_crystal_store import DumbCrystal, PackedCrystal, TICrystal
+
+atom_strategy = st.tuples(st.just(0), *[st.integers(min_value=-20, max_value=20)] * 3)
+crystal_strategy = st.lists(atom_strategy, max_size=30, unique=True)
+offset_strategy = st.tuples(st.just(0), *[st.integers(min_value=-100, max_value=100)] * 3)
+
+
+def translate(atoms, offset):
+    return [tuple(a + o for a, o in zip(atom, offset)) for atom in atoms]
+
+
+def build(atoms) -> DumbCrystal:
+    c = DumbCrystal.empty()
+    for atom in atoms:
+        c = c.add_atom(atom)
+    return c
+
+
+@given(crystal_strategy, offset_strategy)
+def test_translations_are_equal(atoms, offset):
+    c1 = TICrystal(build(atoms))
+    c2 = TICrystal(build(translate(reversed(atoms), offset)))
+
+    assert hash(c1) == hash(c2)
+    assert c1 == c2
+
+
+@given(crystal_strategy, st.lists(st.integers(min_value=0, max_value=100), max_size=30))
+def test_incremental_hash(atoms, removals):
+    c = build(atoms)
+    remaining = list(atoms)
+
+    for i in removals:
+        if len(remaining) == 0:
+            break
+        atom = remaining.pop(i % len(remaining))
+        c = c.remove_atom(atom)
+
+    fresh = DumbCrystal(frozenset(remaining))
+    assert c == fresh
+    assert hash(c) == hash(fresh)
+    assert c.first() == fresh.first()
+    assert c.translation_hash() == fresh.translation_hash()
+
+
+@given(crystal_strategy, crystal_strategy, offset_strategy)
+def test_matches_reference(atoms1, atoms2, offset):
+    c1 = build(atoms1)
+    c2 = build(translate(atoms2, offset))
+    reference = (len(atoms1) == len(atoms2) and
+                 frozenset(translate(atoms1, (0, *(b - a for a, b in zip(min(atoms1)[1:], min(atoms2)[1:]))))) ==
+                 frozenset(atoms2)) if atoms1 and atoms2 else len(atoms1) == len(atoms2)
+
+    assert (TICrystal(c1) == TICrystal(c2)) == reference
+
+
+@given(crystal_strategy, crystal_strategy, offset_strategy)
+def test_packed_matches_dumb(atoms1, atoms2, offset):
+    atoms2 = translate(atoms2, offset)
+    p1, p2 = PackedCrystal.wrap_atoms(atoms1), PackedCrystal.wrap_atoms(atoms2)
+    d1, d2 = build(atoms1), build(atoms2)
+
+    assert list(p1.atoms()) == list(d1.atoms())
+    assert p1.size == d1.size
+    assert p1.first() == d1.first()
+    assert (p1 == p2) == (d1 == d2)
+    assert (TICrystal(p1) == TICrystal(p2)) == (TICrystal(d1) == TICrystal(d2))
+    assert sorted(p1.diff(p2)) == sorted(d1.diff(d2))
+
+    for direction, atom in p1.diff(p2):
+        p1 = p1.add_atom(atom) if direction == 1 else p1.remove_atom(atom)
+    assert p1 == p2
+    assert hash(p1) == hash(p2)
+
+
+@given(crystal_strategy, offset_strategy)
+def test_packed_translations(atoms, offset):
+    c1 = PackedCrystal.wrap_atoms(atoms)
+    c2 = PackedCrystal.empty()
+    for atom in translate(reversed(atoms), offset):
+        c2 = c2.add_atom(atom)
+
+    assert hash(TICrystal(c1)) == hash(TICrystal(c2))
+    assert TICrystal(c1).fingerprint() == TICrystal(c2).fingerprint()
+    assert TICrystal(c1) == TICrystal(c2)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from hypothesis import given, strategies as st
+
+from messthaler_wulff.datastructures.defaultlist import defaultlist, defaultlist8, defaultlist16, defaultlist32, \
+    typeddefaultlist
+
+list_strategy = st.sampled_from([defaultlist8, defaultlist16, defaultlist32])
+
+action_strategy = st.lists(st.tuples(
+    st.sampled_from(["get", "set"]),
+    st.integers(min_value=0, max_value=300),
+    st.integers(min_value=-100, max_value=100)), max_size=200)
+
+
+@given(list_strategy, action_strategy)
+def test_against_defaultlist(list_type: type[typeddefaultlist], actions: list[tuple[str, int, int]]):
+    reference = defaultlist(-1)
+    typed = list_type(-1)
+
+    for action, key, value in actions:
+        match action:
+            case "get":
+                assert typed[key] == reference[key]
+            case "set":
+                typed[key] = value
+                reference[key] = value
+        assert len(typed) == len(reference)
+
+    assert typed.view().tolist() == reference.values
+    assert typed.values.tolist() == reference.values
+
+
+@given(list_strategy, st.integers(min_value=0, max_value=300), st.integers(min_value=0, max_value=300))
+def test_resize(list_type: type[typeddefaultlist], first: int, second: int):
+    l = list_type(7)
+    l.resize(first)
+    l.fill(3)
+    l.resize(second)
+
+    assert len(l) == second
+    assert l.view().tolist() == [3] * min(first, second) + [7] * max(0, second - first)
+
+
+def test_view_shares_memory():
+    l = defaultlist32(0, 10)
+    view = l.view()
+    view[3] = 5
+    l[4] = 6
+
+    assert l[3] == 5
+    assert view[4] == 6
+    assert view.dtype == np.int32
+
+
+def test_scatter_add():
+    l = defaultlist8(0)
+    l.scatter_add(np.array([1, 1, 5]), np.array([2, 3, -1]))
+
+    assert l.view().tolist() == [0, 5, 0, 0, 0, -1]
+    assert l.gather(np.array([5, 1])).tolist() == [-1, 5]
+
+
+@given(list_strategy)
+def test_values_writes_through(list_type: type[typeddefaultlist]):
+    l = list_type(0, 10)
+    l.values[3] = 5
+
+    assert l[3] == 5
+    with pytest.raises(AttributeError):
+        l.values.append(1)
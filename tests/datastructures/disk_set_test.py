@@ -0,0 +1,39 @@
+from hypothesis import given, settings, strategies as st
+
+from messthaler_wulff.datastructures.disk_set import DiskFingerprintSet
+
+fingerprints = st.integers(min_value=0, max_value=2 ** 128 - 1)
+
+
+@settings(deadline=None, max_examples=50)
+@given(st.lists(st.one_of(fingerprints, st.integers(min_value=0, max_value=20))))
+def test_behaves_like_set(values):
+    expected = set()
+    with DiskFingerprintSet(buffer_size=3, chunk_size=2) as visited:
+        for value in values:
+            assert visited.add(value) == (value not in expected)
+            expected.add(value)
+            assert len(visited) == len(expected)
+
+        visited.flush()
+        if visited._merger is not None:
+            visited._merger.join()
+        assert all(value in visited for value in expected)
+        assert sum(map(len, visited.runs)) == len(expected)
+
+
+def test_runs_are_merged(tmp_path):
+    with DiskFingerprintSet(tmp_path, buffer_size=10, chunk_size=7) as visited:
+        for value in range(1000):
+            assert visited.add(value * 2 ** 64 + value % 3)
+            if visited._merger is not None:
+                visited._merger.join()
+
+        assert len(visited.runs) <= 10
+        for run in visited.runs:
+            order = run.high * 3 + run.low
+            assert (order[1:] > order[:-1]).all()
+        assert all(value * 2 ** 64 + value % 3 in visited for value in range(1000))
+        assert 1000 * 2 ** 64 not in visited
+
+    assert list(tmp_path.iterdir()) == []
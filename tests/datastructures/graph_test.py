@@ -1,8 +1,10 @@
-from hypothesis import strategies as st, given
+import numpy as np
+from hypothesis import strategies as st, given, settings
 
 from messthaler_wulff.data.common_lattices import CommonLattice
 from messthaler_wulff.datastructures.graph import Graph
 from messthaler_wulff.datastructures.lattice import Lattice, UniformNeighborhood
+from messthaler_wulff.datastructures.periodic_lattice import PeriodicLattice
 from messthaler_wulff.datastructures.priority_stack import defaultlist
 
 strategy_graph = (st.one_of(list(map(st.just, CommonLattice)))
@@ -54,6 +56,20 @@ def test_hex_lattice(node: tuple):
     assert l.walk_path(key, [0, 2, 4]) == key
 
 
+@given(st.lists(st.integers(min_value=-2 ** 21, max_value=2 ** 21) | st.integers(), min_size=3, max_size=3)
+       .map(lambda l: tuple(l)))
+def test_far_nodes(node: tuple):
+    l = Lattice(CommonLattice.fcc.value)
+
+    key = l.intern(node)
+
+    assert l.repr(key) == node
+    for i, n in enumerate(l.neighbors(key)):
+        assert l.repr(n) == l.neighborhood.neighbor(node, i)
+        assert l.intern(l.repr(n)) == n
+        assert key in l.neighbors(n)
+
+
 class DiscoverNeighbors:
     def __init__(self, lattice: Lattice, max_distance: int):
         self.max_distance = max_distance
@@ -77,9 +93,81 @@ class DiscoverNeighbors:
                     self._stack.append(n)
 
 
+@settings(deadline=None)
 @given(strategy_graph, st.lists(st.integers(min_value=0, max_value=100), min_size=5, max_size=10))
 def test_neighbor_gen(lattice: Lattice, path: list[int]):
     DiscoverNeighbors(lattice, len(path))
-    before = frozenset(lattice._neighbors)
+    before = lattice._neighbors.copy()
     lattice.walk_path(Graph.ZERO, [x % lattice.max_degree for x in path])
-    assert before == frozenset(lattice._neighbors)
+    assert np.array_equal(before, lattice._neighbors)
+
+
+@given(strategy_graph, st.lists(st.integers(min_value=0, max_value=100), min_size=1, max_size=30))
+def test_neighbors_are_consistent(lattice: Lattice, path: list[int]):
+    node = lattice.walk_path(Graph.ZERO, [x % lattice.max_degree for x in path])
+    value = lattice.repr(node)
+
+    for i, n in enumerate(lattice.neighbors(node)):
+        assert lattice.repr(n) == lattice.neighborhood.neighbor(value, i)
+        assert lattice.intern(lattice.repr(n)) == n
+        assert lattice.is_edge(node, n)
+
+
+strategy_periodic_graph = st.builds(
+    PeriodicLattice,
+    st.just(CommonLattice.fcc.value),
+    st.lists(st.integers(min_value=3, max_value=7), min_size=3, max_size=3))
+
+
+@given(strategy_periodic_graph, st.lists(st.integers(min_value=0, max_value=100), max_size=30))
+def test_periodic_neighbors(lattice: PeriodicLattice, path: list[int]):
+    node = Graph.ZERO
+    for i in path:
+        node = lattice.neighbors(node)[i % lattice.max_degree]
+
+    value = lattice.repr(node)
+    neighbors = lattice.neighbors(node)
+
+    assert 0 <= node < lattice.size
+    assert lattice.intern(value) == node
+    assert len(frozenset(neighbors)) == lattice.max_degree
+    for i, n in enumerate(neighbors):
+        assert n == lattice.intern(lattice.neighborhood.neighbor(value, i))
+        assert lattice.is_edge(node, n)
+
+
+def test_periodic_wraps_around():
+    lattice = PeriodicLattice(CommonLattice.square.value, (4, 5))
+
+    assert lattice.size == 20
+    assert lattice.intern((4, 5)) == Graph.ZERO
+    assert lattice.intern((-1, 0)) == lattice.intern((3, 0))
+    assert all(0 <= n < lattice.size for node in range(lattice.size) for n in lattice.neighbors(node))
+
+
+def test_automorphisms():
+    assert len(CommonLattice.square.value.automorphisms()) == 8
+    assert len(CommonLattice.triangular.value.automorphisms()) == 12
+    assert len(CommonLattice.cubic.value.automorphisms()) == 48
+    assert len(CommonLattice.fcc.value.automorphisms()) == 48
+
+
+TRIANGULAR = np.array([[1, 0.5],
+                       [0, np.sqrt(0.75)]])
+
+
+def test_from_transform():
+    assert set(UniformNeighborhood.from_transform(np.eye(3))._neighbors) == \
+           set(map(tuple, CommonLattice.cubic.value._neighbors))
+    assert UniformNeighborhood.from_transform(TRIANGULAR).degree == 6
+
+
+@given(st.integers(-8, 8), st.integers(-8, 8))
+@settings(max_examples=50)
+def test_from_transform_skewed(a: int, b: int):
+    # Any unimodular change of basis describes the same lattice
+    unimodular = np.array([[1, a], [0, 1]]) @ np.array([[1, 0], [b, 1]])
+    skewed = UniformNeighborhood.from_transform(TRIANGULAR @ unimodular)
+
+    assert {tuple((unimodular @ v).tolist()) for v in np.array(skewed._neighbors)} == \
+           set(UniformNeighborhood.from_transform(TRIANGULAR)._neighbors)
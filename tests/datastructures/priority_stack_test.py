@@ -1,6 +1,6 @@
 from hypothesis import given, strategies as st
 
-from messthaler_wulff.datastructures.priority_stack import PriorityStack, PriorityMode
+from messthaler_wulff.datastructures.priority_stack import PriorityStack, PriorityMode, CompactPriorityStack
 
 priority_count = 20
 max_node = 20
@@ -14,10 +14,12 @@ action_strategy = st.lists(st.one_of(
               st.just(0)),
 ), max_size=1000)
 
+stack_strategy = st.sampled_from([PriorityStack, CompactPriorityStack])
 
-def get_values(actions: list[tuple[str, int, int]], mode: PriorityMode):
+
+def get_values(actions: list[tuple[str, int, int]], mode: PriorityMode, stack_type: type[PriorityStack]):
     reference: dict[int, int] = {}
-    p = PriorityStack(mode, priority_count)
+    p = stack_type(mode, priority_count)
 
     yield reference, p
 
@@ -34,18 +36,18 @@ def get_values(actions: list[tuple[str, int, int]], mode: PriorityMode):
                 yield reference, p
 
 
-@given(action_strategy, st.one_of([st.just(x) for x in PriorityMode]))
-def test_against_reference(actions: list[tuple[str, int, int]], mode: PriorityMode):
-    for ref, p in get_values(actions, mode):
+@given(action_strategy, st.one_of([st.just(x) for x in PriorityMode]), stack_strategy)
+def test_against_reference(actions: list[tuple[str, int, int]], mode: PriorityMode, stack_type: type[PriorityStack]):
+    for ref, p in get_values(actions, mode, stack_type):
         for node, key in ref.items():
             assert p.priority_levels[key][p.indices[node]] == node
 
         assert frozenset(ref.keys()) == frozenset(p.select_levels(range(0, priority_count)))
 
 
-@given(action_strategy, st.one_of([st.just(x) for x in PriorityMode]))
-def test_extrema(actions: list[tuple[str, int, int]], mode: PriorityMode):
-    for ref, p in get_values(actions, mode):
+@given(action_strategy, st.one_of([st.just(x) for x in PriorityMode]), stack_strategy)
+def test_extrema(actions: list[tuple[str, int, int]], mode: PriorityMode, stack_type: type[PriorityStack]):
+    for ref, p in get_values(actions, mode, stack_type):
         extremum = p.extremal_key
         if extremum is None: return
         assert extremum == mode.function(ref.values())
@@ -53,7 +55,16 @@ def test_extrema(actions: list[tuple[str, int, int]], mode: PriorityMode):
         assert frozenset(p.extrema()) == actual_extrema
 
 
-@given(action_strategy, st.one_of([st.just(x) for x in PriorityMode]))
-def test_invariants(actions: list[tuple[str, int, int]], mode: PriorityMode):
-    for _, p in get_values(actions, mode):
+@given(action_strategy, st.one_of([st.just(x) for x in PriorityMode]), stack_strategy)
+def test_invariants(actions: list[tuple[str, int, int]], mode: PriorityMode, stack_type: type[PriorityStack]):
+    for _, p in get_values(actions, mode, stack_type):
         p.test_invariants()
+
+
+@given(stack_strategy, st.integers(min_value=0, max_value=10_000))
+def test_unknown_values(stack_type: type[PriorityStack], value: int):
+    p = stack_type(PriorityMode.MIN, priority_count)
+
+    assert value not in p
+    assert p.priorities[value] == -1
+    assert p.indices[value] == -1
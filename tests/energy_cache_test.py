@@ -0,0 +1,35 @@
+from hypothesis import given, strategies as st
+
+from messthaler_wulff.abstract_crystal_store import DumbCrystal
+from messthaler_wulff.energy_cache import EnergyCache, LRUEnergyCache, LevelEnergyCache, NoEnergyCache
+
+crystals = st.builds(lambda n: DumbCrystal(frozenset((0, i) for i in range(n))), st.integers(0, 10))
+
+
+@given(st.lists(crystals, max_size=50))
+def test_caches_agree(states):
+    caches = [EnergyCache(), NoEnergyCache(), LRUEnergyCache(3), LevelEnergyCache(1)]
+    for cache in caches:
+        for state in states:
+            energy = cache.get(state)
+            assert energy is None or energy == state.size * 12
+            if energy is None:
+                cache.put(state, state.size * 12)
+        assert cache.hits + cache.misses == len(states)
+
+    assert len(caches[0]) == len(set(states))
+    assert len(caches[1]) == 0
+    assert len(caches[2]) <= 3
+    assert caches[0].hits >= max(c.hits for c in caches)
+
+
+def test_lru_evicts_least_recently_used():
+    a, b, c = (DumbCrystal(frozenset([(0, i)])) for i in range(3))
+    cache = LRUEnergyCache(2)
+    cache.put(a, 1)
+    cache.put(b, 2)
+    assert cache.get(a) == 1
+    cache.put(c, 3)
+    assert cache.get(b) is None
+    assert cache.get(a) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
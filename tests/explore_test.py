@@ -1,8 +1,18 @@
+import gzip
 from pathlib import Path
 
+import pytest
+
 from messthaler_wulff import fcc_transform
-from messthaler_wulff._additive_simulation import OmniSimulation, SimpleNeighborhood
-from messthaler_wulff._explorative_simulation import ExplorativeSimulation
+from messthaler_wulff._additive_simulation import ENGINES, LatticeSimulation, OmniSimulation, SimpleNeighborhood
+from messthaler_wulff._checkpoint import Checkpoint
+from messthaler_wulff._crystal_dump import CrystalDump
+from messthaler_wulff._explorative_simulation import BacktrackingExplorativeSimulation, ExplorativeSimulation, \
+    LevelExplorativeSimulation
+from messthaler_wulff._parallel_exploration import ParallelExplorativeSimulation
+from messthaler_wulff.abstract_crystal_store import PackedCrystal
+from messthaler_wulff.datastructures.lattice import UniformNeighborhood
+from messthaler_wulff.energy_cache import LRUEnergyCache, LevelEnergyCache, NoEnergyCache
 from messthaler_wulff.modes.mode_explore import run_mode
 
 TEST_ENERGIES_FORWARDS: list[int] = [0, 12, 22, 30, 36, 44, 50, 54, 60, 66, 70, 76, 80, 84, 88, 92, 96, 100, 104, 108,
@@ -20,8 +30,9 @@ TEST_ENERGIES_BIDI: list[int] = [0, 12, 22, 30, 36, 44, 48, 54, 60, 66, 70, 76,
 goal = 10
 
 
-def test_forwards_mode_results(capsys):
-    omni_simulation = OmniSimulation(SimpleNeighborhood(fcc_transform()), None, tuple([0] * 4))
+@pytest.mark.parametrize("engine", ENGINES.values())
+def test_forwards_mode_results(capsys, engine):
+    omni_simulation = engine(SimpleNeighborhood(fcc_transform()), None, tuple([0] * 4))
     with capsys.disabled():
         explorer = ExplorativeSimulation(omni_simulation, goal, verbosity=0,
                                          require_energy=4, ti=True, bidi=False, collect_crystals=False)
@@ -30,8 +41,9 @@ def test_forwards_mode_results(capsys):
         assert value == expected
 
 
-def test_bidi_mode_results(capsys):
-    omni_simulation = OmniSimulation(SimpleNeighborhood(fcc_transform()), None, tuple([0] * 4))
+@pytest.mark.parametrize("engine", ENGINES.values())
+def test_bidi_mode_results(capsys, engine):
+    omni_simulation = engine(SimpleNeighborhood(fcc_transform()), None, tuple([0] * 4))
     with capsys.disabled():
         explorer = ExplorativeSimulation(omni_simulation, goal + 3, verbosity=0,
                                          require_energy=7, ti=True, bidi=True, collect_crystals=False)
@@ -44,9 +56,161 @@ def test_mode():
     run_mode(goal, fcc_transform(), 3, None, False, (), 4)
 
 
+def test_tuple_engine_mode():
+    run_mode(goal, fcc_transform(), 3, None, False, (), 4, engine="tuple")
+
+
 def test_mode_dump():
     run_mode(goal, fcc_transform(), 3, "-", False, (), 4)
 
 
 def test_mode_dump_folder(tmp_path: Path):
     run_mode(goal, fcc_transform(), 3, tmp_path, False, (), 4)
+
+
+def explorer(cls=ExplorativeSimulation, goal=6, engine=OmniSimulation, transform=None, **kwargs):
+    """Explore fcc (or the lattice of `transform`) from the empty crystal up to `goal` atoms"""
+    neighborhood = SimpleNeighborhood(fcc_transform() if transform is None else transform)
+    return cls(engine(neighborhood, None, tuple([0] * 4)), goal, **kwargs)
+
+
+def assert_same_results(a: ExplorativeSimulation, b: ExplorativeSimulation):
+    assert a.energies == b.energies
+    assert a.counts == b.counts
+    assert a.min_counts == b.min_counts
+
+
+def test_symmetry_reduction():
+    neighborhood = SimpleNeighborhood(fcc_transform())
+    symmetries = UniformNeighborhood(sorted(neighborhood.base_neighborhood)).automorphisms()
+    assert len(symmetries) == 48
+
+    plain = explorer(bidi=False)
+    reduced = explorer(bidi=False, symmetries=symmetries)
+
+    assert reduced.energies == plain.energies
+    assert reduced.raw_counts == plain.counts
+    assert reduced.raw_min_counts == plain.min_counts
+    assert sum(reduced.counts) < sum(plain.counts)
+
+
+def test_parallel_exploration():
+    assert_same_results(explorer(ParallelExplorativeSimulation, jobs=3, bidi=False), explorer(bidi=False))
+
+
+def test_parallel_mode():
+    run_mode(goal, fcc_transform(), 3, None, False, (), 4, jobs=2)
+
+
+def test_level_exploration(capsys):
+    assert_same_results(explorer(LevelExplorativeSimulation, print_levels=True), explorer(bidi=False))
+    assert len(capsys.readouterr().out.splitlines()) == 7
+
+    pruned = explorer(LevelExplorativeSimulation, goal, require_energy=4)
+    assert pruned.energies == TEST_ENERGIES_FORWARDS[:goal + 1]
+
+
+def test_visited_on_disk(tmp_path):
+    assert_same_results(explorer(visited_dir=tmp_path), explorer())
+
+
+def test_checkpoint_resume(tmp_path):
+    complete = explorer(goal=7, collect_crystals=True)
+
+    interrupted = explorer(goal=7, collect_crystals=True, checkpoint=Checkpoint(tmp_path / "a", every=0),
+                           auto_run=False)
+    for _ in range(40):
+        interrupted.expand(interrupted.stack.pop())
+    interrupted.checkpoint.save(interrupted)
+
+    for path in ["a", "b"]:
+        resumed = explorer(goal=7, collect_crystals=True, checkpoint=Checkpoint(tmp_path / path, every=0),
+                           resume=tmp_path / "a")
+        assert_same_results(resumed, complete)
+        assert [set(level) for level in resumed.crystals] == [set(level) for level in complete.crystals]
+
+    finished = explorer(goal=7, resume=tmp_path / "b", collect_crystals=True)
+    assert finished.counts == complete.counts
+
+    with pytest.raises(ValueError, match="engine"):
+        explorer(goal=7, engine=LatticeSimulation, resume=tmp_path / "b", collect_crystals=True)
+    with pytest.raises(ValueError, match="lattice"):
+        explorer(goal=7, transform=fcc_transform() * 0.999, resume=tmp_path / "b", collect_crystals=True)
+
+
+def test_packed_crystals():
+    # Without translation invariance going backwards would never end
+    for ti, bidi in [(True, True), (False, False)]:
+        assert_same_results(explorer(ti=ti, bidi=bidi, abstract_crystal=PackedCrystal), explorer(ti=ti, bidi=bidi))
+
+
+def test_backtracking():
+    for bidi in [True, False]:
+        assert_same_results(explorer(BacktrackingExplorativeSimulation, bidi=bidi), explorer(bidi=bidi))
+
+
+def test_energy_caches():
+    reference = explorer()
+    for cache in [NoEnergyCache(), LRUEnergyCache(10), LevelEnergyCache()]:
+        assert_same_results(explorer(energy_cache=cache), reference)
+        assert cache.misses > 0
+
+
+def test_lattice_engine():
+    for bidi in [False, True]:
+        omni = explorer(bidi=bidi, collect_crystals=True)
+        lattice = explorer(engine=LatticeSimulation, bidi=bidi, collect_crystals=True)
+
+        assert_same_results(lattice, omni)
+        for omni_crystals, lattice_crystals in zip(omni.crystals, lattice.crystals):
+            assert set(map(omni.canonical, omni_crystals)) == set(map(omni.canonical, lattice_crystals))
+
+    backtracking = explorer(BacktrackingExplorativeSimulation, engine=LatticeSimulation)
+    assert backtracking.counts == omni.counts
+
+
+def test_lattice_simulation():
+    neighborhood = SimpleNeighborhood(fcc_transform())
+    omni = OmniSimulation(neighborhood, None, tuple([0] * 4))
+    lattice = LatticeSimulation(neighborhood, None, tuple([0] * 4))
+
+    for i in range(60):
+        mode = OmniSimulation.BACKWARDS if i % 3 == 2 else OmniSimulation.FORWARDS
+        atom = min(omni.next_atoms(mode))
+        assert atom in lattice.next_atoms(mode)
+        assert lattice.energy_delta(atom, mode) == omni.energy_delta(atom, mode)
+        omni.force_set_atom(atom, mode)
+        lattice.force_set_atom(atom, mode)
+
+        assert lattice.energy == omni.energy
+        assert lattice.atoms == omni.atoms
+        assert sorted(lattice.points()) == sorted(omni.points())
+        lattice.sim.test_invariants()
+
+
+def test_streaming_dump(tmp_path):
+    collected = explorer(goal=7, engine=LatticeSimulation, require_energy=4, collect_crystals=True)
+
+    for compression in [None, "gz"]:
+        with CrystalDump(tmp_path, lambda i: f"{i}.txt", compression) as dump:
+            streamed = explorer(goal=7, engine=LatticeSimulation, require_energy=4, crystal_dump=dump)
+        assert streamed.energies == collected.energies
+
+        for i in range(1, 8):
+            path = dump.path(i)
+            text = gzip.decompress(path.read_bytes()).decode() if compression else path.read_text()
+            assert len(text.splitlines()) == len(collected.crystals[i]) == collected.min_counts[i]
+
+    run_mode(goal, fcc_transform(), 3, tmp_path / "xz", False, (), 4, compression="xz")
+    assert len(list((tmp_path / "xz").glob("*.txt.xz"))) == goal + 1
+
+
+def test_incompatible_options(tmp_path):
+    with pytest.raises(ValueError, match="several processes"):
+        run_mode(goal, fcc_transform(), 3, backtrack=True, jobs=2)
+    with pytest.raises(ValueError, match="checkpoints"):
+        run_mode(goal, fcc_transform(), 3, backtrack=True, checkpoint=tmp_path / "checkpoint")
+    with pytest.raises(ValueError, match="several processes"):
+        run_mode(goal, fcc_transform(), 3, jobs=2, checkpoint=tmp_path / "checkpoint")
+    with pytest.raises(ValueError, match="no-translations"):
+        run_mode(goal, fcc_transform(), 3, symmetry=True, ti=False)
@@ -0,0 +1,46 @@
+import json
+
+from messthaler_wulff import fcc_transform, instrumentation
+from messthaler_wulff._additive_simulation import LatticeSimulation, SimpleNeighborhood
+from messthaler_wulff._explorative_simulation import ExplorativeSimulation
+
+
+def test_explore_counters(tmp_path):
+    neighborhood = SimpleNeighborhood(fcc_transform())
+    assert instrumentation.current() is None
+    assert ExplorativeSimulation(LatticeSimulation(neighborhood, None, tuple([0] * 4)), 3).instrumentation is None
+
+    inst = instrumentation.enable()
+    try:
+        explorer = ExplorativeSimulation(LatticeSimulation(neighborhood, None, tuple([0] * 4)), 7)
+    finally:
+        instrumentation.disable()
+
+    assert sum(inst.levels["explore.expanded"]) == sum(explorer.counts)
+    assert inst.levels["explore.expanded"][:3] == explorer.counts[:3]
+    assert inst.counters["omni.force_set_atom"] == inst.counters["additive.toggles"]
+    assert inst.observations["goto.diff_length"].sum == inst.counters["additive.toggles"]
+    assert inst.counters["energy.cache_misses"] == sum(explorer.counts)
+    assert inst.gauges["explore.visited"]["max"] == len(explorer.visited)
+    assert inst.sections["explore.energy"].calls == sum(explorer.counts)
+
+    inst.dump(tmp_path / "instrumentation.json")
+    data = json.loads((tmp_path / "instrumentation.json").read_text())
+    assert data["counters"]["additive.toggles"] == inst.counters["additive.toggles"]
+    assert data["observations"]["goto.diff_length"]["max"] >= 1
+
+
+def test_parallel_counters():
+    from messthaler_wulff._parallel_exploration import ParallelExplorativeSimulation
+
+    neighborhood = SimpleNeighborhood(fcc_transform())
+    inst = instrumentation.enable()
+    try:
+        explorer = ParallelExplorativeSimulation(LatticeSimulation(neighborhood, None, tuple([0] * 4)), 6, 2,
+                                                 bidi=False)
+    finally:
+        instrumentation.disable()
+
+    assert sum(inst.levels["explore.expanded"]) == sum(explorer.counts)
+    assert inst.counters["additive.toggles"] > 0
+    assert inst.sections["explore.energy"].calls == sum(explorer.counts)
@@ -6,6 +6,7 @@ from messthaler_wulff.sim.additive_simulation import AdditiveSimulation, Mode
 from messthaler_wulff.data.common_lattices import CommonLattice
 from messthaler_wulff.datastructures.graph import Graph
 from messthaler_wulff.datastructures.lattice import Lattice
+from messthaler_wulff.datastructures.priority_stack import CompactPriorityStack, PriorityStack
 
 strategy_graph = (st.one_of(list(map(st.just, CommonLattice)))
                   .map(lambda l: l.value)
@@ -28,4 +29,19 @@ def test_random(graph: Graph, steps: int):
             mode = Mode.FORWARDS
         node = random.choice(sim.next(mode))
         sim.toggle(node)
-        sim.test_invariants()
\ No newline at end of file
+        sim.test_invariants()
+
+
+@given(st.sampled_from([PriorityStack, CompactPriorityStack]))
+def test_stack_types(stack_type: type[PriorityStack]):
+    # Grows far past the storage the stacks start out with
+    sim = AdditiveSimulation(Lattice(CommonLattice.fcc.value), stack_type=stack_type)
+    reference = AdditiveSimulation(Lattice(CommonLattice.fcc.value))
+
+    for _ in range(500):
+        node = min(reference.next(Mode.FORWARDS))
+        assert sim.energy_delta(node, Mode.FORWARDS) == reference.energy_delta(node, Mode.FORWARDS)
+        sim.toggle(node)
+        reference.toggle(node)
+        assert sim.energy == reference.energy
+    sim.test_invariants()
@@ -0,0 +1,85 @@
+import random
+
+from hypothesis import given, strategies as st
+
+from messthaler_wulff.data.common_lattices import CommonLattice
+from messthaler_wulff.datastructures.finite_graphs import metric_ball
+from messthaler_wulff.datastructures.graph import Graph
+from messthaler_wulff.datastructures.lattice import Lattice
+from messthaler_wulff.datastructures.periodic_lattice import PeriodicLattice
+from messthaler_wulff.sim.crystal import Crystal, CrystalLike, sign
+from messthaler_wulff.sim.energy import SurfaceEnergy
+
+strategy_graph = st.one_of(
+    st.one_of(list(map(st.just, CommonLattice))).map(lambda l: l.value).map(Lattice),
+    st.just(PeriodicLattice(CommonLattice.fcc.value, (4, 5, 6))))
+
+
+def simulation(graph: Graph) -> tuple[Crystal, SurfaceEnergy]:
+    c = Crystal(graph)
+    return c, SurfaceEnergy(c)
+
+
+@given(strategy_graph, st.lists(st.integers(min_value=0, max_value=60), max_size=40),
+       st.lists(st.integers(min_value=0, max_value=60), max_size=40))
+def test_toggle_many_matches_toggle(graph: Graph, initial: list[int], batch: list[int]):
+    nodes = list(metric_ball(graph, 3))
+    initial = list(dict.fromkeys(nodes[i % len(nodes)] for i in initial))
+    batch = list(dict.fromkeys(nodes[i % len(nodes)] for i in batch))
+
+    c1, e1 = simulation(graph)
+    c2, e2 = simulation(graph)
+
+    for atom in initial:
+        c1.toggle(atom)
+    c2.toggle_many(initial)
+
+    for atom in batch:
+        c1.toggle(atom)
+    c2.toggle_many(reversed(batch))
+
+    assert c1.size == c2.size
+    assert e1.value == e2.value
+    for node in nodes:
+        assert c1.x_c[node] == c2.x_c[node]
+        assert e1.f[node] == e2.f[node]
+
+
+def test_toggle_many_energy():
+    graph = Lattice(CommonLattice.fcc.value)
+    c, e = simulation(graph)
+    nodes = list(metric_ball(graph, 4))
+    random.shuffle(nodes)
+
+    c.toggle_many(nodes)
+
+    assert c.size == len(nodes)
+    assert e.value == sum(graph.degree(n) - e.calc_f(n) for n in nodes)
+
+
+class Bonds(CrystalLike):
+    """Counts the bonds inside the crystal by reading the occupation of neighbors"""
+
+    def __init__(self, crystal: Crystal):
+        super().__init__(crystal)
+        self.bonds = 0
+
+    def _toggle(self, atom: int) -> None:
+        x_c = self.crystal.x_c
+        bonds = sum(x_c[n] for n in self.graph.neighbors(atom))
+        self.bonds -= sign(x_c[atom]) * bonds
+
+
+def test_toggle_many_without_batches():
+    graph = Lattice(CommonLattice.fcc.value)
+    nodes = list(metric_ball(graph, 2))
+    c1, c2 = Crystal(graph), Crystal(graph)
+    b1, b2 = Bonds(c1), Bonds(c2)
+
+    for atom in nodes:
+        c1.toggle(atom)
+    c2.toggle_many(nodes)
+
+    assert b1.bonds > 0
+    assert b1.bonds == b2.bonds
+    assert c1.size == c2.size
@@ -0,0 +1,44 @@
+import numpy as np
+from hypothesis import given, settings, strategies as st
+
+from messthaler_wulff.data.common_lattices import CommonLattice
+from messthaler_wulff.datastructures.lattice import Lattice
+from messthaler_wulff.sim.additive_simulation import AdditiveSimulation, Mode
+from messthaler_wulff.sim.ensemble import EnsembleSimulation
+
+strategy_lattice = (st.one_of(list(map(st.just, CommonLattice)))
+                    .map(lambda l: l.value)
+                    .map(Lattice))
+
+
+@settings(deadline=None)
+@given(strategy_lattice, st.integers(min_value=1, max_value=20), st.integers(min_value=1, max_value=40),
+       st.integers(min_value=0, max_value=1000))
+def test_matches_additive_simulation(lattice: Lattice, walkers: int, size: int, seed: int):
+    ensemble = EnsembleSimulation(lattice, walkers, seed=seed)
+    ensemble.run(size)
+
+    curves = ensemble.energy_curves()
+    assert curves.shape == (size + 1, walkers)
+    assert np.array_equal(ensemble.calculate_energy(), ensemble.energy)
+
+    nodes = np.stack(ensemble.nodes)
+    for walker in range(walkers):
+        sim = AdditiveSimulation(lattice)
+        for i, node in enumerate(nodes[:, walker].tolist()):
+            assert node in sim.next(Mode.FORWARDS)
+            sim.toggle(node)
+            assert sim.energy == curves[i + 1, walker]
+        assert sorted(sim.x_c.view().nonzero()[0].tolist()) == ensemble.crystal(walker).tolist()
+
+
+def test_seed():
+    first = EnsembleSimulation(Lattice(CommonLattice.fcc.value), 50, seed=7)
+    second = EnsembleSimulation(Lattice(CommonLattice.fcc.value), 50, seed=7)
+    first.run(30)
+    second.run(30)
+
+    assert np.array_equal(first.energy_curves(), second.energy_curves())
+    percentiles = first.percentiles((0, 50, 100))
+    assert percentiles.shape == (3, 31)
+    assert (percentiles[0] <= percentiles[1]).all() and (percentiles[1] <= percentiles[2]).all()
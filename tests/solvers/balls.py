@@ -0,0 +1,10 @@
+from messthaler_wulff.datastructures.lattice import Lattice
+
+
+def ball(lattice: Lattice, radius: int) -> list[int]:
+    nodes = {Lattice.ZERO}
+    layer = {Lattice.ZERO}
+    for _ in range(radius):
+        layer = {u for v in layer for u in lattice.neighbors(v).tolist()} - nodes
+        nodes |= layer
+    return sorted(nodes)
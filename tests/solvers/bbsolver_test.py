@@ -0,0 +1,35 @@
+from hypothesis import strategies as st, given, settings
+
+from messthaler_wulff.data.common_lattices import CommonLattice
+from messthaler_wulff.datastructures.lattice import Lattice
+from messthaler_wulff.solvers import Result, bbsolver, dpsolver, energy_terms
+
+from balls import ball
+
+
+@given(st.sampled_from(CommonLattice), st.randoms(use_true_random=False))
+@settings(max_examples=20, deadline=None)
+def test_same_as_dp(common_lattice: CommonLattice, rnd):
+    lattice = Lattice(common_lattice.value)
+    nodes = rnd.sample(ball(lattice, 3), 14)
+
+    assert bbsolver.solve(lattice, nodes, 16) == dpsolver.solve(lattice, nodes, 16)
+
+
+def test_greedy_is_an_upper_bound():
+    lattice = Lattice(CommonLattice.fcc.value)
+    nodes = ball(lattice, 2)
+    greedy = bbsolver.greedy(*energy_terms(lattice, nodes))
+    exact = dpsolver.solve(lattice, nodes, len(nodes) + 1)
+
+    assert len(greedy) == len(nodes) + 1
+    assert all(g >= e for g, e in zip(greedy, exact))
+
+
+def test_upper_bounds():
+    lattice = Lattice(CommonLattice.fcc.value)
+    nodes = ball(lattice, 2)
+    exact = dpsolver.solve(lattice, nodes, 10)
+
+    assert bbsolver.solve(lattice, nodes, 10, upper_bounds=exact) == exact
+    assert bbsolver.solve(lattice, nodes, 10, upper_bounds=Result.initial(10)) == exact
@@ -0,0 +1,16 @@
+from messthaler_wulff.data.common_lattices import CommonLattice
+from messthaler_wulff.datastructures.lattice import Lattice
+from messthaler_wulff.solvers import Result, bfsolver, dpsolver
+
+from balls import ball
+
+
+def test_combine():
+    assert Result([-1, 3, 5]).combine(Result([2, -1, 4])) == [2, 3, 4]
+
+
+def test_jobs():
+    lattice = Lattice(CommonLattice.fcc.value)
+    nodes = ball(lattice, 2)[:20]
+
+    assert bfsolver.solve(lattice, nodes, 21, jobs=2, inner_bits=8) == dpsolver.solve(lattice, nodes, 21)
@@ -0,0 +1,31 @@
+from hypothesis import strategies as st, given, settings
+
+from messthaler_wulff.data.common_lattices import CommonLattice
+from messthaler_wulff.datastructures.lattice import Lattice
+from messthaler_wulff.datastructures.periodic_lattice import PeriodicLattice
+from messthaler_wulff.solvers import bfsolver, dpsolver
+
+from balls import ball
+
+
+@given(st.sampled_from(CommonLattice), st.randoms(use_true_random=False), st.integers(0, 6))
+@settings(max_examples=20, deadline=None)
+def test_same_as_brute_force(common_lattice: CommonLattice, rnd, inner_bits: int):
+    lattice = Lattice(common_lattice.value)
+    nodes = rnd.sample(ball(lattice, 2), 12)
+
+    assert dpsolver.solve(lattice, nodes, 14) == bfsolver.solve(lattice, nodes, 14, inner_bits=inner_bits)
+
+
+def test_periodic():
+    lattice = PeriodicLattice(CommonLattice.square.value, (3, 4))
+    nodes = list(range(lattice.size))
+
+    assert dpsolver.solve(lattice, nodes, 13) == bfsolver.solve(lattice, nodes, 13)
+
+
+def test_fcc_ball():
+    lattice = Lattice(CommonLattice.fcc.value)
+
+    # Too many nodes for brute force, the small crystals are known
+    assert dpsolver.solve(lattice, ball(lattice, 2), 6) == [0, 12, 22, 30, 36, 44]
@@ -0,0 +1,31 @@
+import numpy as np
+from hypothesis import strategies as st, given, settings
+
+from messthaler_wulff.data.common_lattices import CommonLattice
+from messthaler_wulff.datastructures.graph import Graph
+from messthaler_wulff.datastructures.lattice import Lattice
+from messthaler_wulff.datastructures.periodic_lattice import PeriodicLattice
+from messthaler_wulff.sim.crystal import Crystal
+from messthaler_wulff.sim.energy import SurfaceEnergy
+from messthaler_wulff.solvers import energy_terms
+
+strategy_graph = st.one_of(
+    st.sampled_from(CommonLattice).map(lambda l: Lattice(l.value)),
+    st.just(PeriodicLattice(CommonLattice.fcc.value, (4, 5, 6))))
+
+
+@given(strategy_graph, st.randoms(use_true_random=False))
+@settings(max_examples=50, deadline=None)
+def test_same_as_surface_energy(graph: Graph, rnd):
+    candidates = sorted({u for v in [Graph.ZERO, *graph.neighbors(Graph.ZERO)] for u in graph.neighbors(v)})
+    nodes = rnd.sample(candidates, min(len(candidates), 12))
+    unary, bonds = energy_terms(graph, nodes)
+
+    occupied = np.array([rnd.random() < 0.5 for _ in nodes], dtype=np.int64)
+    crystal = Crystal(graph)
+    energy = SurfaceEnergy(crystal)
+    for node, x in zip(nodes, occupied.tolist()):
+        if x:
+            crystal.toggle(node)
+
+    assert energy.value == unary @ occupied - occupied @ bonds @ occupied // 2
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+HEAVY = ["numpy", "argcomplete", "tqdm", "psutil", "matplotlib", "scipy", "open3d"]
+
+
+def run(*args):
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    return subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True, check=True)
+
+
+def loaded_after(statement, modules):
+    code = f"import sys\n{statement}\nprint(' '.join(m for m in {modules!r} if m in sys.modules))"
+    return run("-c", code).stdout.split()
+
+
+def test_import_is_light():
+    assert loaded_after("import messthaler_wulff", HEAVY) == []
+
+
+def test_explore_is_light():
+    assert loaded_after("import messthaler_wulff.modes.mode_explore",
+                        ["tqdm", "psutil", "matplotlib", "scipy", "open3d"]) == []
+
+
+def test_lazy_fcc_transform():
+    from messthaler_wulff import fcc_transform
+    assert fcc_transform().shape == (3, 3)
+
+
+def test_startup_trace():
+    result = run("-m", "messthaler_wulff", "--startup-trace", "--help")
+    assert "Imports took" in result.stderr
+    assert "mydefaults" in result.stderr